@@ -0,0 +1,309 @@
+"""
+Zaagplan Optimizer - Toelating
+Schat de rekentijd van een request en beslist: toelaten, terugschalen
+naar een sneller algoritme (met waarschuwing) of weigeren
+
+De schatting gebruikt alleen de grootte van de invoer: aantal stukken na
+splitsen, aantal verschillende lengtes, voorraadtypes en latlengtes, en
+per MIP model (patronen of arc-flow) een eigen kostenmodel. De constanten
+zijn gemeten met `python loadtest.py --calibrate` (één core, één solver
+thread); opnieuw meten op de productiemachine maakt ze alleen scherper.
+
+Daarnaast mag elke client maar een beperkt aantal optimalisaties tegelijk
+draaien (429), zodat één gebruiker de service niet kan bezetten. Met
+ZAAGPLAN_QUOTA_DB (door serve.py gezet bij meerdere workers) geldt die
+grens over alle workers samen, anders per proces.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Dict, List, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import math
+import os
+import threading
+import time
+
+import shared_state
+
+from optimizer_1d import (
+    Algorithm, EXACT_MAX_PIECES, EXACT_TIME_BUDGET, MAX_PATTERNS, ORTOOLS_AVAILABLE, Formulation, Part, Stock
+)
+
+# Langste toegestane geschatte rekentijd in seconden; daarboven terugschalen
+MAX_SOLVE_SECONDS = float(os.environ.get("ZAAGPLAN_MAX_SOLVE_SECONDS", "30"))
+
+# Harde grens op het aantal stukken na splitsen (413)
+MAX_PIECES = int(os.environ.get("ZAAGPLAN_MAX_PIECES", "20000"))
+
+# Gelijktijdige optimalisaties per client (0 = onbeperkt)
+CLIENT_CONCURRENCY = int(os.environ.get("ZAAGPLAN_CLIENT_CONCURRENCY", "2"))
+
+# Lopende optimalisaties gedeeld tussen workers (leeg = per proces)
+QUOTA_DB_PATH = os.environ.get("ZAAGPLAN_QUOTA_DB", "")
+
+# Kostenmodel (seconden), gemeten met `python loadtest.py --calibrate`:
+# greedy = stap × stukken × latten × voorraadtypes + basis
+GREEDY_SECONDS_PER_STEP = 9.86e-07
+GREEDY_BASE_SECONDS = 0.00393
+# HYBRID / SMART_SPLIT: greedy plus reststukoptimalisatie (90e percentiel)
+HYBRID_FACTOR = 1.24
+# Patronen: opsommen en MIP, lineair in patronen × lengtes (patronen <= MAX_PATTERNS)
+PATTERN_SECONDS_PER_STEP = 1.23e-05
+PATTERN_BASE_SECONDS = 0.0419
+# Arc-flow en de EXACT zoektocht: basis × groei^lengtes
+ARC_FLOW_BASE_SECONDS = 0.0037
+ARC_FLOW_GROWTH = 1.57
+EXACT_BASE_SECONDS = 0.00298
+EXACT_GROWTH = 1.36
+
+# Terugschaalvolgorde: elk algoritme valt terug op het volgende
+DOWNGRADE_ORDER = [
+    Algorithm.ORTOOLS_OPTIMAL,
+    Algorithm.EXACT,
+    Algorithm.SMART_SPLIT,
+    Algorithm.HYBRID,
+    Algorithm.FFD,
+]
+
+
+@dataclass
+class RequestSize:
+    """Grootte van een 1D request zoals de optimizer hem ziet"""
+    pieces: int           # Stukken na expanderen en splitsen
+    distinct_lengths: int
+    stock_types: int
+    stock_lengths: int = 1  # Verschillende latlengtes met voorraad (kiest het MIP model)
+
+
+@dataclass
+class Decision:
+    """Uitkomst van de toelating"""
+    algorithm: Algorithm
+    estimate: float                 # Geschatte rekentijd van het gekozen algoritme (s)
+    status_code: int = 200          # 200 = toegelaten, anders 413
+    warnings: List[str] = field(default_factory=list)
+
+    @property
+    def accepted(self) -> bool:
+        return self.status_code == 200
+
+
+def request_size(parts: List[Part], stocks: List[Stock], max_split_parts: int) -> RequestSize:
+    """Stukken na splitsen: te lange onderdelen tellen als meerdere delen"""
+    longest = max((s.length for s in stocks), default=0.0)
+    pieces = 0
+    for part in parts:
+        segments = math.ceil(part.length / longest) if longest > 0 else 1
+        pieces += part.quantity * max(1, min(segments, max(1, max_split_parts)))
+    return RequestSize(
+        pieces=pieces,
+        distinct_lengths=len({p.length for p in parts}),
+        stock_types=len(stocks),
+        stock_lengths=len({s.length for s in stocks if s.quantity != 0})
+    )
+
+
+def greedy_work(pieces: int, stock_types: int) -> float:
+    """Stappen van FFD: elk stuk scant de open latten (ruwweg vier stukken per lat)"""
+    n = max(pieces, 1)
+    return n * max(1.0, n / 4) * max(stock_types, 1)
+
+
+def pattern_work(distinct_lengths: int) -> float:
+    """Patronen × lengtes voor het patroonmodel (het opsommen stopt bij MAX_PATTERNS)"""
+    d = max(distinct_lengths, 1)
+    return min(MAX_PATTERNS, 2 ** min(d, 30)) * d
+
+
+def mip_formulation(size: RequestSize, formulation: Formulation = Formulation.AUTO) -> Formulation:
+    """Het model dat ORTOOLS_OPTIMAL voor deze request kiest (zie Optimizer1D)"""
+    if formulation != Formulation.AUTO:
+        return formulation
+    return Formulation.ARC_FLOW if size.stock_lengths > 1 else Formulation.PATTERNS
+
+
+def estimate_seconds(
+    algorithm: Algorithm,
+    size: RequestSize,
+    time_limit: Optional[float] = None,
+    formulation: Formulation = Formulation.AUTO
+) -> float:
+    """
+    Geschatte rekentijd in seconden
+
+    - FFD / ORTOOLS_FAST: greedy_work stappen
+    - HYBRID / SMART_SPLIT: HYBRID_FACTOR × FFD
+    - ORTOOLS_OPTIMAL: eerst FFD, dan het MIP model: patronen lineair in
+      pattern_work, arc-flow exponentieel in het aantal lengtes; de
+      deadline begrenst het geheel. Zonder OR-Tools draait EXACT
+    - EXACT: HYBRID plus een zoektocht die exponentieel groeit met het
+      aantal lengtes, begrensd door de tijdslimiet (of EXACT_TIME_BUDGET);
+      boven EXACT_MAX_PIECES alleen HYBRID
+    """
+    greedy = GREEDY_SECONDS_PER_STEP * greedy_work(size.pieces, size.stock_types) + GREEDY_BASE_SECONDS
+    d = max(size.distinct_lengths, 1)
+
+    if algorithm == Algorithm.ORTOOLS_OPTIMAL and not ORTOOLS_AVAILABLE:
+        algorithm = Algorithm.EXACT
+    if algorithm in (Algorithm.FFD, Algorithm.ORTOOLS_FAST):
+        return greedy
+    if algorithm in (Algorithm.HYBRID, Algorithm.SMART_SPLIT):
+        return HYBRID_FACTOR * greedy
+    if algorithm == Algorithm.EXACT:
+        hybrid = HYBRID_FACTOR * greedy
+        if size.pieces > EXACT_MAX_PIECES:
+            return hybrid
+        budget = time_limit if time_limit is not None else EXACT_TIME_BUDGET
+        return hybrid + min(EXACT_BASE_SECONDS * EXACT_GROWTH ** min(d, 200), budget)
+    # ORTOOLS_OPTIMAL
+    if mip_formulation(size, formulation) == Formulation.ARC_FLOW:
+        mip = ARC_FLOW_BASE_SECONDS * ARC_FLOW_GROWTH ** min(d, 200)
+    else:
+        mip = PATTERN_SECONDS_PER_STEP * pattern_work(d) + PATTERN_BASE_SECONDS
+    if time_limit is not None:
+        mip = min(mip, time_limit)
+    return greedy + mip
+
+
+def decide(
+    algorithm: Algorithm,
+    size: RequestSize,
+    time_limit: Optional[float] = None,
+    max_seconds: float = MAX_SOLVE_SECONDS,
+    max_pieces: int = MAX_PIECES,
+    formulation: Formulation = Formulation.AUTO,
+    downgrade: bool = True
+) -> Decision:
+    """
+    Toelaten, terugschalen naar het eerste snellere algoritme dat binnen
+    max_seconds past, of weigeren (413)
+
+    Met downgrade=False (bijv. een incrementele reparatie, die geen ander
+    algoritme kan kiezen) wordt er niet teruggeschaald maar direct geweigerd.
+    """
+    if size.pieces > max_pieces:
+        return Decision(
+            algorithm, 0.0, 413,
+            [f"Te veel stukken: {size.pieces} (maximaal {max_pieces})"]
+        )
+
+    estimate = estimate_seconds(algorithm, size, time_limit, formulation)
+    if estimate <= max_seconds:
+        return Decision(algorithm, estimate)
+
+    start = DOWNGRADE_ORDER.index(algorithm) + 1 if algorithm in DOWNGRADE_ORDER else len(DOWNGRADE_ORDER)
+    for fallback in DOWNGRADE_ORDER[start:] if downgrade else []:
+        fallback_estimate = estimate_seconds(fallback, size, time_limit, formulation)
+        if fallback_estimate <= max_seconds:
+            return Decision(fallback, fallback_estimate, warnings=[
+                f"Algoritme '{algorithm.value}' is teruggeschaald naar '{fallback.value}': "
+                f"geschatte rekentijd {estimate:.0f}s is meer dan {max_seconds:.0f}s"
+            ])
+
+    return Decision(
+        algorithm, estimate, 413,
+        [f"Request te groot: geschatte rekentijd {estimate:.0f}s (maximaal {max_seconds:.0f}s)"]
+    )
+
+
+class QuotaExceeded(Exception):
+    """De client heeft al het maximale aantal optimalisaties lopen"""
+
+
+class ClientQuota:
+    """
+    Telt lopende optimalisaties per client (thread-safe)
+
+    Met een path staat elke plek als rij in SQLite, zodat alle workers
+    dezelfde telling zien; rijen van een gecrashte worker worden bij de
+    volgende aanvraag van die client opgeruimd.
+    """
+
+    def __init__(self, limit: int = CLIENT_CONCURRENCY, path: str = QUOTA_DB_PATH):
+        self.limit = limit
+        self.path = path
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if not path:
+            return
+        conn = shared_state.connect(path)
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS client_slots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    client TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    started_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_client_slots_client ON client_slots (client);
+            """)
+            # Rijen onder onze pid zijn van een eerder proces met dezelfde pid
+            conn.execute("DELETE FROM client_slots WHERE pid = ?", (os.getpid(),))
+        finally:
+            conn.close()
+
+    def active(self, client: str) -> int:
+        if self.path:
+            conn = shared_state.connect(self.path)
+            try:
+                return conn.execute("SELECT COUNT(*) FROM client_slots WHERE client = ?", (client,)).fetchone()[0]
+            finally:
+                conn.close()
+        with self._lock:
+            return self._active.get(client, 0)
+
+    @contextmanager
+    def slot(self, client: str):
+        """Houd een plek vast zolang de optimalisatie loopt, anders QuotaExceeded"""
+        if self.path and self.limit > 0:
+            slot_id = self._acquire(client)
+            try:
+                yield
+            finally:
+                self._release(slot_id)
+            return
+        with self._lock:
+            if self.limit > 0 and self._active.get(client, 0) >= self.limit:
+                raise QuotaExceeded(client)
+            self._active[client] = self._active.get(client, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[client] -= 1
+                if not self._active[client]:
+                    del self._active[client]
+
+    def _acquire(self, client: str) -> int:
+        """Neem atomair een plek in SQLite (tellen en toevoegen in één transactie)"""
+        conn = shared_state.connect(self.path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            pids = [row[0] for row in conn.execute(
+                "SELECT DISTINCT pid FROM client_slots WHERE client = ?", (client,)
+            )]
+            conn.executemany(
+                "DELETE FROM client_slots WHERE pid = ?",
+                [(pid,) for pid in pids if not shared_state.process_alive(pid)]
+            )
+            count = conn.execute("SELECT COUNT(*) FROM client_slots WHERE client = ?", (client,)).fetchone()[0]
+            if count >= self.limit:
+                conn.execute("ROLLBACK")
+                raise QuotaExceeded(client)
+            cursor = conn.execute(
+                "INSERT INTO client_slots (client, pid, started_at) VALUES (?, ?, ?)",
+                (client, os.getpid(), time.time())
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def _release(self, slot_id: int):
+        conn = shared_state.connect(self.path)
+        try:
+            conn.execute("DELETE FROM client_slots WHERE id = ?", (slot_id,))
+        finally:
+            conn.close()
@@ -0,0 +1,233 @@
+"""
+Zaagplan Optimizer - Arc-flow model
+Exact model voor het cutting stock probleem met meerdere latlengtes
+(Valério de Carvalho), met gecomprimeerde graaf
+
+Een knoop is een positie op de lat, een boog (p, p + l + kerf) is een
+stuk van lengte l; elk pad van de bron naar een eindknoop is een lat. Alle
+latlengtes delen dezelfde graaf: elke latlengte L is een eindknoop op
+positie L + kerf, en een pad dat vóór die positie stopt mag die lat
+gebruiken. Per voorraadtype telt een terugkoppelboog van de eindknoop naar
+de bron de latten (kosten, voorraadlimiet).
+
+Opbouw: stukken in aflopende lengte, elk stuk alleen na even lange of
+langere stukken en hooguit zo vaak achter elkaar als de vraag. Daarna
+compressie: knopen met dezelfde eindknoop en dezelfde uitgaande bogen
+(naar al samengevoegde knopen) worden één knoop. Dat laat elk bestaand pad
+staan en elk nieuw pad past nog steeds op zijn lat, terwijl het aantal
+knopen en bogen sterk daalt (vooral aan het eind van de lat, waar alleen
+nog kleine stukken passen).
+
+Het model is een MipModel (zie mip_model.py) en wordt met solve_model
+opgelost; decompose() haalt de latten weer uit de stroom.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+
+from mip_model import INF, MipModel, Row, SparsePattern
+
+EPS = 1e-6
+
+# Grootste graaf (bogen voor compressie) die nog als model gebouwd wordt
+MAX_ARCS = 200_000
+
+
+@dataclass
+class ArcFlowGraph:
+    """Gecomprimeerde arc-flow graaf voor alle voorraadtypes samen"""
+    num_nodes: int
+    source: int
+    item_arcs: List[Tuple[int, int, int]] = field(default_factory=list)  # (van, naar, lengte-index)
+    exit_arcs: List[Tuple[int, int]] = field(default_factory=list)       # (van, eindknoop)
+    chain_arcs: List[Tuple[int, int]] = field(default_factory=list)      # Eindknoop -> volgende (langere)
+    stock_target: List[Optional[int]] = field(default_factory=list)      # Eindknoop per voorraadtype
+    uncompressed_nodes: int = 0
+    uncompressed_arcs: int = 0
+
+    @property
+    def num_arcs(self) -> int:
+        return len(self.item_arcs) + len(self.exit_arcs) + len(self.chain_arcs)
+
+
+def _key(position: float) -> float:
+    return round(position, 6)
+
+
+def build_graph(
+    sizes: Sequence[float],
+    demands: Sequence[int],
+    capacities: Sequence[float],
+    quantities: Sequence[int],
+    max_arcs: int = MAX_ARCS
+) -> Optional[ArcFlowGraph]:
+    """
+    Bouw en comprimeer de graaf
+
+    Args:
+        sizes: Stuklengte + kerf per lengte-index
+        demands: Vraag per lengte-index
+        capacities: Latlengte + kerf per voorraadtype
+        quantities: Voorraad per type (-1 = onbeperkt, 0 = niet beschikbaar)
+        max_arcs: Grens op de ongecomprimeerde graaf
+
+    Returns:
+        De graaf, of None als hij groter wordt dan max_arcs
+    """
+    usable = [c for c, q in zip(capacities, quantities) if q != 0]
+    if not usable:
+        return None
+    longest = max(usable)
+
+    # Ongecomprimeerd: positie -> [(lengte-index, volgende positie)]
+    arcs: Dict[float, List[Tuple[int, float]]] = {0.0: []}
+    reached = [0.0]
+    num_arcs = 0
+    for i in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        size = sizes[i]
+        new = []
+        for start in reached:
+            position = start
+            for _ in range(demands[i]):
+                head = _key(position + size)
+                if head > longest + EPS:
+                    break
+                if head not in arcs:
+                    arcs[head] = []
+                    new.append(head)
+                if (i, head) not in arcs[position]:
+                    arcs[position].append((i, head))
+                    num_arcs += 1
+                position = head
+            if num_arcs > max_arcs:
+                return None
+        reached.extend(new)
+
+    # Eindknopen: één per latlengte, oplopend
+    lengths = sorted({_key(c) for c in usable})
+    target_of = {length: k for k, length in enumerate(lengths)}
+
+    def target(position: float) -> int:
+        """Kortste lat waar een pad tot deze positie op past"""
+        for length in lengths:
+            if position <= length + EPS:
+                return target_of[length]
+        raise ValueError(position)
+
+    # Compressie: van achter naar voren, knopen met dezelfde handtekening samen
+    node_ids: Dict[Tuple, int] = {}
+    node_of: Dict[float, int] = {}
+    for position in sorted(arcs, reverse=True):
+        exit_target = target(position) if position > 0 else None
+        signature = (exit_target, tuple(sorted({(i, node_of[head]) for i, head in arcs[position]})))
+        node_of[position] = node_ids.setdefault(signature, len(node_ids))
+
+    graph = ArcFlowGraph(
+        num_nodes=len(node_ids) + len(lengths),
+        source=node_of[0.0],
+        uncompressed_nodes=len(arcs),
+        uncompressed_arcs=num_arcs + len(arcs) - 1
+    )
+    offset = len(node_ids)  # Eindknopen na de gewone knopen
+    for (exit_target, out), node in sorted(node_ids.items(), key=lambda item: item[1]):
+        graph.item_arcs.extend((node, head, i) for i, head in out)
+        if exit_target is not None:
+            graph.exit_arcs.append((node, offset + exit_target))
+    graph.chain_arcs = [(offset + k, offset + k + 1) for k in range(len(lengths) - 1)]
+    graph.stock_target = [
+        offset + target_of[_key(c)] if q != 0 else None
+        for c, q in zip(capacities, quantities)
+    ]
+    return graph
+
+
+def build_arc_flow_model(
+    graph: ArcFlowGraph,
+    demands: Sequence[int],
+    stock_costs: Sequence[float],
+    stock_quantities: Sequence[int]
+) -> MipModel:
+    """
+    Stroommodel op de graaf
+
+    Variabelen: stroom per stukboog, uitgang en ketenboog, en per
+    voorraadtype het aantal latten (terugkoppeling eindknoop -> bron, met
+    de kosten en de voorraad als bovengrens). Rijen: per lengte
+    sum(stroom over zijn bogen) >= vraag, per knoop in = uit.
+    """
+    rows = [Row(f"vraag_{j}", demand, INF) for j, demand in enumerate(demands)]
+    node_rows = [Row(f"knoop_{v}", 0, 0) for v in range(graph.num_nodes)]
+    rows.extend(node_rows)
+    bins = max(1, sum(demands))  # Nooit meer latten dan stukken nodig
+
+    model = MipModel(rows=rows)
+
+    def add(cost: float, upper: float, tail: Optional[int], head: Optional[int]) -> int:
+        index = len(model.costs)
+        model.costs.append(cost)
+        model.upper.append(upper)
+        if tail is not None:
+            for node, coef in ((tail, -1), (head, 1)):
+                node_rows[node].indices.append(index)
+                node_rows[node].coefs.append(coef)
+        return index
+
+    for tail, head, i in graph.item_arcs:
+        index = add(0.0, bins, tail, head)
+        rows[i].indices.append(index)
+        rows[i].coefs.append(1)
+    for tail, head in graph.exit_arcs + graph.chain_arcs:
+        add(0.0, bins, tail, head)
+    for s, target in enumerate(graph.stock_target):
+        quantity = stock_quantities[s]
+        if target is None:
+            add(stock_costs[s], 0, None, None)  # Niet beschikbaar: vaste 0, houdt de indices gelijk
+        else:
+            add(stock_costs[s], bins if quantity == -1 else min(bins, quantity), target, graph.source)
+    return model
+
+
+def decompose(graph: ArcFlowGraph, values: Sequence[float]) -> List[Tuple[int, SparsePattern]]:
+    """
+    Splits een geheeltallige stroom in latten
+
+    Loopt steeds één eenheid stroom van de bron langs bogen met resterende
+    stroom tot een eindknoop met een voorraadtype dat nog latten over heeft.
+
+    Returns:
+        [(voorraadtype, ((lengte-index, aantal), ...)), ...]
+    """
+    flow = [int(round(v)) for v in values]
+    outgoing: Dict[int, List[Tuple[int, int, int]]] = {}  # knoop -> [(variabele, naar, lengte-index of -1)]
+    index = 0
+    for tail, head, i in graph.item_arcs:
+        outgoing.setdefault(tail, []).append((index, head, i))
+        index += 1
+    for tail, head in graph.exit_arcs + graph.chain_arcs:
+        outgoing.setdefault(tail, []).append((index, head, -1))
+        index += 1
+    stock_vars: Dict[int, List[Tuple[int, int]]] = {}  # eindknoop -> [(variabele, voorraadtype)]
+    for s, target in enumerate(graph.stock_target):
+        if target is not None:
+            stock_vars.setdefault(target, []).append((index + s, s))
+
+    bins: List[Tuple[int, SparsePattern]] = []
+    for _ in range(sum(flow[v] for v, _ in sum(stock_vars.values(), []))):
+        node = graph.source
+        counts: Dict[int, int] = {}
+        while True:
+            stock = next((s for v, s in stock_vars.get(node, ()) if flow[v] > 0), None)
+            if stock is not None:
+                flow[index + stock] -= 1
+                bins.append((stock, tuple(sorted(counts.items()))))
+                break
+            arc = next((a for a in outgoing.get(node, ()) if flow[a[0]] > 0), None)
+            if arc is None:
+                raise ValueError(f"Stroom is niet behouden in knoop {node}")
+            flow[arc[0]] -= 1
+            if arc[2] >= 0:
+                counts[arc[2]] = counts.get(arc[2], 0) + 1
+            node = arc[1]
+    return bins
@@ -0,0 +1,532 @@
+"""
+Zaagplan Optimizer - Exacte 1D solver zonder OR-Tools
+Bin completion branch-and-bound (Korf) met LP- en L2-ondergrenzen,
+in Python en NumPy
+
+Het zaagprobleem wordt bin packing met meerdere latlengtes: een stuk van
+lengte l neemt l + kerf in op een lat van L + kerf (de laatste zaagsnede
+valt weg). De zoekboom bouwt lat voor lat: elke lat bevat het grootste
+nog niet geplaatste stuk, aangevuld met een maximale combinatie van
+kleinere stukken ("completion"). Gelijke lengtes worden als aantallen
+behandeld, zodat verwisselde identieke stukken geen nieuwe takken geven.
+
+Ondergrenzen:
+- L2 (Martello & Toth) en de continue grens, in elke knoop
+- dual feasible functions (Fekete & Schepers), alleen in de wortel
+- de LP-relaxatie van het patroonmodel (Gilmore-Gomory, met
+  voorraadlimieten), in de wortel opgelost met column generation en een
+  kleine simplex. De duale waarden blijven toegelaten als er stukken en
+  latten afgaan, dus in elke knoop geeft één inproduct een geldige grens.
+  Voor snijproblemen ligt het optimum vrijwel altijd op de naar boven
+  afgeronde LP-waarde, zodat de zoektocht meestal stopt zodra hij die
+  bereikt.
+
+Snoeien:
+- kosten tot nu toe + ondergrens voor de rest >= beste oplossing
+- alleen maximale completions (er past geen resterend stuk meer bij)
+- verspilling: met de continue grens volgt uit de beste oplossing hoe
+  vol een lat minstens moet zijn om nog te kunnen verbeteren; lege
+  completions worden niet eens opgesomd
+- dominantie (Martello & Toth): een completion waarin één of twee
+  stukken vervangen kunnen worden door één groter resterend stuk dat nog
+  past, wordt overgeslagen; het ruilen levert nooit meer latten op
+- een transpositietabel: dezelfde resterende stukken en voorraad met
+  minstens dezelfde kosten is al doorzocht
+
+Bedoeld voor gematigde instanties (tot zo'n 200 stukken per profiel).
+Loopt de zoektocht tegen de deadline of de limiet op het aantal
+completions per knoop aan, dan is de beste oplossing niet bewezen
+optimaal (complete=False).
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+import math
+import time
+
+import numpy as np
+
+EPS = 1e-6
+
+# Maximaal aantal completions per knoop; daarboven is de zoektocht niet meer exact
+MAX_COMPLETIONS = 2000
+
+# Maximale omvang van de transpositietabel (wordt daarna geleegd)
+MAX_MEMO = 200_000
+
+# Hoogste k voor de dual feasible functions u_k in de wortel
+DFF_MAX_K = 12
+
+# Maximaal aantal simplex iteraties voor de LP-grens (daarna geen LP-grens)
+LP_MAX_ITERATIONS = 2000
+
+# Marge per stuk op de LP-grens tegen afrondfouten in de simplex
+LP_TOLERANCE = 1e-7
+
+# Maximaal aantal kostencombinaties bij het afronden van de LP-grens
+MAX_COST_COMBINATIONS = 100_000
+
+# Om de hoeveel knopen checkpoint() en de deadline gecontroleerd worden
+CHECK_INTERVAL = 256
+
+# Eén lat: (voorraadtype, ((grootte-index, aantal), ...))
+Bin = Tuple[int, Tuple[Tuple[int, int], ...]]
+
+
+@dataclass
+class BinProblem:
+    """Bin packing met meerdere latlengtes, kosten en voorraadlimieten"""
+    sizes: np.ndarray       # Stukgrootte incl. kerf, uniek en aflopend
+    counts: np.ndarray      # Aantal stukken per grootte
+    capacities: np.ndarray  # Latlengte + kerf per voorraadtype
+    costs: np.ndarray       # Kosten per lat per voorraadtype
+    quantities: np.ndarray  # Beschikbaar per voorraadtype (-1 = onbeperkt)
+
+
+@dataclass
+class BinSolution:
+    """Uitkomst van de zoektocht"""
+    bins: Optional[List[Bin]]  # None = niets beters dan upper_bound gevonden
+    cost: float
+    complete: bool             # Zoekboom volledig doorzocht: bins (of upper_bound) is optimaal
+    nodes: int
+    lower_bound: float         # Ondergrens in de wortel
+
+
+def l2_bound(sizes: np.ndarray, counts: np.ndarray, capacity: float) -> int:
+    """
+    Ondergrens L2 (Martello & Toth) voor het aantal latten van één lengte
+
+    Voor elke α <= C/2: stukken > C - α krijgen elk een eigen lat, net als
+    stukken in (C/2, C - α]; stukken in [α, C/2] passen hooguit in de
+    restruimte van die tweede groep, de rest vult nieuwe latten.
+    """
+    mask = counts > 0
+    w = sizes[mask]
+    n = counts[mask]
+    if not len(w):
+        return 0
+    half = capacity / 2
+    alphas = np.concatenate(([0.0], w[w <= half + EPS]))[:, None]
+    large = w > half + EPS
+    big = large & (w > capacity - alphas + EPS)
+    mid = large & ~big
+    small = ~large & (w >= alphas - EPS)
+    n1 = (big * n).sum(axis=1)
+    n2 = (mid * n).sum(axis=1)
+    free = n2 * capacity - (mid * (w * n)).sum(axis=1)
+    extra = np.ceil(np.maximum(0.0, (small * (w * n)).sum(axis=1) - free) / capacity - EPS)
+    return int((n1 + n2 + extra).max())
+
+
+def dff_bound(sizes: np.ndarray, counts: np.ndarray, capacity: float, max_k: int = DFF_MAX_K) -> int:
+    """
+    Ondergrens met dual feasible functions (Fekete & Schepers)
+
+    Elke DFF u (met u(x1) + ... + u(xm) <= 1 zolang x1 + ... + xm <= 1)
+    geeft ceil(Σ u(x)) als ondergrens. Geprobeerd worden U_ε (stukken > 1 - ε
+    tellen als 1, stukken < ε als 0) en de samenstelling met u_k
+    (x als (k+1)x geheel is, anders floor((k+1)x) / k), voor elke ε uit de
+    stukgroottes <= 1/2 en k = 1..max_k. Duurder dan L2, dus alleen in de wortel.
+    """
+    mask = counts > 0
+    x = sizes[mask] / capacity
+    n = counts[mask].astype(float)
+    if not len(x):
+        return 0
+    epsilons = np.concatenate(([0.0], x[x <= 0.5 + EPS]))[:, None]
+    ux = np.where(x > 1 - epsilons + EPS, 1.0, np.where(x < epsilons - EPS, 0.0, x))
+    ks = np.arange(1, max_k + 1)[:, None, None]
+    scaled = (ks + 1) * ux[None]
+    integral = np.abs(scaled - np.round(scaled)) < EPS
+    uk = np.where(integral, ux[None], np.floor(scaled + EPS) / ks)
+    total = max(float((uk * n).sum(axis=2).max()), float((ux * n).sum(axis=1).max()))
+    return int(math.ceil(total - EPS))
+
+
+@dataclass
+class LPBound:
+    """Optimum en duale waarden van de LP-relaxatie in de wortel"""
+    value: float
+    duals: np.ndarray   # Per stukgrootte (>= 0)
+    limits: np.ndarray  # Per voorraadtype (<= 0, 0 = onbeperkt)
+
+    def bound(self, counts: np.ndarray, quantities: np.ndarray) -> float:
+        """Ondergrens voor de resterende stukken en voorraad (zwakke dualiteit)"""
+        value = float(self.duals @ counts + self.limits @ np.maximum(quantities, 0))
+        return value - LP_TOLERANCE * (1.0 + float(counts.sum()))
+
+
+def lp_bound(problem: BinProblem, max_iterations: int = LP_MAX_ITERATIONS) -> Optional[LPBound]:
+    """
+    LP-relaxatie van het patroonmodel met column generation
+
+    min Σ c_t x_p  zodat  Σ a_p x_p >= aantallen,  Σ_{p van t} x_p <= q_t,  x >= 0
+
+    Gestart vanuit kunstmatige kolommen met hoge kosten; nieuwe patronen
+    komen uit een begrensde knapsack per voorraadtype. Omdat de kunstmatige
+    kolommen het model alleen ruimer maken, is het optimum altijd een
+    geldige ondergrens. None als de simplex niet binnen max_iterations klaar is.
+    """
+    sizes = problem.sizes
+    counts = problem.counts.astype(float)
+    d = len(sizes)
+    types = [t for t in range(len(problem.capacities)) if problem.quantities[t] != 0]
+    limited = [t for t in types if problem.quantities[t] > 0]
+    row_of = {t: d + r for r, t in enumerate(limited)}
+    m = d + len(limited)
+    b = np.concatenate((counts, [float(problem.quantities[t]) for t in limited]))
+    big = 10.0 * float(problem.costs.max()) + 1.0
+
+    # Kolommen: kunstmatig (+e_i), surplus (-e_i), slack (+e_r); patronen komen erbij
+    eye = np.eye(m)
+    columns = [eye[:, i] for i in range(d)] + [-eye[:, i] for i in range(d)] + [eye[:, i] for i in range(d, m)]
+    costs = [big] * d + [0.0] * m
+    basis = list(range(d)) + list(range(2 * d, 2 * d + len(limited)))
+
+    for _ in range(max_iterations):
+        matrix = np.array(columns).T
+        basic = matrix[:, basis]
+        x = np.linalg.solve(basic, b)
+        y = np.linalg.solve(basic.T, np.array(costs)[basis])
+        reduced = np.array(costs) - y @ matrix
+        entering = int(reduced.argmin())
+        if reduced[entering] >= -EPS:
+            # Pricing: het patroon met de laagste gereduceerde kosten per voorraadtype
+            best: Optional[Tuple[float, int, np.ndarray]] = None
+            for t in types:
+                row = row_of.get(t)
+                value, pattern = _knapsack(y[:d], sizes, problem.counts, float(problem.capacities[t]))
+                cost = float(problem.costs[t]) - value - (y[row] if row is not None else 0.0)
+                if cost < -EPS and (best is None or cost < best[0]):
+                    column = np.zeros(m)
+                    column[:d] = pattern
+                    if row is not None:
+                        column[row] = 1.0
+                    best = (cost, t, column)
+            if best is None:
+                limits = np.zeros(len(problem.capacities))
+                for t, row in row_of.items():
+                    limits[t] = min(0.0, y[row])
+                return LPBound(float(y @ b), np.maximum(y[:d], 0.0), limits)
+            entering = len(columns)
+            columns.append(best[2])
+            costs.append(float(problem.costs[best[1]]))
+        direction = np.linalg.solve(basic, columns[entering])
+        ratios = [
+            (max(x[i], 0.0) / direction[i], basis[i], i)
+            for i in range(m) if direction[i] > 1e-9
+        ]
+        if not ratios:
+            return None
+        basis[min(ratios)[2]] = entering
+    return None
+
+
+def _knapsack(
+    values: np.ndarray,
+    sizes: np.ndarray,
+    counts: np.ndarray,
+    capacity: float
+) -> Tuple[float, np.ndarray]:
+    """
+    Exacte begrensde knapsack (branch & bound): maximaal Σ waarde · aantal
+    met Σ grootte · aantal <= capacity en aantal <= counts
+    """
+    items = [
+        (float(values[i]), float(sizes[i]), int(counts[i]), i)
+        for i in range(len(sizes))
+        if values[i] > EPS and counts[i] > 0 and sizes[i] <= capacity + EPS
+    ]
+    items.sort(key=lambda item: item[0] / item[1], reverse=True)
+    take = np.zeros(len(sizes))
+    best = [0.0, take.copy()]
+
+    def search(k: int, left: float, value: float):
+        if value > best[0] + EPS:
+            best[0], best[1] = value, take.copy()
+        # LP-relaxatie van de resterende items
+        bound, room = value, left
+        for item_value, size, count, _ in items[k:]:
+            if count * size <= room:
+                bound += count * item_value
+                room -= count * size
+            else:
+                bound += item_value * room / size
+                break
+        if k == len(items) or bound <= best[0] + EPS:
+            return
+        item_value, size, count, i = items[k]
+        for n in range(min(count, int((left + EPS) // size)), -1, -1):
+            take[i] = n
+            search(k + 1, left - n * size, value + n * item_value)
+        take[i] = 0
+
+    search(0, capacity, 0.0)
+    return best[0], best[1]
+
+
+def round_up_cost(bound: float, costs: np.ndarray, quantities: np.ndarray) -> float:
+    """
+    Laagste haalbare totale kosten Σ c_t · k_t >= bound (k_t <= q_t)
+
+    Met gelijke kosten is dat gewoon naar boven afronden op een veelvoud;
+    anders worden de combinaties opgesomd (tot MAX_COST_COMBINATIONS).
+    """
+    if not math.isfinite(bound) or bound <= EPS:
+        return bound
+    available = quantities != 0
+    prices = costs[available].astype(float)
+    limits = quantities[available]
+    if np.ptp(prices) <= EPS:
+        return float(prices[0]) * math.ceil(bound / float(prices[0]) - EPS)
+    order = np.argsort(prices)[::-1]
+    prices, limits = prices[order].tolist(), limits[order].tolist()
+    best = [math.inf]
+    steps = [0]
+
+    def search(t: int, total: float):
+        steps[0] += 1
+        if total >= bound - EPS:
+            best[0] = min(best[0], total)
+            return
+        if t == len(prices) or steps[0] > MAX_COST_COMBINATIONS:
+            return
+        most = math.ceil((bound - total) / prices[t] - EPS)
+        if limits[t] >= 0:
+            most = min(most, limits[t])
+        for k in range(most, -1, -1):
+            if total + k * prices[t] < best[0] - EPS:
+                search(t + 1, total + k * prices[t])
+
+    search(0, 0.0)
+    if steps[0] > MAX_COST_COMBINATIONS or not math.isfinite(best[0]):
+        return bound
+    return best[0]
+
+
+def lower_bound(problem: BinProblem, counts: np.ndarray, quantities: np.ndarray) -> float:
+    """
+    Ondergrens voor de kosten van de resterende stukken
+
+    L2 op de langste beschikbare lat maal de laagste kosten, en de
+    continue grens (goedkoopste kosten per mm maal de totale lengte).
+    Voorraadlimieten worden genegeerd; dat houdt de grens geldig.
+    """
+    available = quantities != 0
+    if not counts.any():
+        return 0.0
+    if not available.any():
+        return math.inf
+    capacities = problem.capacities[available]
+    costs = problem.costs[available]
+    bins = l2_bound(problem.sizes, counts, float(capacities.max()))
+    continuous = float((problem.sizes * counts).sum() * (costs / capacities).min())
+    return max(bins * float(costs.min()), continuous)
+
+
+def completions(
+    sizes: np.ndarray,
+    counts: np.ndarray,
+    first: int,
+    capacity: float,
+    limit: int,
+    min_used: float = 0.0
+) -> Tuple[List[Tuple[Tuple[Tuple[int, int], ...], float]], bool]:
+    """
+    Maximale, niet gedomineerde completions van een lat met stuk first
+    die minstens min_used van de lat vullen
+
+    Returns:
+        ([(((grootte-index, aantal), ...), gebruikte lengte), ...], volledig)
+    """
+    sizes_list = sizes.tolist()
+    left = counts.tolist()
+    left[first] -= 1
+    n = len(sizes_list)
+    # Kleinste grootte die vanaf index j nog beschikbaar is (voor de maximaliteit)
+    smallest = [math.inf] * (n + 1)
+    # Totale lengte die vanaf index j nog beschikbaar is
+    volume = [0.0] * (n + 1)
+    for j in range(n - 1, -1, -1):
+        smallest[j] = min(sizes_list[j], smallest[j + 1]) if left[j] > 0 else smallest[j + 1]
+        volume[j] = volume[j + 1] + sizes_list[j] * left[j]
+    max_rest = capacity - min_used
+
+    found: List[Tuple[Tuple[Tuple[int, int], ...], float]] = []
+    chosen: List[Tuple[int, int]] = [(first, 1)]
+    complete = True
+
+    def extend(j: int, rest: float, skipped: float):
+        # skipped: kleinste grootte die eerder (deels) is overgeslagen
+        nonlocal complete
+        if len(found) >= limit:
+            complete = False
+            return
+        # Ook met alle resterende stukken niet vol genoeg, of niet meer maximaal te maken
+        if rest - volume[j] > max_rest + EPS or rest - volume[j] >= skipped - EPS:
+            return
+        if j == n or rest < smallest[j] - EPS:
+            if min(skipped, smallest[j]) > rest + EPS and rest <= max_rest + EPS:
+                items = _merge(chosen)
+                if not _dominated(items, first, sizes_list, left, rest):
+                    found.append((items, capacity - rest))
+            return
+        size = sizes_list[j]
+        most = min(left[j], int((rest + EPS) // size))
+        for k in range(most, -1, -1):
+            if k:
+                chosen.append((j, k))
+            # Minder dan het maximum genomen: dit stuk is overgeslagen
+            extend(j + 1, rest - k * size, skipped if k == left[j] else min(skipped, size))
+            if k:
+                chosen.pop()
+
+    extend(first, capacity - sizes_list[first], math.inf)
+    return found, complete
+
+
+def _dominated(
+    items: Tuple[Tuple[int, int], ...],
+    first: int,
+    sizes: List[float],
+    left: List[int],
+    rest: float
+) -> bool:
+    """
+    Kan een resterend stuk x één gekozen stuk y < x vervangen, of twee
+    gekozen stukken met y1 + y2 <= x, zodat het nog past (x <= y + rest)?
+    """
+    taken = dict(items)
+    taken[first] -= 1  # Het verplichte stuk doet niet mee
+    chosen = [sizes[j] for j, k in taken.items() for _ in range(k)]
+    if not chosen:
+        return False
+    pairs = {a + b for i, a in enumerate(chosen) for b in chosen[i + 1:]}
+    for j in range(len(sizes)):
+        if left[j] <= taken.get(j, 0):
+            continue
+        x = sizes[j]
+        if any(x - rest - EPS <= y < x - EPS for y in chosen):
+            return True
+        if any(x - rest - EPS <= pair <= x + EPS for pair in pairs):
+            return True
+    return False
+
+
+def _merge(chosen: List[Tuple[int, int]]) -> Tuple[Tuple[int, int], ...]:
+    merged: Dict[int, int] = {}
+    for j, k in chosen:
+        merged[j] = merged.get(j, 0) + k
+    return tuple(sorted(merged.items()))
+
+
+def solve(
+    problem: BinProblem,
+    upper_bound: float = math.inf,
+    deadline: Optional[float] = None,
+    checkpoint: Optional[Callable[[], object]] = None,
+    on_solution: Optional[Callable[[List[Bin], float], object]] = None,
+    max_completions: int = MAX_COMPLETIONS
+) -> BinSolution:
+    """
+    Branch-and-bound tot de optimale oplossing, of tot de deadline
+
+    Args:
+        upper_bound: Kosten van een bekende oplossing (alleen betere tellen)
+        deadline: time.time() waarop de zoektocht stopt (complete=False)
+        checkpoint: Periodiek aangeroepen (bijv. CancelToken.check)
+        on_solution: Aangeroepen bij elke verbeterde oplossing (bins, kosten)
+    """
+    counts = problem.counts.astype(np.int64).copy()
+    quantities = problem.quantities.astype(np.int64).copy()
+    root_bound = lower_bound(problem, counts, quantities)
+    lp: Optional[LPBound] = None
+    if np.isfinite(root_bound) and counts.any():
+        longest = float(problem.capacities[quantities != 0].max())
+        dff = dff_bound(problem.sizes, counts, longest) * float(problem.costs[quantities != 0].min())
+        lp = lp_bound(problem)
+        root_bound = max(root_bound, dff, lp.bound(counts, quantities) if lp is not None else 0.0)
+        root_bound = round_up_cost(root_bound, problem.costs, quantities)
+    # Met gelijke kosten is afronden in elke knoop gratis
+    uniform = lp is not None and np.ptp(problem.costs) <= EPS
+    best: Dict[str, object] = {"bins": None, "cost": upper_bound}
+    memo: Dict[Tuple[bytes, bytes], float] = {}
+    stack: List[Bin] = []
+    state = {"nodes": 0, "complete": True, "stopped": False, "proven": False}
+    order = np.argsort(problem.capacities)  # Korte latten eerst bij gelijke efficiëntie
+
+    def search(cost: float):
+        state["nodes"] += 1
+        if state["nodes"] % CHECK_INTERVAL == 0:
+            if checkpoint is not None:
+                checkpoint()
+            if deadline is not None and time.time() >= deadline:
+                state["stopped"] = True
+        if state["stopped"] or state["proven"]:
+            return
+        if not counts.any():
+            if cost < best["cost"] - EPS:
+                best["bins"], best["cost"] = list(stack), cost
+                # Gelijk aan de ondergrens in de wortel: klaar
+                state["proven"] = cost <= root_bound + EPS
+                if on_solution is not None:
+                    on_solution(list(stack), cost)
+            return
+        bound = lower_bound(problem, counts, quantities)
+        if lp is not None and math.isfinite(bound):
+            bound = max(bound, lp.bound(counts, quantities))
+            if uniform:
+                bound = round_up_cost(bound, problem.costs, quantities)
+        if cost + bound >= best["cost"] - EPS:
+            return
+        key = (counts.tobytes(), quantities.tobytes())
+        if memo.get(key, math.inf) <= cost + EPS:
+            return
+        if len(memo) >= MAX_MEMO:
+            memo.clear()
+        memo[key] = cost
+
+        first = int(np.flatnonzero(counts)[0])  # Grootste resterende stuk
+        # Verbeteren kan alleen als cost + c_t + (volume - gebruikt) * rate < best
+        available = quantities != 0
+        rate = float((problem.costs[available] / problem.capacities[available]).min())
+        volume = float((problem.sizes * counts).sum())
+        options = []
+        for t in order:
+            t = int(t)
+            if quantities[t] == 0 or problem.capacities[t] < problem.sizes[first] - EPS:
+                continue
+            min_used = (cost + float(problem.costs[t]) + volume * rate - best["cost"]) / rate + EPS
+            found, complete = completions(
+                problem.sizes, counts, first, float(problem.capacities[t]), max_completions, min_used
+            )
+            state["complete"] = state["complete"] and complete
+            options.extend((float(problem.costs[t]) / used, -used, t, items) for items, used in found)
+        options.sort(key=lambda option: option[:2])
+
+        for _, _, t, items in options:
+            limited = quantities[t] > 0  # -1 = onbeperkt, blijft staan
+            for j, k in items:
+                counts[j] -= k
+            quantities[t] -= limited
+            stack.append((t, items))
+            search(cost + float(problem.costs[t]))
+            stack.pop()
+            quantities[t] += limited
+            for j, k in items:
+                counts[j] += k
+            if state["stopped"] or state["proven"]:
+                return
+
+    if root_bound < upper_bound - EPS:
+        search(0.0)
+    return BinSolution(
+        bins=best["bins"],
+        cost=best["cost"],
+        complete=state["proven"] or (state["complete"] and not state["stopped"]),
+        nodes=state["nodes"],
+        lower_bound=root_bound
+    )
@@ -0,0 +1,75 @@
+"""
+Zaagplan Optimizer - Annuleren
+Coöperatief afbreken van een lopende optimalisatie
+
+De API maakt per request een CancelToken en annuleert die zodra de client
+de verbinding verbreekt. De optimizers roepen check() aan tussen fasen en
+in hun lussen; dat kost één Event.is_set() per aanroep. Een lopende
+solver (SCIP, CP-SAT) wordt via on_cancel() direct onderbroken.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Callable, List
+from contextlib import contextmanager
+import threading
+
+
+class SolveCancelled(Exception):
+    """De optimalisatie is geannuleerd (client weg)"""
+
+
+class DeadlineReached(Exception):
+    """De deadline is verstreken; de optimizer levert het beste plan tot nu toe"""
+
+
+class CancelToken:
+    """Thread-safe annuleersignaal met callbacks voor lopende solvers"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], object]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """Annuleer; geregistreerde callbacks worden direct aangeroepen"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def check(self):
+        """SolveCancelled als er geannuleerd is"""
+        if self._event.is_set():
+            raise SolveCancelled()
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], object]):
+        """Roep callback aan bij annuleren zolang het blok loopt"""
+        with self._lock:
+            self._callbacks.append(callback)
+            cancelled = self._event.is_set()
+        if cancelled:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.remove(callback)
+
+
+class _NeverCancelled(CancelToken):
+    """Standaard token dat nooit annuleert (cancel() doet niets)"""
+
+    def cancel(self):
+        pass
+
+
+NEVER_CANCELLED = _NeverCancelled()
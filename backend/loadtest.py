@@ -0,0 +1,432 @@
+"""
+Zaagplan Optimizer - Load test
+Belast /optimize/1d met een mix van realistische requests en rapporteert
+latency (p50/p95/p99), doorvoer en foutpercentage per algoritme
+
+Zonder --url draait de echte ASGI app in dit proces (httpx ASGITransport);
+met --url gaat het verkeer naar een draaiende server (uvicorn of serve.py).
+Elk plan wordt gevalideerd (zie validation.py); een ongeldig plan telt als
+fout en staat apart in de kolom "ongeldig".
+
+Met --calibrate meet het één request tegelijk de rekentijd over een reeks
+groottes per algoritme en MIP model, en past het de constanten van
+admission.estimate_seconds daarop aan (toelating staat daarbij uit).
+
+Gebruik:
+    python loadtest.py --requests 200 --concurrency 8
+    python loadtest.py --url http://localhost:8000 --duration 60 --mix ffd=6,hybrid=3,ortools_optimal=1
+    python loadtest.py --calibrate
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Dict, List, Optional, Tuple
+from contextlib import nullcontext, redirect_stdout
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+import numpy as np
+
+# Standaard verhouding van de requests per algoritme
+DEFAULT_MIX = {"ffd": 6, "hybrid": 3, "ortools_optimal": 1}
+
+STOCK_LENGTHS = (2400, 3000, 4000, 5400, 6000)
+
+
+# ============ PAYLOADS ============
+
+def small_payload(rng: random.Random) -> dict:
+    """Klein klusje: een paar lengtes, één voorraadlengte"""
+    return {
+        "parts": [
+            {"id": f"p{i}", "length": rng.randrange(300, 2400, 10), "quantity": rng.randint(1, 5)}
+            for i in range(rng.randint(3, 6))
+        ],
+        "stocks": [{"id": "lat", "length": rng.choice(STOCK_LENGTHS[2:]), "quantity": -1}],
+    }
+
+
+def medium_payload(rng: random.Random) -> dict:
+    """Gemiddelde zaaglijst: tientallen onderdelen, twee voorraadlengtes, af en toe te lang"""
+    max_stock = rng.choice(STOCK_LENGTHS[3:])
+    return {
+        "parts": [
+            {"id": f"p{i}", "length": rng.randrange(250, max_stock + 1500, 5), "quantity": rng.randint(1, 10)}
+            for i in range(rng.randint(20, 40))
+        ],
+        "stocks": [
+            {"id": "kort", "length": rng.choice(STOCK_LENGTHS[:3]), "quantity": -1},
+            {"id": "lang", "length": max_stock, "quantity": -1},
+        ],
+        "max_split_parts": 2,
+    }
+
+
+def large_payload(rng: random.Random) -> dict:
+    """Grote bestelling met terugkerende maten, voor de exacte solver"""
+    lengths = sorted(rng.sample(range(500, 2500, 10), 6))
+    return {
+        "parts": [
+            {"id": f"p{i}", "length": rng.choice(lengths), "quantity": rng.randint(5, 20)}
+            for i in range(rng.randint(15, 25))
+        ],
+        "stocks": [
+            {"id": "lat6", "length": 6000, "quantity": -1},
+            {"id": "lat45", "length": 4500, "quantity": rng.randint(5, 15)},
+        ],
+        "time_limit": 10,
+    }
+
+
+PAYLOADS = {
+    "ffd": small_payload,
+    "hybrid": medium_payload,
+    "smart_split": medium_payload,
+    "ortools_optimal": large_payload,
+    "ortools_fast": large_payload,
+    "exact": small_payload,
+}
+
+
+def build_requests(mix: Dict[str, int], count: int, seed: int = 0) -> List[Tuple[str, dict]]:
+    """Vaste (seed) reeks van (algoritme, body) volgens de mix"""
+    rng = random.Random(seed)
+    algorithms = list(mix)
+    weights = [mix[a] for a in algorithms]
+    requests = []
+    for _ in range(count):
+        algorithm = rng.choices(algorithms, weights)[0]
+        body = PAYLOADS[algorithm](rng)
+        body["algorithm"] = algorithm
+        body["validate"] = True
+        requests.append((algorithm, body))
+    return requests
+
+
+# ============ UITVOERING ============
+
+@dataclass
+class Sample:
+    algorithm: str
+    latency: float  # seconden
+    ok: bool
+    status: int
+    error: str = ""
+    invalid: bool = False  # Server keurde het eigen plan af (validatie)
+
+
+@dataclass
+class Report:
+    """Resultaat van een load test run"""
+    duration: float
+    concurrency: int
+    samples: List[Sample] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, dict]:
+        """Statistieken per algoritme en totaal ("all")"""
+        groups: Dict[str, List[Sample]] = {}
+        for sample in self.samples:
+            groups.setdefault(sample.algorithm, []).append(sample)
+        groups["all"] = self.samples
+        return {name: summarize(samples, self.duration) for name, samples in groups.items()}
+
+
+def summarize(samples: List[Sample], duration: float) -> dict:
+    latencies = np.array([s.latency for s in samples if s.ok]) * 1000
+    errors = sum(1 for s in samples if not s.ok)
+    invalid = sum(1 for s in samples if s.invalid)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "invalid": invalid,
+        "throughput": round(len(samples) / duration, 2) if duration > 0 else 0.0,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(latencies.max()), 2) if len(latencies) else 0.0,
+    }
+
+
+def make_client(url: Optional[str], timeout: float) -> httpx.AsyncClient:
+    """Client naar een server (url) of naar de app in dit proces"""
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    import main
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app),
+        base_url="http://loadtest",
+        timeout=timeout
+    )
+
+
+async def run(
+    requests: List[Tuple[str, dict]],
+    concurrency: int = 4,
+    url: Optional[str] = None,
+    duration: Optional[float] = None,
+    timeout: float = 120.0
+) -> Report:
+    """
+    Verstuur de requests met een vast aantal gelijktijdige clients
+
+    Met duration worden de requests herhaald tot de tijd om is.
+    """
+    queue: "asyncio.Queue[Tuple[str, dict]]" = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    samples: List[Sample] = []
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    async def client_loop(client: httpx.AsyncClient, offset: int):
+        # Elke virtuele client apart, voor de quota per client (zie admission.py)
+        headers = {"X-Client-Id": f"loadtest-{offset}"}
+        index = offset
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+                algorithm, body = requests[index % len(requests)]
+                index += concurrency
+            else:
+                try:
+                    algorithm, body = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+            sent = time.perf_counter()
+            try:
+                response = await client.post("/optimize/1d", json=body, headers=headers)
+                ok = response.status_code == 200
+                invalid = response.status_code == 500 and '"validation"' in response.text
+                samples.append(Sample(
+                    algorithm, time.perf_counter() - sent, ok, response.status_code,
+                    "" if ok else response.text[:200], invalid
+                ))
+            except httpx.HTTPError as e:
+                samples.append(Sample(algorithm, time.perf_counter() - sent, False, 0, repr(e)))
+
+    async with make_client(url, timeout) as client:
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+
+    return Report(duration=time.perf_counter() - start, concurrency=concurrency, samples=samples)
+
+
+def print_report(report: Report):
+    print(f"\n{len(report.samples)} requests in {report.duration:.1f}s, concurrency {report.concurrency}")
+    header = (f"{'algoritme':<16}{'requests':>9}{'fouten':>8}{'ongeldig':>10}{'fout%':>7}{'req/s':>8}"
+              f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print(header)
+    print("-" * len(header))
+    for name, stats in report.summary().items():
+        print(
+            f"{name:<16}{stats['requests']:>9}{stats['errors']:>8}{stats['invalid']:>10}{stats['error_rate'] * 100:>6.1f}%"
+            f"{stats['throughput']:>8.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+    errors = [s for s in report.samples if not s.ok]
+    for sample in errors[:5]:
+        print(f"  fout ({sample.algorithm}, status {sample.status}): {sample.error}")
+
+
+# ============ KALIBRATIE ============
+
+# Deadline per kalibratie-request; runs die hem halen tellen niet mee in de fit
+CALIBRATION_TIME_LIMIT = 20.0
+
+
+def calibration_payload(
+    rng: random.Random,
+    algorithm: str,
+    distinct: int,
+    quantity: int,
+    stock_lengths: Tuple[int, ...],
+    formulation: str = "auto"
+) -> dict:
+    """distinct verschillende lengtes van elk 1..quantity stuks, onbeperkte voorraad"""
+    return {
+        "parts": [
+            {"id": f"p{i}", "length": length, "quantity": rng.randint(1, quantity)}
+            for i, length in enumerate(rng.sample(range(250, 2600, 5), distinct))
+        ],
+        "stocks": [{"id": f"lat{length}", "length": length, "quantity": -1} for length in stock_lengths],
+        "algorithm": algorithm,
+        "formulation": formulation,
+        "max_split_parts": 1,
+        "time_limit": CALIBRATION_TIME_LIMIT,
+        "solver_threads": 1,
+    }
+
+
+def calibration_requests(seed: int = 0, repeats: int = 3) -> List[Tuple[str, dict]]:
+    """(reeks, body): greedy over het aantal stukken, de exacte modellen over het aantal lengtes"""
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(repeats):
+        for quantity in (5, 20, 60, 150):
+            for stocks in ((6000,), (6000, 4000)):
+                for algorithm in ("ffd", "hybrid"):
+                    requests.append((algorithm, calibration_payload(rng, algorithm, 12, quantity, stocks)))
+        for distinct in (2, 4, 6, 8, 10, 15, 20, 30, 40):
+            requests.append(("patterns", calibration_payload(rng, "ortools_optimal", distinct, 8, (6000,), "patterns")))
+        for distinct in (2, 4, 6, 8, 10, 12, 14, 16, 18):
+            requests.append(("arc_flow", calibration_payload(
+                rng, "ortools_optimal", distinct, 8, (6000, 4000), "arc_flow"
+            )))
+        for distinct in (2, 4, 6, 8, 10, 12, 14, 16, 20):
+            requests.append(("exact", calibration_payload(rng, "exact", distinct, 8, (6000, 4000))))
+    return requests
+
+
+async def measure(requests: List[Tuple[str, dict]], url: Optional[str], timeout: float) -> List[dict]:
+    """Eén request tegelijk; per request de grootte en de rekentijd van de optimizer"""
+    import admission
+    from optimizer_1d import Part, Stock
+    rows = []
+    async with make_client(url, timeout) as client:
+        for series, body in requests:
+            response = await client.post("/optimize/1d", json=body)
+            if response.status_code != 200:
+                print(f"  {series}: status {response.status_code}, overgeslagen")
+                continue
+            data = response.json()
+            size = admission.request_size(
+                [Part(p["id"], p["length"], p["quantity"]) for p in body["parts"]],
+                [Stock(s["id"], s["length"], s["quantity"]) for s in body["stocks"]],
+                body["max_split_parts"]
+            )
+            rows.append({
+                "series": series,
+                "formulation": data["formulation"],
+                "fallback": data["fallback"],
+                "pieces": size.pieces,
+                "distinct_lengths": size.distinct_lengths,
+                "stock_types": size.stock_types,
+                "seconds": data["computation_time_ms"] / 1000,
+                "censored": data["deadline_reached"],
+            })
+    return rows
+
+
+def fit_constants(rows: List[dict]) -> Dict[str, float]:
+    """
+    Kleinste kwadraten per reeks, in de vorm van admission.estimate_seconds:
+    greedy lineair in stukken × latten × voorraadtypes, HYBRID een factor
+    daarop, patronen lineair in patronen × lengtes, arc-flow en EXACT
+    exponentieel in het aantal lengtes (alleen runs binnen de deadline)
+    """
+    import admission
+
+    def series(name: str, **match) -> List[dict]:
+        return [
+            r for r in rows
+            if r["series"] == name and not r["censored"] and not r["fallback"]
+            and all(r[key] == value for key, value in match.items())
+        ]
+
+    constants: Dict[str, float] = {}
+    ffd = series("ffd")
+    if ffd:
+        x = np.array([admission.greedy_work(r["pieces"], r["stock_types"]) for r in ffd])
+        y = np.array([r["seconds"] for r in ffd])
+        (slope, base), *_ = np.linalg.lstsq(np.column_stack([x, np.ones_like(x)]), y, rcond=None)
+        constants["GREEDY_SECONDS_PER_STEP"] = max(float(slope), 1e-12)
+        constants["GREEDY_BASE_SECONDS"] = max(float(base), 0.0)
+    hybrid = series("hybrid")
+    if hybrid and "GREEDY_SECONDS_PER_STEP" in constants:
+        ratios = [
+            r["seconds"] / (constants["GREEDY_SECONDS_PER_STEP"] * admission.greedy_work(r["pieces"], r["stock_types"])
+                            + constants["GREEDY_BASE_SECONDS"])
+            for r in hybrid
+        ]
+        constants["HYBRID_FACTOR"] = float(np.percentile(ratios, 90))
+    patterns = series("patterns", formulation="patterns")
+    if patterns:
+        x = np.array([admission.pattern_work(r["distinct_lengths"]) for r in patterns])
+        y = np.array([r["seconds"] for r in patterns])
+        (slope, base), *_ = np.linalg.lstsq(np.column_stack([x, np.ones_like(x)]), y, rcond=None)
+        constants["PATTERN_SECONDS_PER_STEP"] = max(float(slope), 1e-12)
+        constants["PATTERN_BASE_SECONDS"] = max(float(base), 0.0)
+    for name, prefix in (("arc_flow", "ARC_FLOW"), ("exact", "EXACT")):
+        match = {"formulation": "arc_flow"} if name == "arc_flow" else {}
+        points = [r for r in series(name, **match) if r["seconds"] > 0]
+        if len(points) < 2:
+            continue
+        d = np.array([r["distinct_lengths"] for r in points], dtype=float)
+        log_seconds = np.log([r["seconds"] for r in points])
+        (growth, base), *_ = np.linalg.lstsq(np.column_stack([d, np.ones_like(d)]), log_seconds, rcond=None)
+        constants[f"{prefix}_BASE_SECONDS"] = float(np.exp(base))
+        constants[f"{prefix}_GROWTH"] = float(np.exp(growth))
+    return constants
+
+
+def print_calibration(rows: List[dict], constants: Dict[str, float]):
+    print(f"\n{len(rows)} metingen")
+    print(f"{'reeks':<10}{'model':<10}{'stukken':>9}{'lengtes':>9}{'types':>7}{'s':>10}")
+    for r in rows:
+        mark = " (deadline)" if r["censored"] else f" (fallback {r['fallback']})" if r["fallback"] else ""
+        print(f"{r['series']:<10}{r['formulation'] or '-':<10}{r['pieces']:>9}{r['distinct_lengths']:>9}"
+              f"{r['stock_types']:>7}{r['seconds']:>10.3f}{mark}")
+    print("\n# Constanten voor admission.py")
+    for name, value in constants.items():
+        print(f"{name} = {value:.3g}")
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """'ffd=6,hybrid=3' -> {'ffd': 6, 'hybrid': 3}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in PAYLOADS:
+            raise argparse.ArgumentTypeError(f"Onbekend algoritme in mix: {name}. Kies uit: {list(PAYLOADS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test voor /optimize/1d")
+    parser.add_argument("--url", help="Server URL (standaard: app in dit proces)")
+    parser.add_argument("--requests", type=int, default=100, help="Aantal verschillende requests")
+    parser.add_argument("--duration", type=float, help="Herhaal de requests tot zoveel seconden om zijn")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Bijv. ffd=6,hybrid=3,ortools_optimal=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout per request in seconden")
+    parser.add_argument("--json", action="store_true", help="Samenvatting als JSON")
+    parser.add_argument("--verbose", action="store_true", help="Toon de uitvoer van de optimizers (in-process)")
+    parser.add_argument("--calibrate", action="store_true", help="Meet de rekentijd en pas de toelatingsconstanten aan")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        # In-process zonder toelating, anders worden de grote metingen teruggeschaald
+        os.environ.setdefault("ZAAGPLAN_MAX_SOLVE_SECONDS", "inf")
+        quiet = not args.url and not args.verbose
+        with open(os.devnull, "w") as devnull, (redirect_stdout(devnull) if quiet else nullcontext()):
+            rows = asyncio.run(measure(calibration_requests(args.seed), args.url, args.timeout))
+        constants = fit_constants(rows)
+        if args.json:
+            print(json.dumps({"measurements": rows, "constants": constants}, indent=2))
+        else:
+            print_calibration(rows, constants)
+        return
+
+    requests = build_requests(args.mix, args.requests, args.seed)
+    # In-process printen de optimizers naar stdout; dat vertekent de meting en het rapport
+    quiet = not args.url and not args.verbose
+    with open(os.devnull, "w") as devnull, (redirect_stdout(devnull) if quiet else nullcontext()):
+        report = asyncio.run(run(requests, args.concurrency, args.url, args.duration, args.timeout))
+    if args.json:
+        print(json.dumps(report.summary(), indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
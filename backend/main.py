@@ -5,13 +5,18 @@ REST API voor 1D en 2D optimalisatie
 Auteur: OpenAEC (Jochem Bosman & Claude)
 """
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, ValidationError
-from typing import List, Optional
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import logging
 import json
+import time
 
 # Logging configuratie
 logging.basicConfig(
@@ -26,16 +31,72 @@ from optimizer_1d import (
     Part, 
     Stock, 
     Algorithm, 
+    SplitPolicy,
+    Formulation,
     result_to_dict,
     ORTOOLS_AVAILABLE
 )
+from remnants import RemnantStore, offer_remnants, apply_result, REMNANT_PREFIX
+from validation import VALIDATE_DEFAULT
+from plan_store import PlanStore, PlanRecord
+from solvers import PRELOAD_ORTOOLS, Solver, available_solvers, preload
+from pattern_store import default_store
+from parallel import shutdown_pool, warm_pool
+from cancellation import CancelToken, SolveCancelled
+import admission
+import metrics
+from profiling import Profiler, PROFILE_DIR
+from optimizer_2d import (
+    Optimizer2D,
+    Part2D,
+    Sheet,
+    Algorithm2D,
+    result_to_dict_2d
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # De lifespan loopt in elke uvicorn worker: OR-Tools per worker laden,
+    # vóór de pool, zodat geforkte pool processen het al hebben
+    if PRELOAD_ORTOOLS and preload():
+        logger.info("OR-Tools vooraf geladen")
+    # Vaak gebruikte patroonfamilies alvast in het geheugen
+    warmed = default_store().warm()
+    logger.info(f"Patroonbibliotheek: {warmed} families geladen")
+    # Gedeelde process pool (ZAAGPLAN_POOL_PROCESSES) vullen vóór de eerste request
+    processes = warm_pool()
+    if processes:
+        logger.info(f"Process pool: {processes} processen gestart")
+    # Metrics van alle workers samen op /metrics (ZAAGPLAN_METRICS_DB)
+    if metrics.start_sharing():
+        logger.info(f"Metrics gedeeld via {metrics.SHARED_DB_PATH}")
+    yield
+    metrics.stop_sharing()
+    shutdown_pool()
+    # Geheugentreffers van deze worker tellen mee bij de volgende warm()
+    default_store().flush_hits()
+
 
 app = FastAPI(
     title="Zaagplan Optimizer API",
     description="REST API voor 1D en 2D zaagplan optimalisatie",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Reststukken voorraad (SQLite, pad via ZAAGPLAN_REMNANTS_DB)
+remnant_store = RemnantStore()
+
+# Recente plannen voor incrementele her-optimalisatie
+plan_store = PlanStore()
+
+# Lopende optimalisaties per client (ZAAGPLAN_CLIENT_CONCURRENCY)
+client_quota = admission.ClientQuota()
+
+# Pogingen als reststukken van een plan intussen door een ander request
+# gebruikt zijn (de laatste plant zonder reststukken)
+REMNANT_ATTEMPTS = 3
+
 # CORS voor frontend
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +112,7 @@ app.add_middleware(
 async def log_requests(request: Request, call_next):
     """Log alle requests voor debugging"""
     logger.info(f"→ {request.method} {request.url.path}")
+    start = time.perf_counter()
     
     # Log request body voor POST
     if request.method == "POST":
@@ -61,14 +123,20 @@ async def log_requests(request: Request, call_next):
                 logger.debug(f"  Request body: {json.dumps(body_json, indent=2)[:1000]}...")
             except:
                 logger.debug(f"  Request body (raw): {body[:500]}")
-        
-        # Reset body zodat endpoint het kan lezen
-        async def receive():
-            return {"type": "http.request", "body": body}
-        request._receive = receive
+        # Starlette geeft de gelezen body zelf door aan het endpoint; de
+        # receive hier vervangen zou ook de disconnect van de client verbergen
     
     response = await call_next(request)
     logger.info(f"← {request.method} {request.url.path} → {response.status_code}")
+    
+    # Route-sjabloon als label, zodat onbekende paden geen nieuwe series maken
+    route = request.scope.get("route")
+    metrics.REQUEST_DURATION.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        path=getattr(route, "path", "onbekend"),
+        status=str(response.status_code)
+    )
     return response
 
 
@@ -79,6 +147,7 @@ class PartInput(BaseModel):
     length: float
     quantity: int = 1
     label: Optional[str] = None
+    profile: str = ""  # Profiel/materiaal, onderdelen worden per profiel geoptimaliseerd
 
 
 class StockInput(BaseModel):
@@ -87,15 +156,83 @@ class StockInput(BaseModel):
     quantity: int = -1
     cost: float = 1.0
     label: Optional[str] = None
+    profile: str = ""
 
 
 class Optimize1DRequest(BaseModel):
     parts: List[PartInput]
     stocks: List[StockInput]
     kerf: float = 3.0
+    trim: float = 0.0  # Haaks afzagen van het begin van elke lat (0 = niet)
     algorithm: str = "hybrid"
     max_split_parts: int = 2  # Max aantal delen per onderdeel
     joint_allowance: float = 0.0  # Extra lengte per verbinding
+    split_policy: str = "max_rest"  # max_rest | balanced | optimized
+    min_segment_length: float = 0.0  # Kortste deel bij optimized splitsen
+    seed: int = 0  # Volgorde van gelijke stukken; zelfde seed = zelfde plan
+    profile: bool = False  # Tijd per fase en tellers terug onder "profile"
+    use_remnants: bool = False  # Bied reststukken uit de voorraad aan als goedkope voorraad
+    store_remnants: bool = False  # Sla bruikbare reststukken van dit plan op
+    min_remnant_length: float = 300.0  # Kortste reststuk dat terug het rek in gaat
+    remnant_cost: float = 0.1  # Kosten van een reststuk t.o.v. een nieuwe lat (1.0)
+    time_limit: Optional[float] = None  # Deadline in seconden (gedeeld over profielen): daarna het beste plan tot nu toe
+    workers: Optional[int] = 1  # Processen voor meerdere profielen (None/0 = alle CPU's)
+    solver: str = "auto"  # MIP backend voor ortools_optimal: auto | cp_sat | scip | highs | cbc
+    solver_threads: Optional[int] = None  # Threads voor de MIP solver (None/0 = alle CPU's)
+    formulation: str = "auto"  # MIP model voor ortools_optimal: auto | patterns | arc_flow
+    # Controleer het plan (None = ZAAGPLAN_VALIDATE); ongeldig = 500. In JSON "validate"
+    # (BaseModel.validate bestaat al)
+    validate_plan: Optional[bool] = Field(None, alias="validate")
+
+
+class PartRemoval(BaseModel):
+    id: str
+    quantity: Optional[int] = None  # None = alle stuks van dit onderdeel
+
+
+class Optimize1DIncrementalRequest(BaseModel):
+    previous_plan_id: str
+    add_parts: List[PartInput] = []  # Nieuwe onderdelen of extra stuks van bestaande
+    remove_parts: List[PartRemoval] = []
+    stock_quantities: Dict[str, int] = {}  # {stock_id: nieuwe quantity}
+    profile: bool = False
+
+
+class RemnantInput(BaseModel):
+    length: float
+    profile: str = ""
+    source: str = ""
+
+
+class Part2DInput(BaseModel):
+    id: str
+    length: float
+    width: float
+    quantity: int = 1
+    name: Optional[str] = None
+    grain: bool = False
+    stockType: Optional[str] = None
+
+
+class SheetInput(BaseModel):
+    id: str
+    length: float
+    width: float
+    quantity: int = -1
+    cost: float = 1.0
+    name: Optional[str] = None
+
+
+class Optimize2DRequest(BaseModel):
+    parts: List[Part2DInput]
+    stock: List[SheetInput]
+    kerf: float = 3.0
+    grainDirection: bool = True
+    maxIterations: int = 1000
+    algorithm: str = "hybrid"
+    timeLimit: float = 5.0  # Max rekentijd in seconden (hybrid)
+    seed: int = 0  # Startwaarde voor de willekeurige volgordes (hybrid)
+    workers: Optional[int] = None  # Aantal processen voor hybrid (None = alle CPU's)
 
 
 # ============ ENDPOINTS ============
@@ -109,6 +246,8 @@ def root():
         "status": "running",
         "ortools_available": ORTOOLS_AVAILABLE,
         "algorithms_1d": [a.value for a in Algorithm],
+        "algorithms_2d": [a.value for a in Algorithm2D],
+        "solvers": available_solvers(),
     }
 
 
@@ -118,6 +257,12 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics (tekstformaat)"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/debug/request")
 async def debug_request(request: Request):
     """Debug endpoint: toon wat de frontend stuurt"""
@@ -174,15 +319,39 @@ def get_algorithms():
                 "name": "Hybrid (Aanbevolen)",
                 "description": "Combinatie: grote stukken eerst, kleine stukken in reststukken. Goede balans snelheid/kwaliteit.",
                 "available": True
+            },
+            {
+                "id": "exact",
+                "name": "Exact (zonder OR-Tools)",
+                "description": "Branch-and-bound met LP-ondergrens. Bewezen optimaal tot zo'n 200 stukken per profiel, ook zonder OR-Tools.",
+                "available": True
             }
         ],
         "2d": [
+            {
+                "id": "hybrid",
+                "name": "Hybrid (Aanbevolen)",
+                "description": "Meerdere volgordes met guillotine plaatsing, beste resultaat wint.",
+                "available": True
+            },
             {
                 "id": "maxrects",
-                "name": "MaxRects (Huidig)",
+                "name": "MaxRects",
                 "description": "Greedy rechthoek-packing. Snel maar niet optimaal.",
                 "available": True
             },
+            {
+                "id": "guillotine",
+                "name": "Guillotine",
+                "description": "Puur guillotine splits, deterministisch. Goed zaagbaar op de paneelzaag.",
+                "available": True
+            },
+            {
+                "id": "two_stage",
+                "name": "Twee-staps Guillotine (OR-Tools)",
+                "description": "Column Generation over strookpatronen. Minste platen binnen de tijdslimiet, met ondergrens en gap.",
+                "available": ORTOOLS_AVAILABLE
+            },
             {
                 "id": "nfp",
                 "name": "NFP Nesting (Planned)",
@@ -193,8 +362,67 @@ def get_algorithms():
     }
 
 
+def client_slot(http_request: Request):
+    """
+    Dependency: houd een plek in de client quota vast zolang de request loopt
+
+    De client is de X-Client-Id header, anders het IP-adres.
+    """
+    client = http_request.headers.get("x-client-id") or (
+        http_request.client.host if http_request.client else "onbekend"
+    )
+    try:
+        with client_quota.slot(client):
+            yield client
+    except admission.QuotaExceeded:
+        metrics.ADMISSIONS.inc(decision="throttled")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Te veel gelijktijdige optimalisaties voor deze client "
+                   f"(maximaal {client_quota.limit})",
+            headers={"Retry-After": "1"}
+        )
+
+
+async def wait_for_disconnect(http_request: Request):
+    """Wacht tot de client de verbinding verbreekt (de body is al gelezen)"""
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_cancellable(http_request: Request, kind: str, solve, *args):
+    """
+    Voer solve(*args, cancel_token) uit in de threadpool en annuleer zodra
+    de client de verbinding verbreekt (499)
+    """
+    token = CancelToken()
+    task = asyncio.ensure_future(run_in_threadpool(solve, *args, token))
+    watcher = asyncio.ensure_future(wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            logger.warning(f"Client weg, {kind} optimalisatie wordt afgebroken")
+            token.cancel()
+        return await task
+    except SolveCancelled:
+        metrics.CANCELLATIONS.inc(kind=kind)
+        raise HTTPException(status_code=499, detail="Client heeft de verbinding verbroken")
+    except asyncio.CancelledError:
+        # Server stopt of de request-task wordt afgebroken
+        token.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+
 @app.post("/optimize/1d")
-def optimize_1d(request: Optimize1DRequest):
+async def optimize_1d(
+    request: Optimize1DRequest,
+    http_request: Request,
+    client: str = Depends(client_slot)
+):
     """
     Optimaliseer 1D zaagplan
     
@@ -202,13 +430,32 @@ def optimize_1d(request: Optimize1DRequest):
     - parts: Lijst van onderdelen met id, length, quantity
     - stocks: Lijst van voorraad met id, length
     - kerf: Zaagsnede breedte (default: 3mm)
-    - algorithm: ortools_optimal | ortools_fast | ffd | hybrid
+    - trim: Haaks afzagen van het begin van elke lat, kost trim + kerf (default: 0)
+    - algorithm: ortools_optimal | ortools_fast | ffd | hybrid | smart_split | exact
+      (ortools_optimal zonder OR-Tools gebruikt exact)
+    - solver: MIP backend voor ortools_optimal (auto kiest op modelgrootte)
+    - formulation: MIP model voor ortools_optimal (auto = arc-flow bij meerdere latlengtes)
+    - profile (per onderdeel/voorraad): elk profiel wordt apart, parallel geoptimaliseerd
+    - time_limit: deadline; het antwoord bevat altijd het beste plan tot dan
+      toe, met proven_optimal, deadline_reached en het verloop (incumbents)
+    - validate: controleer het plan (standaard ZAAGPLAN_VALIDATE); een
+      ongeldig plan geeft 500 met de gevonden fouten
+    
+    Te zware requests worden teruggeschaald naar een sneller algoritme (zie
+    "warnings") of geweigerd met 413; te veel gelijktijdige requests van
+    dezelfde client krijgen 429. Verbreekt de client de verbinding, dan
+    wordt de optimalisatie afgebroken.
     """
+    return await run_cancellable(http_request, "1d", run_optimize_1d, request, client)
+
+
+def run_optimize_1d(request: Optimize1DRequest, client: str, cancel_token: CancelToken) -> dict:
+    """Synchrone uitvoering van /optimize/1d (in de threadpool)"""
     logger.info(f"=== START OPTIMIZE 1D ===")
     logger.info(f"Algoritme: {request.algorithm}")
     logger.info(f"Parts: {len(request.parts)} stuks")
     logger.info(f"Stocks: {len(request.stocks)} types")
-    logger.info(f"Kerf: {request.kerf}mm")
+    logger.info(f"Kerf: {request.kerf}mm, Trim: {request.trim}mm")
     logger.info(f"Max split: {request.max_split_parts}, Joint: {request.joint_allowance}mm")
     
     # Valideer algorithm
@@ -221,13 +468,38 @@ def optimize_1d(request: Optimize1DRequest):
             detail=f"Onbekend algoritme: {request.algorithm}. "
                    f"Kies uit: {[a.value for a in Algorithm]}"
         )
+    try:
+        split_policy = SplitPolicy(request.split_policy)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Onbekend splitsbeleid: {request.split_policy}. "
+                   f"Kies uit: {[p.value for p in SplitPolicy]}"
+        )
+    try:
+        solver = Solver(request.solver)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Onbekende solver: {request.solver}. "
+                   f"Kies uit: {[s.value for s in Solver]}"
+        )
+    try:
+        formulation = Formulation(request.formulation)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Onbekend model: {request.formulation}. "
+                   f"Kies uit: {[f.value for f in Formulation]}"
+        )
     
     # Check OR-Tools beschikbaarheid
-    if algo in [Algorithm.ORTOOLS_OPTIMAL, Algorithm.ORTOOLS_FAST] and not ORTOOLS_AVAILABLE:
+    # ortools_optimal valt zonder OR-Tools terug op de exacte solver (zie "fallback")
+    if algo == Algorithm.ORTOOLS_FAST and not ORTOOLS_AVAILABLE:
         raise HTTPException(
             status_code=503,
             detail="OR-Tools is niet geïnstalleerd op de server. "
-                   "Gebruik 'hybrid' of 'ffd' algoritme."
+                   "Gebruik 'exact', 'hybrid' of 'ffd' algoritme."
         )
     
     # Converteer input
@@ -236,7 +508,8 @@ def optimize_1d(request: Optimize1DRequest):
             id=p.id,
             length=p.length,
             quantity=p.quantity,
-            label=p.label or p.id
+            label=p.label or p.id,
+            profile=p.profile
         )
         for p in request.parts
     ]
@@ -247,7 +520,8 @@ def optimize_1d(request: Optimize1DRequest):
             length=s.length,
             quantity=s.quantity,
             cost=s.cost,
-            label=s.label or f"{s.length}mm"
+            label=s.label or f"{s.length}mm",
+            profile=s.profile
         )
         for s in request.stocks
     ]
@@ -261,16 +535,99 @@ def optimize_1d(request: Optimize1DRequest):
     logger.debug(f"Parts na conversie: {[(p.id, p.length, p.quantity) for p in parts[:5]]}...")
     logger.debug(f"Stocks na conversie: {[(s.id, s.length, s.quantity) for s in stocks]}")
     
-    # Optimaliseer
-    logger.info("Starting optimalisatie...")
-    optimizer = Optimizer1D(kerf=request.kerf)
-    result = optimizer.optimize(
-        parts, 
-        stocks, 
-        algo,
-        max_split_parts=request.max_split_parts,
-        joint_allowance=request.joint_allowance
-    )
+    # Toelating op geschatte rekentijd
+    size = admission.request_size(parts, stocks, request.max_split_parts)
+    decision = admission.decide(algo, size, request.time_limit, formulation=formulation)
+    if not decision.accepted:
+        metrics.ADMISSIONS.inc(decision="rejected")
+        logger.warning(f"Geweigerd ({client}): {decision.warnings[0]}")
+        raise HTTPException(status_code=decision.status_code, detail=decision.warnings[0])
+    if decision.algorithm != algo:
+        metrics.ADMISSIONS.inc(decision="downgraded")
+        logger.warning(f"Teruggeschaald ({client}): {decision.warnings[0]}")
+        algo = decision.algorithm
+    else:
+        metrics.ADMISSIONS.inc(decision="accepted")
+    logger.info(f"Geschatte rekentijd: {decision.estimate:.2f}s "
+                f"({size.pieces} stukken, {size.distinct_lengths} lengtes, {size.stock_types} voorraadtypes)")
+    
+    # Reststukken als extra (goedkope) voorraad. Zijn ze bij het afboeken al
+    # door een gelijktijdig request gebruikt, dan wordt opnieuw gepland met
+    # wat er nog ligt; de laatste poging plant zonder reststukken
+    profiles = sorted({p.profile for p in parts})
+    conflicts: List[int] = []
+    for attempt in range(REMNANT_ATTEMPTS):
+        offered = list(stocks)
+        remnant_ids = {}
+        if request.use_remnants and attempt < REMNANT_ATTEMPTS - 1:
+            for profile in profiles:
+                remnant_stocks, ids = offer_remnants(
+                    remnant_store,
+                    min_length=min(p.length for p in parts if p.profile == profile),
+                    profile=profile,
+                    cost=request.remnant_cost
+                )
+                offered.extend(remnant_stocks)
+                remnant_ids.update(ids)
+                logger.info(f"Reststukken aangeboden ({profile or '-'}): "
+                            f"{sum(s.quantity for s in remnant_stocks)} stuks "
+                            f"in {len(remnant_stocks)} lengtes")
+
+        # Optimaliseer
+        logger.info("Starting optimalisatie...")
+        optimizer = Optimizer1D(
+            kerf=request.kerf,
+            split_policy=split_policy,
+            min_segment_length=request.min_segment_length,
+            seed=request.seed,
+            profile=request.profile,
+            solver=solver,
+            threads=request.solver_threads or 0,
+            pattern_cache=True,
+            cancel_token=cancel_token,
+            formulation=formulation,
+            trim=request.trim,
+            validate=VALIDATE_DEFAULT if request.validate_plan is None else request.validate_plan
+        )
+        if request.profile and PROFILE_DIR:
+            optimizer.profiler = Profiler(cprofile=True)
+        result = optimizer.optimize_profiles(
+            parts,
+            offered,
+            algo,
+            max_split_parts=request.max_split_parts,
+            joint_allowance=request.joint_allowance,
+            time_limit=request.time_limit,
+            workers=request.workers
+        )
+        
+        if result.validation is not None:
+            valid = result.validation.valid
+            metrics.VALIDATIONS.inc(algorithm=result.algorithm, result="valid" if valid else "invalid")
+            if not valid:
+                # Een onuitvoerbaar plan nooit teruggeven, opslaan of in de reststukken verwerken
+                logger.error(f"Ongeldig plan ({result.algorithm}): {result.validation.errors}")
+                raise HTTPException(
+                    status_code=500,
+                    detail={"message": "Het berekende zaagplan is ongeldig", "validation": result.validation.to_dict()}
+                )
+        
+        if not (request.use_remnants or request.store_remnants):
+            break
+        remnants = apply_result(
+            remnant_store,
+            result,
+            remnant_ids,
+            min_length=request.min_remnant_length if request.store_remnants else None
+        )
+        if not remnants["conflicts"]:
+            break
+        conflicts.extend(remnants["conflicts"])
+        logger.warning(f"Reststukken {remnants['conflicts']} al gebruikt, opnieuw plannen "
+                       f"(poging {attempt + 2}/{REMNANT_ATTEMPTS})")
+    stocks = offered
+    
+    record_1d_metrics(parts, stocks, result)
     
     logger.info(f"=== RESULTAAT ===")
     logger.info(f"Stocks gebruikt: {result.total_stocks_used}")
@@ -278,20 +635,351 @@ def optimize_1d(request: Optimize1DRequest):
     logger.info(f"Tijd: {result.computation_time_ms:.1f}ms")
     logger.info(f"Niet geplaatst: {len(result.parts_not_placed)} stuks")
     
-    return result_to_dict(result)
+    with optimizer.profiler.span("serialize"):
+        response = result_to_dict(result)
+    response["warnings"] = list(decision.warnings)
+    if conflicts:
+        response["warnings"].append(
+            f"{len(conflicts)} reststukken werden tijdens het plannen door een ander request "
+            f"gebruikt; het plan is opnieuw gemaakt"
+        )
+    if optimizer.profiler.enabled:
+        response["profile"] = profile_report(optimizer.profiler, result, "1d")
+    # Incrementeel her-optimaliseren ondersteunt (nog) maar één profiel per plan
+    response["plan_id"] = store_plan(
+        optimizer, parts, stocks, result, algo.value,
+        request.max_split_parts, request.joint_allowance
+    ) if len(profiles) == 1 else None
+    if request.use_remnants or request.store_remnants:
+        remnants["conflicts"] = conflicts
+        response["remnants"] = remnants
+        logger.info(f"Reststukken gebruikt: {len(remnants['used'])}, "
+                    f"opgeslagen: {len(remnants['stored'])}")
+    
+    return response
+
+
+def profile_report(profiler: Profiler, result, kind: str) -> dict:
+    """
+    Profiel inclusief serialisatie; met ZAAGPLAN_PROFILE_DIR ook als
+    Chrome trace en pstats bestand weggeschreven
+    """
+    report = profiler.to_dict()
+    if result.profile and "profiles" in result.profile:
+        report["profiles"] = result.profile["profiles"]
+    if PROFILE_DIR:
+        report["dumps"] = profiler.dump(PROFILE_DIR, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{id(result):x}")
+    return report
+
+
+def record_1d_metrics(parts: List[Part], stocks: List[Stock], result):
+    """Metrics van een 1D optimalisatie (per profiel voor solver status en fallback)"""
+    metrics.observe_solve(
+        "1d",
+        result.algorithm,
+        result.computation_time_ms / 1000,
+        pieces=sum(p.quantity for p in parts),
+        distinct_sizes=len({p.length for p in parts}),
+        stock_types=len(stocks)
+    )
+    for outcome in list(result.profiles.values()) or [result]:
+        if outcome.solver_status:
+            metrics.SOLVER_STATUS.inc(solver=outcome.solver or "mip", status=outcome.solver_status)
+        if outcome.fallback:
+            metrics.FALLBACKS.inc(algorithm=result.algorithm, fallback=outcome.fallback)
+
+
+def store_plan(
+    optimizer: Optimizer1D,
+    parts: List[Part],
+    stocks: List[Stock],
+    result,
+    algorithm: str,
+    max_split_parts: int,
+    joint_allowance: float
+) -> str:
+    """Bewaar een plan voor incrementele her-optimalisatie, geeft plan_id terug"""
+    # Aangeboden reststukken tellen alleen mee voor zover het plan ze gebruikt
+    used = {}
+    for plan in result.plans:
+        used[plan.stock_id] = used.get(plan.stock_id, 0) + 1
+    stocks = [
+        s if not s.id.startswith(REMNANT_PREFIX)
+        else Stock(s.id, s.length, used.get(s.id, 0), s.cost, s.label, s.profile)
+        for s in stocks
+    ]
+
+    _, _, origin = optimizer.expand_parts(parts, stocks, max_split_parts, joint_allowance)
+    plan_id = PlanStore.new_id()
+    plan_store.put(PlanRecord(
+        plan_id=plan_id,
+        parts=parts,
+        stocks=stocks,
+        kerf=optimizer.kerf,
+        trim=optimizer.trim,
+        split_policy=optimizer.split_policy,
+        algorithm=algorithm,
+        max_split_parts=max_split_parts,
+        joint_allowance=joint_allowance,
+        result=result,
+        origin=origin
+    ))
+    return plan_id
+
+
+@app.post("/optimize/1d/incremental")
+async def optimize_1d_incremental(
+    request: Optimize1DIncrementalRequest,
+    http_request: Request,
+    client: str = Depends(client_slot)
+):
+    """
+    Incrementele her-optimalisatie van een eerder 1D plan
+
+    Body:
+    - previous_plan_id: plan_id uit een eerdere /optimize/1d response
+    - add_parts: Toe te voegen onderdelen (bestaand id = extra stuks)
+    - remove_parts: Te verwijderen onderdelen (id + optioneel quantity)
+    - stock_quantities: Gewijzigde voorraad per stock id
+
+    Zelfde quota en toelating als /optimize/1d; een reparatie kost ongeveer
+    een HYBRID run en kan niet terugschalen, dus te groot is direct 413.
+    """
+    return await run_cancellable(http_request, "1d-incremental", run_optimize_1d_incremental, request, client)
+
+
+def run_optimize_1d_incremental(
+    request: Optimize1DIncrementalRequest,
+    client: str,
+    cancel_token: CancelToken
+) -> dict:
+    """Synchrone uitvoering van /optimize/1d/incremental (in de threadpool)"""
+    logger.info(f"=== START INCREMENTAL 1D ({request.previous_plan_id}) ===")
+
+    record = plan_store.get(request.previous_plan_id)
+    metrics.record_cache("plans", record is not None)
+    if record is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Plan {request.previous_plan_id} niet gevonden. "
+                   "Voer een volledige optimalisatie uit."
+        )
+
+    # Pas de diff toe op een kopie van de onderdelenlijst
+    profile = record.parts[0].profile
+    parts = {p.id: Part(p.id, p.length, p.quantity, p.label, p.profile) for p in record.parts}
+    for p in request.add_parts:
+        if p.profile and p.profile != profile:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Onderdeel {p.id} heeft een ander profiel dan het plan ({profile})"
+            )
+        if p.id in parts:
+            if parts[p.id].length != p.length:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Onderdeel {p.id} bestaat al met een andere lengte"
+                )
+            parts[p.id].quantity += p.quantity
+        else:
+            parts[p.id] = Part(
+                id=p.id, length=p.length, quantity=p.quantity, label=p.label or p.id, profile=profile
+            )
+
+    for r in request.remove_parts:
+        if r.id not in parts:
+            raise HTTPException(status_code=400, detail=f"Onbekend onderdeel: {r.id}")
+        if r.quantity is None or r.quantity >= parts[r.id].quantity:
+            del parts[r.id]
+        else:
+            parts[r.id].quantity -= r.quantity
+
+    stocks = [Stock(s.id, s.length, s.quantity, s.cost, s.label, s.profile) for s in record.stocks]
+    stock_ids = {s.id for s in stocks}
+    for stock_id in request.stock_quantities:
+        if stock_id not in stock_ids:
+            raise HTTPException(status_code=400, detail=f"Onbekende voorraad: {stock_id}")
+    for s in stocks:
+        s.quantity = request.stock_quantities.get(s.id, s.quantity)
+
+    if not parts:
+        raise HTTPException(status_code=400, detail="Geen onderdelen over na wijziging")
+
+    parts_list = list(parts.values())
+    size = admission.request_size(parts_list, stocks, record.max_split_parts)
+    decision = admission.decide(Algorithm.HYBRID, size, downgrade=False)
+    if not decision.accepted:
+        metrics.ADMISSIONS.inc(decision="rejected")
+        logger.warning(f"Geweigerd ({client}): {decision.warnings[0]}")
+        raise HTTPException(status_code=decision.status_code, detail=decision.warnings[0])
+    metrics.ADMISSIONS.inc(decision="accepted")
+
+    optimizer = Optimizer1D(
+        kerf=record.kerf, trim=record.trim, split_policy=record.split_policy, profile=request.profile,
+        cancel_token=cancel_token
+    )
+    result = optimizer.reoptimize(
+        record.result,
+        record.origin,
+        parts_list,
+        stocks,
+        max_split_parts=record.max_split_parts,
+        joint_allowance=record.joint_allowance
+    )
+    for plan in result.plans:
+        plan.profile = profile
+
+    record_1d_metrics(parts_list, stocks, result)
+    logger.info(f"Stocks gebruikt: {record.result.total_stocks_used} → {result.total_stocks_used}")
+    logger.info(f"Tijd: {result.computation_time_ms:.1f}ms")
+
+    with optimizer.profiler.span("serialize"):
+        response = result_to_dict(result)
+    if optimizer.profiler.enabled:
+        response["profile"] = profile_report(optimizer.profiler, result, "1d-incremental")
+    response["previous_plan_id"] = record.plan_id
+    response["plan_id"] = store_plan(
+        optimizer, parts_list, stocks, result, record.algorithm,
+        record.max_split_parts, record.joint_allowance
+    )
+    return response
+
+
+# ============ RESTSTUKKEN ============
+
+@app.get("/remnants")
+def list_remnants(profile: str = "", min_length: float = 0.0, limit: int = 1000):
+    """Beschikbare reststukken, kortste eerst"""
+    remnants = remnant_store.available(profile, min_length, limit)
+    return {
+        "count": len(remnants),
+        "remnants": [
+            {"id": r.id, "length": r.length, "profile": r.profile, "source": r.source}
+            for r in remnants
+        ]
+    }
+
+
+@app.post("/remnants")
+def add_remnant(remnant: RemnantInput):
+    """Voeg handmatig een reststuk toe aan het rek"""
+    if remnant.length <= 0:
+        raise HTTPException(status_code=400, detail="Lengte moet groter dan 0 zijn")
+    remnant_id = remnant_store.add(remnant.length, remnant.profile, remnant.source)
+    return {"id": remnant_id}
+
+
+@app.delete("/remnants/{remnant_id}")
+def delete_remnant(remnant_id: int):
+    """Verwijder een reststuk uit het rek"""
+    if not remnant_store.delete(remnant_id):
+        raise HTTPException(status_code=404, detail=f"Reststuk {remnant_id} niet gevonden")
+    return {"deleted": remnant_id}
 
 
-# ============ 2D PLACEHOLDER ============
+# ============ 2D ============
 
 @app.post("/optimize/2d")
-def optimize_2d():
-    """2D optimalisatie - nog niet geïmplementeerd via backend"""
-    raise HTTPException(
-        status_code=501,
-        detail="2D optimalisatie via backend is nog in ontwikkeling. "
-               "Gebruik de frontend maxrects-packer voor nu."
+def optimize_2d(request: Optimize2DRequest):
+    """
+    Optimaliseer 2D plaatindeling
+
+    Body (zelfde velden als optimize2D in de frontend):
+    - parts: Lijst van onderdelen met id, length, width, quantity, grain, stockType
+    - stock: Lijst van platen met id, name, length, width, quantity
+    - kerf: Zaagsnede breedte (default: 3mm)
+    - grainDirection: Houd rekening met nerfrichting
+    - maxIterations: Aantal iteraties voor hybrid
+    - algorithm: hybrid | maxrects | guillotine | two_stage
+    """
+    logger.info(f"=== START OPTIMIZE 2D ===")
+    logger.info(f"Algoritme: {request.algorithm}")
+    logger.info(f"Parts: {len(request.parts)} stuks, Stock: {len(request.stock)} platen")
+    logger.info(f"Kerf: {request.kerf}mm, Nerf: {request.grainDirection}")
+
+    try:
+        algo = Algorithm2D(request.algorithm)
+    except ValueError:
+        logger.error(f"Onbekend algoritme: {request.algorithm}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Onbekend algoritme: {request.algorithm}. "
+                   f"Kies uit: {[a.value for a in Algorithm2D]}"
+        )
+
+    if algo == Algorithm2D.TWO_STAGE and not ORTOOLS_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="OR-Tools is niet geïnstalleerd op de server. "
+                   "Gebruik 'hybrid', 'maxrects' of 'guillotine'."
+        )
+
+    if not request.parts:
+        raise HTTPException(status_code=400, detail="Geen onderdelen om te zagen")
+    if not request.stock:
+        raise HTTPException(status_code=400, detail="Geen voorraad beschikbaar")
+
+    # De frontend groepeert voorraad op naam: stockType van een onderdeel
+    # verwijst naar de naam van de plaat
+    parts = [
+        Part2D(
+            id=p.id,
+            length=p.length,
+            width=p.width,
+            quantity=p.quantity,
+            label=p.name or p.id,
+            grain=p.grain,
+            material=p.stockType or ""
+        )
+        for p in request.parts
+    ]
+
+    sheets = [
+        Sheet(
+            id=s.id,
+            length=s.length,
+            width=s.width,
+            quantity=s.quantity,
+            cost=s.cost,
+            label=s.name or f"{s.length}×{s.width}mm",
+            material=s.name or ""
+        )
+        for s in request.stock
+    ]
+
+    optimizer = Optimizer2D(
+        kerf=request.kerf,
+        grain_direction=request.grainDirection,
+        workers=request.workers
+    )
+    result = optimizer.optimize(
+        parts,
+        sheets,
+        algo,
+        max_iterations=request.maxIterations,
+        time_limit=request.timeLimit,
+        seed=request.seed
     )
 
+    metrics.observe_solve(
+        "2d",
+        result.algorithm,
+        result.computation_time_ms / 1000,
+        pieces=sum(p.quantity for p in parts),
+        distinct_sizes=len({(p.length, p.width) for p in parts}),
+        stock_types=len(sheets)
+    )
+
+    logger.info(f"=== RESULTAAT 2D ===")
+    logger.info(f"Platen gebruikt: {result.total_sheets_used}")
+    logger.info(f"Benutting: {result.efficiency:.1f}%")
+    logger.info(f"Tijd: {result.computation_time_ms:.1f}ms ({result.iterations} iteraties)")
+    logger.info(f"Niet geplaatst: {len(result.parts_not_placed)} stuks")
+    if result.lower_bound is not None:
+        logger.info(f"Ondergrens: {result.lower_bound} platen ({result.lower_bound_scope})")
+
+    return result_to_dict_2d(result)
+
 
 # ============ RUN SERVER ============
 
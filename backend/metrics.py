@@ -0,0 +1,470 @@
+"""
+Zaagplan Optimizer - Metrics
+Eenvoudige Prometheus-metrics (tekstformaat) zonder externe afhankelijkheid
+
+Elke metric houdt zijn waarden per labelcombinatie in een dict bij, achter
+één lock. Een observatie is een paar dict-operaties en een bisect, dus
+verwaarloosbaar naast een optimalisatie. /metrics rendert alles in het
+Prometheus exposition formaat (versie 0.0.4).
+
+Met ZAAGPLAN_METRICS_DB (door serve.py gezet bij meerdere workers) schrijft
+elke worker zijn stand periodiek weg in één SQLite bestand en telt
+/metrics de standen van alle workers op (zie SharedMetrics); anders zijn
+de metrics per proces.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+import shared_state
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Rekentijd in seconden: van een paar ms (greedy) tot minuten (MIP)
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Invoergroottes (stukken, lengtes, voorraadtypes)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Metrics gedeeld tussen workers (leeg = per proces)
+SHARED_DB_PATH = os.environ.get("ZAAGPLAN_METRICS_DB", "")
+
+# Zo vaak (seconden) schrijft elke worker zijn stand weg; een scrape ziet
+# de andere workers dus hooguit zo oud
+FLUSH_INTERVAL = float(os.environ.get("ZAAGPLAN_METRICS_FLUSH", "5"))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def empty(self) -> "_Metric":
+        """Zelfde metric zonder waarden"""
+        return type(self)(self.name, self.help, self.labels)
+
+    def snapshot(self) -> List[Tuple[str, str, float]]:
+        """Stand als (labels als JSON, veld, waarde), voor SharedMetrics"""
+        raise NotImplementedError
+
+    def merge(self, rows: Sequence[Tuple[str, str, float]]):
+        """Tel een snapshot (van een andere worker) op bij deze metric"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Oplopende teller"""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def snapshot(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [(json.dumps(key), "", value) for key, value in self._values.items()]
+
+    def merge(self, rows: Sequence[Tuple[str, str, float]]):
+        with self._lock:
+            for labels, _, value in rows:
+                key = tuple(json.loads(labels))
+                self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(Counter):
+    """Waarde die op en neer kan gaan"""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Verdeling van waarnemingen in vaste buckets"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DURATION_BUCKETS
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per labelcombinatie: [aantallen per bucket (+Inf als laatste), som]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.help, self.labels, self.buckets)
+
+    def snapshot(self) -> List[Tuple[str, str, float]]:
+        # Veld: index van de bucket, of "sum"
+        with self._lock:
+            rows = []
+            for key, (counts, total) in self._values.items():
+                labels = json.dumps(key)
+                rows.extend((labels, str(i), n) for i, n in enumerate(counts) if n)
+                rows.append((labels, "sum", total))
+            return rows
+
+    def merge(self, rows: Sequence[Tuple[str, str, float]]):
+        with self._lock:
+            for labels, field, value in rows:
+                key = tuple(json.loads(labels))
+                entry = self._values.get(key)
+                if entry is None:
+                    entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+                if field == "sum":
+                    entry[1] += value
+                else:
+                    entry[0][int(field)] += int(value)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class SharedMetrics:
+    """
+    Metrics van alle workers in één SQLite bestand
+
+    Elke worker vervangt bij flush() zijn eigen rijen door zijn volledige
+    stand; totals() telt de rijen van alle workers op. Tellers en
+    histogrammen van gestopte workers blijven meetellen (zo blijven ze
+    oplopend), gauges alleen van workers die nog draaien.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = os.getpid()
+        # Uniek per proces, ook als een nieuwe worker een oude pid krijgt
+        self.process = f"{self.pid}-{uuid.uuid4().hex[:8]}"
+        conn = shared_state.connect(path)
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS metric_samples (
+                    process TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (process, name, labels, field)
+                );
+            """)
+        finally:
+            conn.close()
+
+    def flush(self, metrics: Sequence[_Metric]):
+        """Schrijf de stand van dit proces weg"""
+        rows = [
+            (self.process, self.pid, metric.name, labels, field, value)
+            for metric in metrics
+            for labels, field, value in metric.snapshot()
+        ]
+        conn = shared_state.connect(self.path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM metric_samples WHERE process = ?", (self.process,))
+            conn.executemany("INSERT INTO metric_samples VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def forget_gauges(self, metrics: Sequence[_Metric]):
+        """Haal de gauges van dit proces weg (bij het stoppen)"""
+        names = [(self.process, metric.name) for metric in metrics if metric.kind == "gauge"]
+        conn = shared_state.connect(self.path)
+        try:
+            conn.executemany("DELETE FROM metric_samples WHERE process = ? AND name = ?", names)
+        finally:
+            conn.close()
+
+    def totals(self, metrics: Sequence[_Metric]) -> List[_Metric]:
+        """De metrics opgeteld over alle workers (eerst de eigen stand wegschrijven)"""
+        self.flush(metrics)
+        conn = shared_state.connect(self.path)
+        try:
+            rows = conn.execute("SELECT pid, name, labels, field, value FROM metric_samples").fetchall()
+        finally:
+            conn.close()
+        alive: Dict[int, bool] = {}
+        merged = [metric.empty() for metric in metrics]
+        by_name: Dict[str, List[Tuple[str, str, float]]] = {metric.name: [] for metric in merged}
+        gauges = {metric.name for metric in merged if metric.kind == "gauge"}
+        for pid, name, labels, field, value in rows:
+            if name not in by_name:
+                continue
+            if name in gauges:
+                if pid not in alive:
+                    alive[pid] = shared_state.process_alive(pid)
+                if not alive[pid]:
+                    continue
+            by_name[name].append((labels, field, value))
+        for metric in merged:
+            metric.merge(by_name[metric.name])
+        return merged
+
+
+class Registry:
+    """Verzameling metrics die samen gerenderd worden"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.shared: Optional[SharedMetrics] = None  # Zie start_sharing()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets or DURATION_BUCKETS))
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        metrics = self.metrics()
+        if self.shared is not None:
+            metrics = self.shared.totals(metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_stop_flush = threading.Event()
+
+# ============ METRICS ============
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "zaagplan_http_request_duration_seconds",
+    "Duur van HTTP requests",
+    ("method", "path", "status")
+)
+SOLVE_DURATION = REGISTRY.histogram(
+    "zaagplan_solve_duration_seconds",
+    "Rekentijd van een optimalisatie per algoritme",
+    ("kind", "algorithm")
+)
+INPUT_PIECES = REGISTRY.histogram(
+    "zaagplan_input_pieces",
+    "Aantal te zagen stukken per optimalisatie",
+    ("kind",),
+    SIZE_BUCKETS
+)
+INPUT_DISTINCT_SIZES = REGISTRY.histogram(
+    "zaagplan_input_distinct_sizes",
+    "Aantal verschillende lengtes (1D) of maten (2D) per optimalisatie",
+    ("kind",),
+    SIZE_BUCKETS
+)
+INPUT_STOCK_TYPES = REGISTRY.histogram(
+    "zaagplan_input_stock_types",
+    "Aantal voorraadtypes per optimalisatie",
+    ("kind",),
+    SIZE_BUCKETS
+)
+SOLVER_STATUS = REGISTRY.counter(
+    "zaagplan_solver_status_total",
+    "Eindstatus van de MIP solver",
+    ("solver", "status")
+)
+FALLBACKS = REGISTRY.counter(
+    "zaagplan_fallback_total",
+    "Aantal keer dat een algoritme terugviel op een ander",
+    ("algorithm", "fallback")
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "zaagplan_cache_requests_total",
+    "Cache opvragingen per cache en uitkomst (hit/miss)",
+    ("cache", "result")
+)
+POOL_INFLIGHT = REGISTRY.gauge(
+    "zaagplan_pool_inflight_tasks",
+    "Taken in de worker pool die wachten of draaien (ingediend, nog niet afgerond)"
+)
+POOL_TASKS = REGISTRY.counter(
+    "zaagplan_pool_tasks_total",
+    "Aantal taken ingediend bij de worker pool"
+)
+ADMISSIONS = REGISTRY.counter(
+    "zaagplan_admission_total",
+    "Toelatingsbeslissingen (accepted/downgraded/rejected/throttled)",
+    ("decision",)
+)
+CANCELLATIONS = REGISTRY.counter(
+    "zaagplan_cancelled_total",
+    "Optimalisaties afgebroken omdat de client de verbinding verbrak",
+    ("kind",)
+)
+VALIDATIONS = REGISTRY.counter(
+    "zaagplan_validation_total",
+    "Gevalideerde plannen per algoritme en uitkomst (valid/invalid)",
+    ("algorithm", "result")
+)
+
+
+def observe_solve(
+    kind: str,
+    algorithm: str,
+    seconds: float,
+    pieces: int,
+    distinct_sizes: int,
+    stock_types: int
+):
+    """Registreer één optimalisatie (rekentijd en invoergrootte)"""
+    SOLVE_DURATION.observe(seconds, kind=kind, algorithm=algorithm)
+    INPUT_PIECES.observe(pieces, kind=kind)
+    INPUT_DISTINCT_SIZES.observe(distinct_sizes, kind=kind)
+    INPUT_STOCK_TYPES.observe(stock_types, kind=kind)
+
+
+def record_cache(cache: str, hit: bool):
+    """Registreer een cache opvraging"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render() -> str:
+    """Alle metrics in Prometheus tekstformaat"""
+    return REGISTRY.render()
+
+
+def start_sharing(path: str = SHARED_DB_PATH, interval: float = FLUSH_INTERVAL) -> bool:
+    """
+    Deel de metrics met de andere workers (vanuit de lifespan, dus in elke
+    worker); False als er geen ZAAGPLAN_METRICS_DB is
+    """
+    if not path or REGISTRY.shared is not None:
+        return False
+    shared = SharedMetrics(path)
+    REGISTRY.shared = shared
+    _stop_flush.clear()
+
+    def flush_loop():
+        while not _stop_flush.wait(interval):
+            try:
+                shared.flush(REGISTRY.metrics())
+            except sqlite3.Error as e:
+                print(f"[METRICS] WARNING: wegschrijven mislukt: {e}")
+
+    threading.Thread(target=flush_loop, name="metrics-flush", daemon=True).start()
+    return True
+
+
+def stop_sharing():
+    """Laatste stand wegschrijven; de gauges van dit proces tellen niet meer mee"""
+    shared = REGISTRY.shared
+    if shared is None:
+        return
+    _stop_flush.set()
+    REGISTRY.shared = None
+    metrics = REGISTRY.metrics()
+    shared.flush(metrics)
+    shared.forget_gauges(metrics)
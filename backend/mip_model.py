@@ -0,0 +1,154 @@
+"""
+Zaagplan Optimizer - MIP model
+Solver-onafhankelijk, sparse patroonmodel voor het cutting stock probleem
+
+Een patroon wordt opgeslagen als tuple van (lengte-index, aantal) paren
+met alleen de niet-nul aantallen. Het model wordt in één doorloop over de
+patronen opgebouwd: elke niet-nul komt precies één keer in de juiste
+rij terecht, dus de bouwtijd schaalt met het aantal niet-nullen in plaats
+van met patronen × lengtes × voorraadtypes.
+
+Het model zelf kent geen solver; solvers.py lost het op met CP-SAT of
+een pywraplp backend (to_pywraplp).
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import math
+
+# ((lengte-index, aantal), ...) met alleen niet-nul aantallen, oplopend op index
+SparsePattern = Tuple[Tuple[int, int], ...]
+
+INF = math.inf
+
+
+@dataclass
+class Row:
+    """Lineaire constraint lower <= sum(coef * x[index]) <= upper"""
+    name: str
+    lower: float
+    upper: float
+    indices: List[int] = field(default_factory=list)
+    coefs: List[float] = field(default_factory=list)
+
+
+@dataclass
+class MipModel:
+    """
+    Geheeltallig minimalisatiemodel in sparse rijvorm
+
+    Variabelen zijn allemaal integer met ondergrens 0.
+    """
+    costs: List[float] = field(default_factory=list)
+    upper: List[float] = field(default_factory=list)
+    rows: List[Row] = field(default_factory=list)
+
+    @property
+    def num_variables(self) -> int:
+        return len(self.costs)
+
+    @property
+    def num_constraints(self) -> int:
+        return len(self.rows)
+
+    @property
+    def num_nonzeros(self) -> int:
+        return sum(len(row.indices) for row in self.rows)
+
+
+@dataclass
+class PatternSet:
+    """Patronen van alle voorraadtypes met per patroon het voorraadtype"""
+    patterns: List[SparsePattern] = field(default_factory=list)
+    stock_index: List[int] = field(default_factory=list)
+
+    def add(self, pattern: SparsePattern, stock_idx: int):
+        self.patterns.append(pattern)
+        self.stock_index.append(stock_idx)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+
+def build_pattern_model(
+    pattern_set: PatternSet,
+    demands: Sequence[int],
+    stock_costs: Sequence[float],
+    stock_quantities: Sequence[int]
+) -> MipModel:
+    """
+    Bouw het patroonmodel (Gilmore-Gomory) in één doorloop
+
+    Rijen: per lengte sum(aantal * x) >= vraag, per begrensd voorraadtype
+    sum(x) <= voorraad. Elke variabele krijgt een eindige bovengrens: het
+    aantal keer dat het patroon nodig is om de vraag van zijn lengtes te
+    dekken, en bij een begrensd type hooguit de voorraad.
+
+    Args:
+        pattern_set: Sparse patronen met voorraadtype
+        demands: Vraag per lengte-index
+        stock_costs: Kosten per voorraadtype
+        stock_quantities: Voorraad per type (-1 = onbeperkt)
+    """
+    rows = [Row(f"vraag_{j}", demand, INF) for j, demand in enumerate(demands)]
+
+    # Voorraadrij per begrensd type (-1 = onbeperkt, geen rij)
+    qty_rows: List[Optional[Row]] = []
+    for s, quantity in enumerate(stock_quantities):
+        if quantity != -1:
+            row = Row(f"voorraad_{s}", 0, quantity)
+            rows.append(row)
+            qty_rows.append(row)
+        else:
+            qty_rows.append(None)
+
+    model = MipModel(rows=rows)
+    for i, (pattern, s) in enumerate(zip(pattern_set.patterns, pattern_set.stock_index)):
+        model.costs.append(stock_costs[s])
+        # Vaker dan nodig om de vraag van al zijn lengtes te dekken is nooit zinvol
+        upper = max(-(-demands[j] // count) for j, count in pattern)
+        quantity = stock_quantities[s]
+        model.upper.append(upper if quantity == -1 else min(upper, quantity))
+
+        for j, count in pattern:
+            demand_row = rows[j]
+            demand_row.indices.append(i)
+            demand_row.coefs.append(count)
+
+        qty_row = qty_rows[s]
+        if qty_row is not None:
+            qty_row.indices.append(i)
+            qty_row.coefs.append(1)
+
+    return model
+
+
+def to_pywraplp(model: MipModel, solver) -> list:
+    """
+    Zet het model om naar een pywraplp solver (alleen niet-nullen)
+
+    Returns:
+        De solver variabelen, in modelvolgorde
+    """
+    infinity = solver.infinity()
+
+    def bound(value: float) -> float:
+        return infinity if value == INF else value
+
+    x = [
+        solver.IntVar(0, bound(upper), f"x_{i}")
+        for i, upper in enumerate(model.upper)
+    ]
+
+    for row in model.rows:
+        constraint = solver.Constraint(bound(row.lower), bound(row.upper), row.name)
+        for i, coef in zip(row.indices, row.coefs):
+            constraint.SetCoefficient(x[i], coef)
+
+    objective = solver.Objective()
+    for var, cost in zip(x, model.costs):
+        objective.SetCoefficient(var, cost)
+    objective.SetMinimization()
+    return x
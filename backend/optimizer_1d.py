@@ -6,17 +6,31 @@ Auteur: OpenAEC (Jochem Bosman & Claude)
 Versie: 2.0
 """
 
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+from typing import List, Dict, Set, Tuple, Optional
+from bisect import bisect_left, insort
+from collections import deque
+from dataclasses import dataclass, field
 from enum import Enum
+import hashlib
 import json
+import math
+import time as _time
 
-# OR-Tools import (pip install ortools)
-try:
-    from ortools.linear_solver import pywraplp
-    ORTOOLS_AVAILABLE = True
-except ImportError:
-    ORTOOLS_AVAILABLE = False
+import numpy as np
+
+from mip_model import PatternSet, SparsePattern, build_pattern_model
+from arc_flow import build_arc_flow_model, build_graph, decompose
+from pattern_store import default_store
+from cancellation import NEVER_CANCELLED, CancelToken, DeadlineReached
+from parallel import resolve_workers, run_parallel, task_cancel_token, worker_cpus
+from profiling import NULL_PROFILER, Profiler
+from plan_eval import KerfModel
+from validation import ValidationReport, validate_result
+import bin_completion
+
+from solvers import ORTOOLS_AVAILABLE, Solver, SolveSettings, solve_model
+
+if not ORTOOLS_AVAILABLE:
     print("Warning: OR-Tools not installed. Run: pip install ortools")
 
 
@@ -27,6 +41,34 @@ class Algorithm(Enum):
     FFD = "ffd"                               # First Fit Decreasing (greedy)
     HYBRID = "hybrid"                         # Custom: FFD + reststuk optimalisatie
     SMART_SPLIT = "smart_split"              # Slim splitsen: langste eerst, reststukken vullen
+    EXACT = "exact"                           # Bin completion branch-and-bound, zonder OR-Tools
+
+
+class SplitPolicy(Enum):
+    """Hoe te lange onderdelen in delen gesplitst worden"""
+    MAX_REST = "max_rest"    # Zo lang mogelijke delen + één reststuk
+    BALANCED = "balanced"    # Even lange delen
+    OPTIMIZED = "optimized"  # Splitspunten gekozen op de restruimte in de latten
+
+
+class Formulation(Enum):
+    """MIP model voor ORTOOLS_OPTIMAL"""
+    AUTO = "auto"            # Arc-flow bij meerdere latlengtes, anders patronen
+    PATTERNS = "patterns"    # Opgesomde snijpatronen per voorraadlengte (Gilmore-Gomory)
+    ARC_FLOW = "arc_flow"    # Gecomprimeerde arc-flow graaf, gedeeld door alle latlengtes
+
+
+# Standaard tijdsbudget voor het kiezen van splitspunten (OPTIMIZED)
+SPLIT_TIME_BUDGET = 1.0
+
+# Maximaal aantal snijpatronen per voorraadlengte (ORTOOLS_OPTIMAL)
+MAX_PATTERNS = 1000
+
+# Meeste stukken per profiel voor EXACT; daarboven valt die terug op HYBRID
+EXACT_MAX_PIECES = 200
+
+# Zoektijd van EXACT in seconden als er geen deadline is
+EXACT_TIME_BUDGET = 10.0
 
 
 @dataclass
@@ -36,6 +78,7 @@ class Part:
     length: float
     quantity: int = 1
     label: str = ""
+    profile: str = ""  # Profiel/materiaal (bv. "38x89"), '' = niet gespecificeerd
     
     def __post_init__(self):
         if not self.label:
@@ -50,6 +93,7 @@ class Stock:
     quantity: int = -1  # -1 = onbeperkt
     cost: float = 1.0   # Voor kostoptimalisatie
     label: str = ""
+    profile: str = ""   # Profiel/materiaal, moet overeenkomen met Part.profile
     
     def __post_init__(self):
         if not self.label:
@@ -64,6 +108,7 @@ class CutPlan:
     cuts: List[Tuple[str, float]]  # [(part_id, length), ...]
     waste: float
     stock_index: int  # Welke van de voorraad (0, 1, 2, ...)
+    profile: str = ""
 
 
 @dataclass
@@ -74,21 +119,132 @@ class OptimizationResult:
     total_stocks_used: int
     total_waste: float
     waste_percentage: float
-    parts_not_placed: List[Part]  # Te lange stukken
+    parts_not_placed: List[Part]  # Te lange stukken en stukken zonder voorraad
     computation_time_ms: float
-    
+    profiles: Dict[str, "ProfileStats"] = field(default_factory=dict)  # Alleen bij meerdere profielen
+    fingerprint: str = ""  # Hash van het canonieke plan (zie plan_fingerprint)
+    solver_status: str = ""  # Eindstatus van de MIP solver ('' = geen MIP gebruikt)
+    solver: str = ""  # Gebruikte MIP backend, zie solvers.py ('' = geen MIP gebruikt)
+    formulation: str = ""  # Gebruikt MIP model, zie Formulation ('' = geen MIP gebruikt)
+    fallback: str = ""  # Algoritme waarop teruggevallen is ('' = geen)
+    proven_optimal: bool = False  # Kosten gelijk aan de ondergrens (of MIP optimaal over alle patronen)
+    deadline_reached: bool = False  # Gestopt op de deadline: beste plan tot dan toe
+    lower_bound: float = 0.0  # Ondergrens voor de voorraadkosten (zie cost_lower_bound)
+    incumbents: List[Tuple[float, str, float]] = field(default_factory=list)  # (ms, bron, kosten) per verbetering
+    profile: Optional[dict] = None  # Fasetijden en tellers (alleen met profiling)
+    validation: Optional[ValidationReport] = None  # Alleen met validate (zie validation.py)
+
+
+@dataclass
+class ProfileStats:
+    """Statistieken van één profiel binnen een multi-profiel optimalisatie"""
+    profile: str
+    stocks_used: int
+    total_waste: float
+    waste_percentage: float
+    parts_not_placed: int
+    computation_time_ms: float
+    solver_status: str = ""
+    solver: str = ""
+    formulation: str = ""
+    fallback: str = ""
+    proven_optimal: bool = False
+    deadline_reached: bool = False
+
+
+@dataclass
+class Incumbent:
+    """
+    Beste plan tot nu toe (anytime)
+
+    Elke fase biedt zijn plan aan; het plan met de meeste geplaatste
+    stukken, daarna de laagste kosten en daarna de minste voorraadlengte
+    blijft over. Bewezen optimaal zodra alles geplaatst is tegen kosten
+    gelijk aan de ondergrens.
+    """
+    lower_bound: float
+    start_time: float
+    pieces: int  # Te plaatsen stukken
+    plans: Optional[List[CutPlan]] = None
+    source: str = ""
+    cost: float = math.inf
+    key: Tuple = ()
+    trace: List[Tuple[float, str, float]] = field(default_factory=list)
+
+    @property
+    def proven_optimal(self) -> bool:
+        return bool(self.key) and self.key[0] == -self.pieces and self.cost <= self.lower_bound + 1e-6
+
+    def offer(self, plans: List[CutPlan], source: str, cost: float) -> bool:
+        """Neem het plan over als het beter is dan het huidige"""
+        key = (-sum(len(p.cuts) for p in plans), round(cost, 6), sum(p.stock_length for p in plans))
+        if self.plans is not None and key >= self.key:
+            return False
+        self.plans, self.source, self.cost, self.key = plans, source, cost, key
+        self.record(source, cost)
+        return True
+
+    def record(self, source: str, cost: float):
+        """Voeg een tussenoplossing toe aan het verloop"""
+        self.trace.append((round((_time.time() - self.start_time) * 1000, 2), source, cost))
+
 
 class Optimizer1D:
     """
     1D Cutting Stock Optimizer met meerdere algoritmes
     """
     
-    def __init__(self, kerf: float = 3.0):
+    def __init__(
+        self,
+        kerf: float = 3.0,
+        split_policy: SplitPolicy = SplitPolicy.MAX_REST,
+        min_segment_length: float = 0.0,
+        seed: int = 0,
+        profile: bool = False,
+        solver: Solver = Solver.AUTO,
+        threads: int = 0,
+        pattern_cache: bool = False,
+        cancel_token: CancelToken = NEVER_CANCELLED,
+        formulation: Formulation = Formulation.AUTO,
+        trim: float = 0.0,
+        validate: bool = False
+    ):
         """
         Args:
             kerf: Zaagsnede breedte in mm
+            split_policy: Hoe te lange onderdelen gesplitst worden
+            min_segment_length: Kortste toegestane deel bij OPTIMIZED splitsen
+            seed: Bepaalt de volgorde van gelijke stukken (zie canonical_order)
+            profile: Meet tijd per fase en tellers (zie profiling.py)
+            solver: MIP backend voor ORTOOLS_OPTIMAL (zie solvers.py)
+            threads: Threads voor de MIP solver (0 = alle CPU's van deze worker)
+            pattern_cache: Haal snijpatronen uit de patroonbibliotheek (zie pattern_store.py)
+            cancel_token: Breekt de optimalisatie af met SolveCancelled (zie cancellation.py)
+            formulation: MIP model voor ORTOOLS_OPTIMAL (patronen of arc-flow)
+            trim: Haaks afzagen van het begin van elke lat in mm (zie plan_eval.py)
+            validate: Controleer het resultaat (zie validation.py)
         """
         self.kerf = kerf
+        self.trim = trim
+        self.kerf_model = KerfModel(kerf, trim)
+        self.split_policy = split_policy
+        self.min_segment_length = min_segment_length
+        self.seed = seed
+        self.solver = solver
+        self.threads = threads
+        self.pattern_store = default_store() if pattern_cache else None
+        self.cancel_token = cancel_token
+        self.formulation = formulation
+        self.validate = validate
+        self.solver_status = ""
+        self.solver_used = ""
+        self.formulation_used = ""
+        self.fallback = ""
+        self.time_limit: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.deadline_reached = False
+        self.incumbent: Optional[Incumbent] = None
+        self.profiler = Profiler() if profile else NULL_PROFILER
     
     def optimize(
         self,
@@ -96,7 +252,8 @@ class Optimizer1D:
         stocks: List[Stock],
         algorithm: Algorithm = Algorithm.HYBRID,
         max_split_parts: int = 2,
-        joint_allowance: float = 0.0
+        joint_allowance: float = 0.0,
+        time_limit: Optional[float] = None
     ) -> OptimizationResult:
         """
         Hoofdfunctie: optimaliseer zaagplan
@@ -107,150 +264,868 @@ class Optimizer1D:
             algorithm: Te gebruiken algoritme
             max_split_parts: Max aantal delen per onderdeel (1=niet splitsen)
             joint_allowance: Extra lengte per verbinding in mm
+            time_limit: Deadline in seconden (None = geen). Er is altijd een
+                eerste plan (het greedy algoritme zelf, of bij ORTOOLS_OPTIMAL
+                eerst FFD); daarna worden de duurdere fasen (MIP, splitspunten,
+                local search) op de deadline afgebroken en komt het beste plan
+                tot dan toe terug
             
         Returns:
             OptimizationResult met zaagplan
         """
         import time
         start_time = time.time()
+        self.time_limit = time_limit
+        self.deadline = start_time + time_limit if time_limit is not None else None
+        self.deadline_reached = False
+        self.solver_status = ""
+        self.solver_used = ""
+        self.formulation_used = ""
+        self.fallback = ""
+        
+        # Sorteer voorraad op lengte (langste eerst), gelijke lengtes op kosten en id
+        sorted_stocks = sorted(stocks, key=lambda s: (-s.length, s.cost, s.id))
+        
+        profiler = self.profiler
+        cancel_token = self.cancel_token
+        with profiler.span("expand"):
+            parts_ok, parts_too_long, origin = self.expand_parts(
+                parts, stocks, max_split_parts, joint_allowance
+            )
+        # Vaste volgorde: het resultaat hangt niet af van de invoervolgorde
+        with profiler.span("order"):
+            parts_ok = canonical_order(parts_ok, self.seed)
+        profiler.count("pieces", len(parts_ok))
+        cancel_token.check()
+        
+        self._stock_by_id = {s.id: s for s in sorted_stocks}
+        self.incumbent = Incumbent(
+            lower_bound=cost_lower_bound(parts_ok, sorted_stocks, self.kerf_model),
+            start_time=start_time,
+            pieces=len(parts_ok)
+        )
+        try:
+            # De MIP heeft geen vaste looptijd: eerst een snel FFD plan, zodat
+            # er op de deadline altijd iets ligt
+            if self.deadline is not None and algorithm == Algorithm.ORTOOLS_OPTIMAL:
+                with profiler.span("baseline"):
+                    self._offer(self._optimize_ffd(parts_ok, sorted_stocks), Algorithm.FFD.value)
+            
+            # Kies algoritme
+            with profiler.span(f"solve.{algorithm.value}"):
+                if algorithm == Algorithm.ORTOOLS_OPTIMAL:
+                    plans = self._optimize_ortools_optimal(parts_ok, sorted_stocks)
+                elif algorithm == Algorithm.ORTOOLS_FAST:
+                    plans = self._optimize_ortools_fast(parts_ok, sorted_stocks)
+                elif algorithm == Algorithm.FFD:
+                    plans = self._optimize_ffd(parts_ok, sorted_stocks)
+                elif algorithm == Algorithm.HYBRID:
+                    plans = self._optimize_hybrid(parts_ok, sorted_stocks)
+                elif algorithm == Algorithm.SMART_SPLIT:
+                    plans = self._optimize_smart_split(parts_ok, sorted_stocks, self._rest_segments(origin))
+                elif algorithm == Algorithm.EXACT:
+                    plans = self._optimize_exact(parts_ok, sorted_stocks)
+                else:
+                    plans = self._optimize_ffd(parts_ok, sorted_stocks)
+            self._offer(plans, self.fallback or algorithm.value)
+            
+            cancel_token.check()
+            
+            # OPTIMIZED: splitspunten achteraf verschuiven tegen de restruimte
+            if self.split_policy == SplitPolicy.OPTIMIZED:
+                split_items: Dict[str, List[Tuple[str, float]]] = {}
+                for part in parts_ok:
+                    item_id = origin[part.id][1]
+                    if part.id != item_id:
+                        split_items.setdefault(item_id, []).append((part.id, part.length))
+                if split_items:
+                    with profiler.span("split_points"):
+                        self._offer(self._optimize_split_points(plans, split_items, stocks), "split_points")
+            
+            # Resterende tijd tot de deadline: local search op het beste plan
+            if self.deadline is not None and not self.incumbent.proven_optimal:
+                with profiler.span("local_search"):
+                    self._improve(self.incumbent.plans, stocks)
+        except DeadlineReached:
+            self.deadline_reached = True
+            print(f"[ANYTIME] Deadline bereikt, beste plan tot nu toe: {self.incumbent.source}")
+        plans = self.incumbent.plans
+        
+        # Stukken waar geen voorraad meer voor was, gaan niet stilletjes verloren
+        placed = {cut[0] for plan in plans for cut in plan.cuts}
+        parts_not_placed = parts_too_long + [p for p in parts_ok if p.id not in placed]
+        
+        with profiler.span("result"):
+            result = self._build_result(algorithm.value, plans, parts_not_placed, start_time)
+        if self.validate:
+            with profiler.span("validate"):
+                result.validation = validate_result(
+                    result, parts_ok + parts_too_long, sorted_stocks, self.kerf_model, origin,
+                    parts=parts, max_split_parts=max_split_parts, joint_allowance=joint_allowance
+                )
+            if not result.validation.valid:
+                print(f"[VALIDATE] Ongeldig plan: {result.validation.errors}")
+        result.profile = profiler.to_dict()
+        return result
+    
+    def checkpoint(self):
+        """
+        Breek af bij annuleren (SolveCancelled) of na de deadline
+        (DeadlineReached); de deadline geldt pas als er al een plan is
+        """
+        self.cancel_token.check()
+        if (
+            self.deadline is not None
+            and self.incumbent is not None
+            and self.incumbent.plans is not None
+            and _time.time() >= self.deadline
+        ):
+            raise DeadlineReached()
+    
+    def _remaining(self) -> Optional[float]:
+        """Seconden tot de deadline (None = geen deadline)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - _time.time())
+    
+    def _plan_cost(self, plans: List[CutPlan]) -> float:
+        return sum(self._stock_by_id[p.stock_id].cost for p in plans)
+    
+    def _offer(self, plans: List[CutPlan], source: str) -> bool:
+        """Bied een plan aan als nieuwe incumbent"""
+        cost = self._plan_cost(plans)
+        improved = self.incumbent.offer(plans, source, cost)
+        if improved:
+            print(f"[ANYTIME] Nieuw beste plan ({source}): {len(plans)} latten, kosten {cost:g}"
+                  f"{' (optimaal)' if self.incumbent.proven_optimal else ''}")
+        return improved
+    
+    def _improve(self, plans: List[CutPlan], stocks: List[Stock]):
+        """Local search tot de deadline; elke verbeterde ronde wordt aangeboden"""
+        bins = [(self._stock_by_id[p.stock_id], list(p.cuts)) for p in plans]
+        while not self.incumbent.proven_optimal:
+            if not self._eliminate_bins(bins) and not self._downsize_bins(bins, stocks):
+                break
+            self._offer(self._bins_to_plans(bins), "local_search")
+    
+    def optimize_profiles(
+        self,
+        parts: List[Part],
+        stocks: List[Stock],
+        algorithm: Algorithm = Algorithm.HYBRID,
+        max_split_parts: int = 2,
+        joint_allowance: float = 0.0,
+        time_limit: Optional[float] = None,
+        workers: Optional[int] = 1
+    ) -> OptimizationResult:
+        """
+        Optimaliseer meerdere profielen (doorsneden/materialen) in één keer
         
-        # Expand parts by quantity
-        expanded_parts = []
-        for part in parts:
-            for i in range(part.quantity):
-                expanded_parts.append(Part(
-                    id=f"{part.id}_{i+1}" if part.quantity > 1 else part.id,
-                    length=part.length,
-                    quantity=1,
-                    label=part.label
-                ))
+        Onderdelen en voorraad worden per profiel verdeeld en de profielen
+        worden parallel opgelost. Ze delen één tijdsbudget: elk profiel krijgt
+        de tijd die nog over is wanneer het aan de beurt is.
         
-        # Sorteer voorraad op lengte (langste eerst)
-        sorted_stocks = sorted(stocks, key=lambda s: s.length, reverse=True)
+        Args:
+            time_limit: Totaal tijdsbudget in seconden (None = onbeperkt)
+            workers: Aantal processen (None = alle CPU's)
+            
+        Returns:
+            Gecombineerd OptimizationResult met statistieken per profiel
+        """
+        import time
+        start_time = time.time()
+        deadline = start_time + time_limit if time_limit is not None else None
         
-        # Check voor te lange stukken en splits indien nodig
-        max_stock_length = max(s.length for s in stocks)
-        parts_ok = []
-        parts_too_long = []
+        parts_by_profile: Dict[str, List[Part]] = {}
+        for part in parts:
+            parts_by_profile.setdefault(part.profile, []).append(part)
+        stocks_by_profile: Dict[str, List[Stock]] = {}
+        for stock in stocks:
+            stocks_by_profile.setdefault(stock.profile, []).append(stock)
+        
+        # Eén profiel: gewoon in dit proces
+        if len(parts_by_profile) == 1 and set(stocks_by_profile) == set(parts_by_profile):
+            result = self.optimize(
+                parts, stocks, algorithm, max_split_parts, joint_allowance, time_limit
+            )
+            # Zoals bij meerdere profielen: latten (en dus reststukken) houden hun profiel
+            profile = parts[0].profile
+            if profile:
+                for plan in result.plans:
+                    plan.profile = profile
+                result.fingerprint = plan_fingerprint(result.plans, result.parts_not_placed)
+            return result
+        
+        profiler = self.profiler
+        self.incumbent = None
+        self.deadline_reached = False
+        calls = []
+        missing: List[Part] = []
+        for profile, profile_parts in sorted(parts_by_profile.items()):
+            if profile not in stocks_by_profile:
+                print(f"[PROFILES] Geen voorraad voor profiel '{profile}'")
+                missing.extend(profile_parts)
+                continue
+            calls.append((
+                self.settings(), profile_parts, stocks_by_profile[profile],
+                algorithm, max_split_parts, joint_allowance, deadline
+            ))
         
-        for part in expanded_parts:
-            if part.length + self.kerf <= max_stock_length:
-                parts_ok.append(part)
-            elif max_split_parts > 1:
-                # Splits het onderdeel
-                split_parts = self._split_part(part, max_stock_length, max_split_parts, joint_allowance)
-                if split_parts:
-                    parts_ok.extend(split_parts)
-                else:
-                    parts_too_long.append(part)
+        n_workers = min(resolve_workers(workers), len(calls))
+        if n_workers > 1:
+            # Verdeel de solver threads over de processen
+            threads = max(1, (self.threads or worker_cpus()) // n_workers)
+            for call in calls:
+                call[0]["threads"] = threads
+        with profiler.span("solve.profiles"):
+            if n_workers > 1:
+                results = run_parallel(
+                    _optimize_profile, calls, max_workers=n_workers, cancel_token=self.cancel_token
+                )
             else:
-                parts_too_long.append(part)
-        
-        # Kies algoritme
-        if algorithm == Algorithm.ORTOOLS_OPTIMAL:
-            plans = self._optimize_ortools_optimal(parts_ok, sorted_stocks)
-        elif algorithm == Algorithm.ORTOOLS_FAST:
-            plans = self._optimize_ortools_fast(parts_ok, sorted_stocks)
-        elif algorithm == Algorithm.FFD:
-            plans = self._optimize_ffd(parts_ok, sorted_stocks)
-        elif algorithm == Algorithm.HYBRID:
-            plans = self._optimize_hybrid(parts_ok, sorted_stocks)
-        elif algorithm == Algorithm.SMART_SPLIT:
-            plans = self._optimize_smart_split(parts_ok, sorted_stocks, max_split_parts, joint_allowance)
-        else:
-            plans = self._optimize_ffd(parts_ok, sorted_stocks)
+                results = [_optimize_profile(*call, cancel_token=self.cancel_token) for call in calls]
+        
+        plans: List[CutPlan] = []
+        not_placed: List[Part] = list(missing)
+        profiles: Dict[str, ProfileStats] = {}
+        for call, result in zip(calls, results):
+            profile = call[1][0].profile
+            for plan in result.plans:
+                plan.profile = profile
+            plans.extend(result.plans)
+            not_placed.extend(result.parts_not_placed)
+            profiles[profile] = ProfileStats(
+                profile=profile,
+                stocks_used=result.total_stocks_used,
+                total_waste=result.total_waste,
+                waste_percentage=result.waste_percentage,
+                parts_not_placed=len(result.parts_not_placed),
+                computation_time_ms=result.computation_time_ms,
+                solver_status=result.solver_status,
+                solver=result.solver,
+                formulation=result.formulation,
+                fallback=result.fallback,
+                proven_optimal=result.proven_optimal,
+                deadline_reached=result.deadline_reached
+            )
+        for part in missing:
+            stats = profiles.setdefault(part.profile, ProfileStats(part.profile, 0, 0.0, 0.0, 0, 0.0))
+            stats.parts_not_placed += part.quantity
+        
+        with profiler.span("result"):
+            result = self._build_result(algorithm.value, plans, not_placed, start_time)
+        result.profiles = profiles
+        result.proven_optimal = not missing and all(r.proven_optimal for r in results)
+        result.deadline_reached = any(r.deadline_reached for r in results)
+        result.lower_bound = sum(r.lower_bound for r in results)
+        if self.validate:
+            result.validation = ValidationReport()
+            for r in results:
+                result.validation.merge(r.validation)
+        if profiler.enabled:
+            result.profile = profiler.to_dict()
+            result.profile["profiles"] = {
+                call[1][0].profile: r.profile for call, r in zip(calls, results)
+            }
+        return result
+    
+    def _build_result(
+        self,
+        algorithm: str,
+        plans: List[CutPlan],
+        parts_too_long: List[Part],
+        start_time: float
+    ) -> OptimizationResult:
+        """Bereken statistieken en bouw het resultaat"""
+        import time
         
-        # Bereken statistieken
-        total_stock_length = sum(p.stock_length for p in plans)
-        total_cuts_length = sum(
-            sum(cut[1] for cut in p.cuts) + (len(p.cuts) - 1) * self.kerf
-            for p in plans if p.cuts
-        )
-        total_waste = total_stock_length - total_cuts_length if plans else 0
-        waste_pct = (total_waste / total_stock_length * 100) if total_stock_length > 0 else 0
+        # Eén evaluatie voor alle algoritmes: reststuk per lat na de laatste zaagsnede
+        evaluation = self.kerf_model.evaluate_plans(plans)
+        for plan, offcut in zip(plans, evaluation.offcut.tolist()):
+            plan.waste = offcut
+        total_waste = evaluation.total_waste
+        waste_pct = evaluation.waste_percentage
         
         computation_time = (time.time() - start_time) * 1000
+        incumbent = self.incumbent
         
         return OptimizationResult(
-            algorithm=algorithm.value,
+            algorithm=algorithm,
             plans=plans,
             total_stocks_used=len(plans),
             total_waste=total_waste,
             waste_percentage=waste_pct,
             parts_not_placed=parts_too_long,
-            computation_time_ms=computation_time
+            computation_time_ms=computation_time,
+            fingerprint=plan_fingerprint(plans, parts_too_long),
+            solver_status=self.solver_status,
+            solver=self.solver_used,
+            formulation=self.formulation_used,
+            fallback=self.fallback,
+            proven_optimal=incumbent is not None and incumbent.proven_optimal,
+            deadline_reached=self.deadline_reached,
+            lower_bound=incumbent.lower_bound if incumbent is not None else 0.0,
+            incumbents=list(incumbent.trace) if incumbent is not None else []
         )
     
-    def _split_part(
+    def settings(self) -> Dict:
+        """Constructor argumenten, om dezelfde optimizer in een worker te maken"""
+        return {
+            "kerf": self.kerf,
+            "trim": self.trim,
+            "split_policy": self.split_policy,
+            "min_segment_length": self.min_segment_length,
+            "seed": self.seed,
+            "profile": self.profiler.enabled,
+            "solver": self.solver,
+            "threads": self.threads,
+            "pattern_cache": self.pattern_store is not None,
+            "formulation": self.formulation,
+            "validate": self.validate,
+        }
+    
+    def reoptimize(
         self,
-        part: Part,
-        max_length: float,
-        max_parts: int,
-        joint_allowance: float
-    ) -> List[Part]:
+        previous: OptimizationResult,
+        previous_origin: Dict[str, Tuple[str, str]],
+        parts: List[Part],
+        stocks: List[Stock],
+        max_split_parts: int = 2,
+        joint_allowance: float = 0.0,
+        max_sweeps: int = 3
+    ) -> OptimizationResult:
         """
-        Split een te lang onderdeel in meerdere delen
+        Incrementele her-optimalisatie na een kleine wijziging
         
-        SLIM SPLITSEN LOGICA:
-        - Deel 1: max voorraadlengte (zo lang mogelijk)
-        - Deel 2: rest + joint_allowance (reststuk met overlap)
+        Vergelijkt de nieuwe onderdelenlijst met het vorige plan en repareert
+        alleen de geraakte latten:
+        1. Items die verdwenen (of van lengte veranderd) zijn eruit halen
+        2. Latten van voorraad die niet meer (genoeg) beschikbaar is oplossen
+        3. Nieuwe en losgekomen stukken best-fit terugplaatsen
+        4. Local search: probeer de leegste latten op te heffen door hun
+           stukken over de andere latten te verdelen, en zet latten om naar
+           de kortste voorraad waar ze nog op passen
         
         Args:
-            part: Het te splitsen onderdeel
-            max_length: Maximale lengte per deel
-            max_parts: Maximum aantal delen
-            joint_allowance: Extra lengte per verbinding
+            previous: Vorig resultaat
+            previous_origin: Herkomst van de stukken in het vorige plan
+                (zie expand_parts)
+            parts: Nieuwe volledige onderdelenlijst
+            stocks: Nieuwe voorraad
+            max_sweeps: Maximaal aantal local search rondes
             
         Returns:
-            Lijst van gesplitste delen, of lege lijst als niet mogelijk
+            OptimizationResult met het gerepareerde zaagplan
         """
-        original_length = part.length
+        import time
+        start_time = time.time()
+        self.deadline = None
+        self.deadline_reached = False
+        self.incumbent = None
+        
+        profiler = self.profiler
+        with profiler.span("expand"):
+            new_ok, parts_too_long, new_origin = self.expand_parts(
+                parts, stocks, max_split_parts, joint_allowance
+            )
+        
+        # Groepeer de stukken per item: {item_id: [(stuk_id, lengte), ...]}
+        def group_items(pieces, origin):
+            items: Dict[str, List[Tuple[str, float]]] = {}
+            for piece_id, length in pieces:
+                items.setdefault(origin[piece_id][1], []).append((piece_id, length))
+            return items
+        
+        old_items = group_items(
+            [cut for plan in previous.plans for cut in plan.cuts], previous_origin
+        )
+        new_items = group_items([(p.id, p.length) for p in new_ok], new_origin)
+        
+        # Koppel oude en nieuwe items per onderdeel op gelijke stuklengtes;
+        # gekoppelde items blijven liggen, de rest wordt verwijderd/toegevoegd
+        # Gesplitste items op aantal delen en totale lengte: zo blijven ook
+        # vrij gekozen splitspunten (OPTIMIZED) herkenbaar
+        def signature(item):
+            if len(item) > 1:
+                return ("split", len(item), round(sum(length for _, length in item), 3))
+            return (item[0][1],)
+        
+        old_by_key: Dict[Tuple, List[str]] = {}
+        for item_id in sorted(old_items):
+            key = (previous_origin[old_items[item_id][0][0]][0], signature(old_items[item_id]))
+            old_by_key.setdefault(key, []).append(item_id)
+        
+        kept_items = set()
+        to_insert: List[Tuple[str, float]] = []
+        unmatched_new = []
+        for item_id in sorted(new_items):
+            key = (new_origin[new_items[item_id][0][0]][0], signature(new_items[item_id]))
+            if old_by_key.get(key):
+                kept_items.add(old_by_key[key].pop(0))
+            else:
+                unmatched_new.append(item_id)
+        
+        # Nieuwe items krijgen een id dat niet botst met een bewaard item
+        used_ids = set(kept_items)
+        for item_id in unmatched_new:
+            new_id = item_id
+            part_id = new_origin[new_items[item_id][0][0]][0]
+            n = 1
+            while new_id in used_ids:
+                n += 1
+                new_id = f"{part_id}_{n}"
+            used_ids.add(new_id)
+            for piece_id, length in new_items[item_id]:
+                to_insert.append((new_id + piece_id[len(item_id):], length))
+        
+        # Kopieer de latten zonder verwijderde items
+        bins: List[Tuple[Stock, List[Tuple[str, float]]]] = []
+        stock_by_id = {s.id: s for s in stocks}
+        removed = 0
+        for plan in previous.plans:
+            cuts = [c for c in plan.cuts if previous_origin[c[0]][1] in kept_items]
+            removed += len(plan.cuts) - len(cuts)
+            stock = stock_by_id.get(plan.stock_id)
+            if stock is None or stock.length < self._bin_used(cuts):
+                # Voorraad verdwenen (of te kort geworden): alles opnieuw plaatsen
+                to_insert.extend(cuts)
+            elif cuts:
+                bins.append((stock, cuts))
+        
+        # Voorraad verlaagd: los de leegste overtollige latten op
+        for stock in stocks:
+            if stock.quantity == -1:
+                continue
+            own = [b for b in bins if b[0].id == stock.id]
+            surplus = len(own) - stock.quantity
+            if surplus > 0:
+                own.sort(key=lambda b: self._bin_used(b[1]))
+                for b in own[:surplus]:
+                    bins.remove(b)
+                    to_insert.extend(b[1])
+        
+        # Terugplaatsen: langste eerst, best-fit in bestaande latten
+        inserted = len(to_insert)
+        with profiler.span("insert"):
+            not_placed_ids = self._insert_best_fit(bins, to_insert, stocks)
+        
+        # Local search: leegste latten opheffen, latten verkleinen
+        with profiler.span("local_search"):
+            for _ in range(max_sweeps):
+                self.checkpoint()
+                if not self._eliminate_bins(bins) and not self._downsize_bins(bins, stocks):
+                    break
+        
+        plans = self._bins_to_plans(bins)
         
-        # Check of splitsen nodig is
-        if original_length <= max_length:
-            return [part]
+        for piece_id, length in not_placed_ids:
+            parts_too_long.append(Part(id=piece_id, length=length))
         
-        # Check of splitsen mogelijk is binnen max_parts
-        # Met slim splitsen: deel1 = max, deel2 = rest + joint
-        remaining = original_length
-        split_parts = []
-        part_num = 0
+        print(f"[INCREMENTAL] {removed} stukken verwijderd, {inserted} (her)plaatst, "
+              f"{len(previous.plans)} → {len(plans)} latten")
         
-        while remaining > 0 and part_num < max_parts:
-            part_num += 1
+        with profiler.span("result"):
+            result = self._build_result("incremental", plans, parts_too_long, start_time)
+        result.profile = profiler.to_dict()
+        return result
+    
+    def _bins_to_plans(self, bins: List[Tuple[Stock, List[Tuple[str, float]]]]) -> List[CutPlan]:
+        """
+        Converteer (voorraad, zaagsneden) latten naar CutPlans
+
+        Elk plan krijgt een eigen kopie van de zaagsneden: _improve werkt na
+        het aanbieden verder op dezelfde latten, en de incumbent mag daar
+        niet mee veranderen.
+        """
+        plans = []
+        stock_counts: Dict[str, int] = {}
+        for stock, cuts in bins:
+            stock_counts[stock.id] = stock_counts.get(stock.id, 0) + 1
+            plans.append(CutPlan(
+                stock_id=stock.id,
+                stock_length=stock.length,
+                cuts=list(cuts),
+                waste=self.kerf_model.offcut(stock.length - self._bin_used(cuts)),
+                stock_index=stock_counts[stock.id] - 1
+            ))
+        return plans
+    
+    def _optimize_split_points(
+        self,
+        plans: List[CutPlan],
+        items: Dict[str, List[Tuple[str, float]]],
+        stocks: List[Stock]
+    ) -> List[CutPlan]:
+        """
+        Kies de splitspunten van gesplitste items opnieuw (OPTIMIZED)
+        
+        De totale lengte en het aantal delen van een item liggen vast, de
+        splitspunten niet. Per item (langste eerst) gaan de delen uit het
+        plan en worden kandidaat-splitsingen geëvalueerd tegen de restruimte
+        van de overige latten: de huidige splitsing, gebalanceerd, een deel
+        dat precies een gat vult en (bij 3+ delen) een set gaten gekozen met
+        de knapsack. De kandidaat met de minste nieuwe latten (daarna het
+        minste nieuwe materiaal en de strakste fit) wint; bij gelijkspel
+        blijft de huidige splitsing, dus het plan wordt nooit slechter.
+        Stopt na het tijdsbudget.
+        """
+        stock_by_id = {s.id: s for s in stocks}
+        by_length = sorted(stocks, key=lambda s: s.length)
+        max_length = self.kerf_model.capacity(by_length[-1].length)
+        bins = [(stock_by_id[p.stock_id], list(p.cuts)) for p in plans]
+        
+        budget = min(self.time_limit, SPLIT_TIME_BUDGET) if self.time_limit else SPLIT_TIME_BUDGET
+        deadline = _time.time() + budget
+        if self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        changed = 0
+        
+        for item_id in sorted(items, key=lambda i: -sum(length for _, length in items[i])):
+            if _time.time() > deadline:
+                print(f"[SPLIT] Tijdsbudget op na {changed} aangepaste splitsingen")
+                break
+            self.checkpoint()
+            names = [piece_id for piece_id, _ in items[item_id]]
+            piece_ids = set(names)
+            placed = {
+                piece_id: length for _, cuts in bins for piece_id, length in cuts if piece_id in piece_ids
+            }
+            if len(placed) != len(names):
+                continue  # Niet (volledig) geplaatst
+            current = [placed[piece_id] for piece_id in names]
             
-            if remaining <= max_length:
-                # Laatste deel past volledig
-                # Voeg joint_allowance toe als het niet het eerste deel is
-                this_length = remaining + (joint_allowance if part_num > 1 else 0)
-                
-                # Check of het nog steeds past
-                if this_length > max_length:
-                    this_length = remaining  # Geen extra als het niet past
-                
-                split_parts.append(Part(
-                    id=f"{part.id}_d{part_num}",
-                    length=this_length,
-                    quantity=1,
-                    label=f"{part.label} (deel {part_num})"
-                ))
-                remaining = 0
+            # Haal het item uit het plan; lege latten vervallen
+            bins = [
+                (stock, [c for c in cuts if c[0] not in piece_ids]) for stock, cuts in bins
+            ]
+            bins = [b for b in bins if b[1]]
+            used_count: Dict[str, int] = {}
+            for stock, _ in bins:
+                used_count[stock.id] = used_count.get(stock.id, 0) + 1
+            # Restruimte: het langste stuk dat er nog bij past
+            rests = sorted(
+                (stock.length - self._bin_used(cuts) - self.kerf_model.need(0.0, len(cuts)), i)
+                for i, (stock, cuts) in enumerate(bins)
+            )
+            
+            candidates = [current] + self._split_candidates(
+                sum(current), len(current), max_length, rests
+            )
+            if min(current) < self.min_segment_length and len(candidates) > 1:
+                candidates.pop(0)
+            
+            best = None
+            for segments in candidates:
+                outcome = self._simulate_segments(segments, rests, used_count, by_length)
+                if outcome is not None and (best is None or outcome[0] < best[0]):
+                    best = (outcome[0], segments, outcome[1])
+            if best is None:
+                # Kan niet: de huidige splitsing paste net nog
+                best = (None, current, self._simulate_segments(current, rests, {}, by_length)[1])
+            
+            _, segments, targets = best
+            for piece_id, length, target in zip(names, segments, targets):
+                if isinstance(target, int):
+                    bins[rests[target][1]][1].append((piece_id, length))
+                else:
+                    bins.append((target, [(piece_id, length)]))
+            if segments != current:
+                changed += 1
+                print(f"[SPLIT] {item_id}: {' + '.join(f'{s:g}' for s in current)} → "
+                      f"{' + '.join(f'{s:g}' for s in segments)}mm")
+        
+        # Local search zoals bij incrementeel her-optimaliseren; de latten
+        # blijven geldig als de deadline halverwege valt
+        try:
+            for _ in range(3):
+                if not self._eliminate_bins(bins) and not self._downsize_bins(bins, stocks):
+                    break
+        except DeadlineReached:
+            pass
+        
+        return self._bins_to_plans(bins)
+    
+    def _split_candidates(
+        self,
+        total: float,
+        n: int,
+        max_length: float,
+        rests: List[Tuple[float, int]],
+        max_gaps: int = 16
+    ) -> List[List[float]]:
+        """Kandidaat-splitsingen van een item met totale lengte total in n delen"""
+        min_seg = self.min_segment_length
+        lo = max(min_seg, total - (n - 1) * max_length)
+        hi = min(max_length, total - (n - 1) * min_seg)
+        if lo > hi:
+            return []
+        
+        def complete(prefix: List[float]) -> Optional[List[float]]:
+            # Vul aan tot n delen: zo lang mogelijk, laatste deel >= min_seg
+            m = n - len(prefix)
+            remaining = total - sum(prefix)
+            if m == 0 or remaining < m * min_seg - 1e-6 or remaining > m * max_length + 1e-6:
+                return None
+            segments = [max_length] * (m - 1) + [remaining - (m - 1) * max_length]
+            if segments[-1] < min_seg:
+                segments[0] -= min_seg - segments[-1]
+                segments[-1] = min_seg
+            if min(segments) <= 0:
+                return None
+            return prefix + segments
+        
+        candidates = []
+        balanced = math.ceil(total / n * 10 - 1e-6) / 10
+        candidates.append(complete([balanced] * (n - 1)))
+        
+        # Eén deel vult precies een gat (grootste gaten binnen bereik eerst)
+        start = bisect_left(rests, (lo,))
+        end = bisect_left(rests, (hi + 1e-9,))
+        gaps = sorted({math.floor(r * 10) / 10 for r, _ in rests[start:end]}, reverse=True)
+        for gap in gaps[:max_gaps]:
+            candidates.append(complete([gap]))
+        candidates.append(complete([hi]))
+        
+        # Meerdere gaten tegelijk: knapsack op de grootste gaten
+        if n >= 3:
+            pool = [math.floor(min(r, hi) * 10) / 10 for r, _ in rests[-max_gaps:] if r >= min_seg]
+            if pool:
+                _, counts = solve_knapsack(
+                    pool, pool, total - min_seg, max_counts=[1] * len(pool), max_nodes=20000
+                )
+                chosen = sorted((g for g, c in zip(pool, counts) if c), reverse=True)[:n - 1]
+                if chosen:
+                    candidates.append(complete(chosen))
+        
+        return [c for c in candidates if c is not None]
+    
+    def _simulate_segments(
+        self,
+        segments: List[float],
+        rests: List[Tuple[float, int]],
+        used_count: Dict[str, int],
+        by_length: List[Stock]
+    ) -> Optional[Tuple[Tuple[int, float, float], list]]:
+        """
+        Best-fit plaatsing van de delen van één item, zonder iets te wijzigen
+        
+        Returns:
+            ((nieuwe latten, nieuw materiaal, restruimte in gebruikte gaten),
+            doel per deel: positie in rests of nieuwe Stock), of None
+        """
+        targets: list = [None] * len(segments)
+        taken: Set[int] = set()
+        extra: Dict[str, int] = {}
+        new_bars, new_length, leftover = 0, 0.0, 0.0
+        for k in sorted(range(len(segments)), key=lambda k: -segments[k]):
+            length = segments[k]
+            pos = bisect_left(rests, (length - 1e-9,))
+            while pos in taken:
+                pos += 1
+            if pos < len(rests):
+                taken.add(pos)
+                targets[k] = pos
+                leftover += rests[pos][0] - length
+                continue
+            for stock in by_length:
+                available = math.inf if stock.quantity == -1 else stock.quantity
+                if stock.length >= self.kerf_model.need(length, 0) and used_count.get(stock.id, 0) + extra.get(stock.id, 0) < available:
+                    extra[stock.id] = extra.get(stock.id, 0) + 1
+                    targets[k] = stock
+                    new_bars += 1
+                    new_length += stock.length
+                    break
+            else:
+                return None
+        return (new_bars, new_length, leftover), targets
+    
+    def _bin_used(self, cuts: List[Tuple[str, float]]) -> float:
+        """Gebruikte lengte van een lat inclusief zaagsneden en trim"""
+        return self.kerf_model.core(sum(c[1] for c in cuts), len(cuts))
+    
+    def _insert_best_fit(
+        self,
+        bins: List[Tuple[Stock, List[Tuple[str, float]]]],
+        pieces: List[Tuple[str, float]],
+        stocks: List[Stock]
+    ) -> List[Tuple[str, float]]:
+        """
+        Plaats stukken best-fit in bestaande latten, anders in een nieuwe
+        (kortste passende beschikbare voorraad)
+        
+        Returns:
+            Stukken die nergens pasten
+        """
+        used_count: Dict[str, int] = {}
+        for stock, _ in bins:
+            used_count[stock.id] = used_count.get(stock.id, 0) + 1
+        
+        kerf_model = self.kerf_model
+        not_placed = []
+        for piece in sorted(pieces, key=lambda c: c[1], reverse=True):
+            best = None
+            best_rest = None
+            for i, (stock, cuts) in enumerate(bins):
+                rest = stock.length - self._bin_used(cuts) - kerf_model.need(piece[1], len(cuts))
+                if rest >= 0 and (best_rest is None or rest < best_rest):
+                    best, best_rest = i, rest
+            
+            if best is not None:
+                bins[best][1].append(piece)
+                continue
+            
+            for stock in sorted(stocks, key=lambda s: s.length):
+                available = math.inf if stock.quantity == -1 else stock.quantity
+                if stock.length >= kerf_model.need(piece[1], 0) and used_count.get(stock.id, 0) < available:
+                    used_count[stock.id] = used_count.get(stock.id, 0) + 1
+                    bins.append((stock, [piece]))
+                    break
             else:
-                # Neem maximale lengte
-                split_parts.append(Part(
-                    id=f"{part.id}_d{part_num}",
-                    length=max_length,
-                    quantity=1,
-                    label=f"{part.label} (deel {part_num})"
-                ))
-                # Trek af: max_length - joint_allowance (want overlap gaat naar volgend stuk)
-                remaining -= (max_length - joint_allowance)
-        
-        # Check of alles geplaatst kon worden
-        if remaining > 0:
-            return []  # Kan niet gesplitst worden binnen limiet
-        
-        return split_parts
+                not_placed.append(piece)
+                print(f"[INCREMENTAL] Geen voorraad voor {piece[0]} ({piece[1]}mm)")
+        
+        return not_placed
+    
+    def _eliminate_bins(self, bins: List[Tuple[Stock, List[Tuple[str, float]]]]) -> bool:
+        """
+        Probeer latten op te heffen door al hun stukken best-fit over de
+        andere latten te verdelen (leegste lat eerst)
+        
+        Returns:
+            True als er minstens één lat opgeheven is
+        """
+        improved = False
+        for target in sorted(bins, key=lambda b: self._bin_used(b[1]) / b[0].length):
+            self.checkpoint()
+            others = [b for b in bins if b is not target]
+            rests = [stock.length - self._bin_used(cuts) for stock, cuts in others]
+            counts = [len(cuts) for _, cuts in others]
+            moves = []
+            for piece in sorted(target[1], key=lambda c: c[1], reverse=True):
+                best = None
+                for i in range(len(others)):
+                    need = self.kerf_model.need(piece[1], counts[i])
+                    if rests[i] >= need and (best is None or rests[i] < rests[best]):
+                        best = i
+                if best is None:
+                    break
+                rests[best] -= self.kerf_model.need(piece[1], counts[best])
+                counts[best] += 1
+                moves.append((best, piece))
+            else:
+                for i, piece in moves:
+                    others[i][1].append(piece)
+                bins.remove(target)
+                improved = True
+        return improved
+    
+    def _downsize_bins(
+        self,
+        bins: List[Tuple[Stock, List[Tuple[str, float]]]],
+        stocks: List[Stock]
+    ) -> bool:
+        """
+        Zet latten om naar de kortste beschikbare voorraad waar de stukken
+        nog op passen
+        
+        Returns:
+            True als er minstens één lat verkleind is
+        """
+        used_count: Dict[str, int] = {}
+        for stock, _ in bins:
+            used_count[stock.id] = used_count.get(stock.id, 0) + 1
+        
+        improved = False
+        for i, (stock, cuts) in enumerate(bins):
+            used = self._bin_used(cuts)
+            for candidate in sorted(stocks, key=lambda s: s.length):
+                if candidate.length >= stock.length:
+                    break
+                available = math.inf if candidate.quantity == -1 else candidate.quantity
+                if candidate.length >= used and used_count.get(candidate.id, 0) < available:
+                    used_count[candidate.id] = used_count.get(candidate.id, 0) + 1
+                    used_count[stock.id] -= 1
+                    bins[i] = (candidate, cuts)
+                    improved = True
+                    break
+        return improved
+    
+    def expand_parts(
+        self,
+        parts: List[Part],
+        stocks: List[Stock],
+        max_split_parts: int = 2,
+        joint_allowance: float = 0.0
+    ) -> Tuple[List[Part], List[Part], Dict[str, Tuple[str, str]]]:
+        """
+        Expandeer onderdelen per quantity en splits te lange stukken
+        
+        Returns:
+            (te plaatsen stukken, te lange stukken, herkomst) met herkomst
+            {stuk_id: (onderdeel_id, item_id)}; item_id is het stuk vóór
+            het splitsen, zodat alle delen van één item bij elkaar blijven
+        """
+        origin: Dict[str, Tuple[str, str]] = {}
+        parts_ok = []
+        parts_too_long = []
+        if not parts:
+            return parts_ok, parts_too_long, origin
+        
+        # Splitsplanning één keer per unieke lengte in plaats van per stuk
+        # Ruimte op de langste lat na de trim
+        max_stock_length = self.kerf_model.capacity(max(s.length for s in stocks))
+        unique_lengths, group = np.unique(
+            np.array([p.length for p in parts], dtype=float), return_inverse=True
+        )
+        fits = unique_lengths <= max_stock_length
+        with self.profiler.span("expand.split_plan"):
+            counts, segments = split_lengths(
+                unique_lengths,
+                max_stock_length,
+                max(max_split_parts, 1),
+                joint_allowance,
+                self.split_policy
+            )
+        # Per groep: None = past in één stuk, [] = te lang, anders de deellengtes
+        can_split = max_split_parts > 1
+        plans = [
+            None if fits[g] or (can_split and counts[g] == 1)
+            else segments[g, :counts[g]].tolist() if can_split else []
+            for g in range(len(unique_lengths))
+        ]
+        
+        for part, g in zip(parts, group.tolist()):
+            split = plans[g]
+            for i in range(part.quantity):
+                item_id = f"{part.id}_{i+1}" if part.quantity > 1 else part.id
+                if split is None:
+                    pieces = [Part(item_id, part.length, 1, part.label, part.profile)]
+                elif split:
+                    pieces = [
+                        Part(
+                            id=f"{item_id}_d{k}",
+                            length=length,
+                            quantity=1,
+                            label=f"{part.label} (deel {k})",
+                            profile=part.profile
+                        )
+                        for k, length in enumerate(split, start=1)
+                    ]
+                else:
+                    parts_too_long.append(Part(item_id, part.length, 1, part.label, part.profile))
+                    continue
+                parts_ok.extend(pieces)
+                for piece in pieces:
+                    origin[piece.id] = (part.id, item_id)
+        
+        return parts_ok, parts_too_long, origin
+    
+    def _rest_segments(self, origin: Dict[str, Tuple[str, str]]) -> Set[str]:
+        """Stuk-id's van deel 2, 3, ... van gesplitste onderdelen"""
+        return {
+            piece_id for piece_id, (_, item_id) in origin.items()
+            if piece_id != item_id and piece_id != f"{item_id}_d1"
+        }
     
     def _optimize_ffd(
         self, 
@@ -267,7 +1142,7 @@ class Optimizer1D:
         # Bouw inventory met quantity tracking
         stock_inventory = {}
         for stock in stocks:
-            qty = 999 if stock.quantity == -1 else stock.quantity
+            qty = math.inf if stock.quantity == -1 else stock.quantity
             stock_inventory[stock.id] = {'stock': stock, 'available': qty, 'used': 0}
         
         # Track welke voorraad we gebruiken
@@ -285,26 +1160,30 @@ class Optimizer1D:
         def use_stock(stock: Stock):
             stock_inventory[stock.id]['used'] += 1
         
+        kerf_model = self.kerf_model
         for part in sorted_parts:
+            self.checkpoint()
             placed = False
             
-            # Probeer in bestaande open voorraad te plaatsen
+            # Probeer in bestaande open voorraad te plaatsen (die hebben
+            # altijd al een stuk, dus één zaagsnede ervoor)
+            needed = kerf_model.need(part.length, 1)
             for i, (stock, remaining, cuts) in enumerate(open_stocks):
-                needed = part.length + (self.kerf if cuts else 0)
                 if remaining >= needed:
                     cuts.append((part.id, part.length))
                     open_stocks[i] = (stock, remaining - needed, cuts)
                     placed = True
                     break
+            self.profiler.count("bins_scanned", i + 1 if placed else len(open_stocks))
             
             if not placed:
                 # Vind kleinste passende voorraad met quantity check
-                stock = get_available_stock(part.length)
+                stock = get_available_stock(kerf_model.need(part.length, 0))
                 if stock:
                     use_stock(stock)
                     open_stocks.append((
                         stock,
-                        stock.length - part.length,
+                        stock.length - kerf_model.need(part.length, 0),
                         [(part.id, part.length)]
                     ))
                     placed = True
@@ -325,7 +1204,7 @@ class Optimizer1D:
                 stock_id=stock.id,
                 stock_length=stock.length,
                 cuts=cuts,
-                waste=remaining,
+                waste=kerf_model.offcut(remaining),
                 stock_index=stock_counts[stock.id] - 1
             ))
         
@@ -348,7 +1227,7 @@ class Optimizer1D:
         # Bouw inventory met quantity tracking
         stock_inventory = {}
         for stock in stocks:
-            qty = 999 if stock.quantity == -1 else stock.quantity
+            qty = math.inf if stock.quantity == -1 else stock.quantity
             stock_inventory[stock.id] = {'stock': stock, 'available': qty, 'used': 0}
         
         def get_available_stock(min_length: float) -> Optional[Stock]:
@@ -369,27 +1248,31 @@ class Optimizer1D:
         
         open_stocks: List[Tuple[Stock, float, List[Tuple[str, float]]]] = []
         
+        kerf_model = self.kerf_model
+        
         # Plaats grote stukken
         for part in large_parts:
+            self.checkpoint()
             placed = False
             
-            # Probeer eerst in bestaande open voorraad
+            # Probeer eerst in bestaande open voorraad (nooit leeg)
+            needed = kerf_model.need(part.length, 1)
             for i, (stock, remaining, cuts) in enumerate(open_stocks):
-                needed = part.length + (self.kerf if cuts else 0)
                 if remaining >= needed:
                     cuts.append((part.id, part.length))
                     open_stocks[i] = (stock, remaining - needed, cuts)
                     placed = True
                     break
+            self.profiler.count("bins_scanned", i + 1 if placed else len(open_stocks))
             
             if not placed:
                 # Nieuwe voorraad openen (kleinste passende met quantity check)
-                stock = get_available_stock(part.length)
+                stock = get_available_stock(kerf_model.need(part.length, 0))
                 if stock:
                     use_stock(stock)
                     open_stocks.append((
                         stock,
-                        stock.length - part.length,
+                        stock.length - kerf_model.need(part.length, 0),
                         [(part.id, part.length)]
                     ))
                     placed = True
@@ -398,31 +1281,33 @@ class Optimizer1D:
         
         # Fase 2: Kleine stukken in reststukken plaatsen
         for part in small_parts:
+            self.checkpoint()
             placed = False
             
             # Sorteer op remaining (kleinste passende eerst)
+            needed = kerf_model.need(part.length, 1)
             candidates = [
                 (i, stock, remaining, cuts) 
                 for i, (stock, remaining, cuts) in enumerate(open_stocks)
-                if remaining >= part.length + (self.kerf if cuts else 0)
+                if remaining >= needed
             ]
             candidates.sort(key=lambda x: x[2])  # Sort by remaining
+            self.profiler.count("bins_scanned", len(open_stocks))
             
             if candidates:
                 i, stock, remaining, cuts = candidates[0]
-                needed = part.length + (self.kerf if cuts else 0)
                 cuts.append((part.id, part.length))
                 open_stocks[i] = (stock, remaining - needed, cuts)
                 placed = True
             
             if not placed:
                 # Nieuwe voorraad (kleinste passende met quantity check)
-                stock = get_available_stock(part.length)
+                stock = get_available_stock(kerf_model.need(part.length, 0))
                 if stock:
                     use_stock(stock)
                     open_stocks.append((
                         stock,
-                        stock.length - part.length,
+                        stock.length - kerf_model.need(part.length, 0),
                         [(part.id, part.length)]
                     ))
                 else:
@@ -441,7 +1326,7 @@ class Optimizer1D:
                 stock_id=stock.id,
                 stock_length=stock.length,
                 cuts=cuts,
-                waste=remaining,
+                waste=kerf_model.offcut(remaining),
                 stock_index=stock_counts[stock.id] - 1
             ))
         
@@ -451,28 +1336,24 @@ class Optimizer1D:
         self, 
         parts: List[Part], 
         stocks: List[Stock],
-        max_split_parts: int = 2,
-        joint_allowance: float = 50
+        parked_ids: Set[str]
     ) -> List[CutPlan]:
         """
         Slim Splitsen algoritme:
-        1. Sorteer onderdelen op lengte (aflopend)
-        2. Split te lange onderdelen: hoofddeel (max) + reststuk (GEPARKEERD)
-        3. Plaats hoofddelen (langste eerst, NIET geparkeerd)
-        4. Vul gaten met geparkeerde + kleine stukken (best-fit)
+        1. Te lange onderdelen zijn al gesplitst (zie expand_parts)
+        2. Deel 2, 3, ... van gesplitste onderdelen wordt GEPARKEERD
+        3. Plaats hoofddelen en gewone onderdelen (langste eerst)
+        4. Vul gaten met geparkeerde stukken (best-fit)
         
         Args:
             parts: Te plaatsen onderdelen
             stocks: Beschikbare voorraad
-            max_split_parts: Max aantal delen per split (default 2)
-            joint_allowance: Extra lengte per verbinding in mm (default 50)
+            parked_ids: Id's van de te parkeren reststukken
         """
-        max_stock_length = max(s.length for s in stocks)
-        
         # Bouw voorraad inventory met quantity tracking
         stock_inventory = {}
         for stock in stocks:
-            qty = 999 if stock.quantity == -1 else stock.quantity
+            qty = math.inf if stock.quantity == -1 else stock.quantity
             stock_inventory[stock.id] = {
                 'stock': stock,
                 'available': qty,
@@ -482,39 +1363,11 @@ class Optimizer1D:
         # Sorteer voorraad op lengte (langste eerst)
         sorted_stocks = sorted(stocks, key=lambda s: s.length, reverse=True)
         
-        # === FASE 1: Split te lange onderdelen ===
-        main_parts = []      # Hoofddelen (langste eerst plaatsen)
-        parked_parts = []    # Geparkeerde reststukken (later vullen)
-        
-        # Sorteer parts op lengte (aflopend)
-        sorted_input = sorted(parts, key=lambda p: p.length, reverse=True)
-        
-        for part in sorted_input:
-            if part.length <= max_stock_length:
-                # Past in 1x, geen split nodig
-                main_parts.append(part)
-            else:
-                # Moet gesplitst worden
-                # Deel 1: Hoofddeel = max voorraadlengte
-                main_part = Part(
-                    id=f"{part.id}_d1",
-                    length=max_stock_length,
-                    quantity=1,
-                    label=f"{part.label} (deel 1)"
-                )
-                main_parts.append(main_part)
-                
-                # Deel 2: Reststuk = origineel - max + joint_allowance
-                rest_length = part.length - max_stock_length + joint_allowance
-                if rest_length > 0:
-                    parked_part = Part(
-                        id=f"{part.id}_d2",
-                        length=rest_length,
-                        quantity=1,
-                        label=f"{part.label} (deel 2)"
-                    )
-                    parked_parts.append(parked_part)
-                    print(f"[SPLIT] {part.id} ({part.length}mm) -> d1: {max_stock_length}mm + d2: {rest_length}mm (PARKED)")
+        # === FASE 1: Scheid hoofddelen en geparkeerde reststukken ===
+        main_parts = [p for p in parts if p.id not in parked_ids]
+        parked_parts = [p for p in parts if p.id in parked_ids]
+        for part in parked_parts:
+            print(f"[SPLIT] {part.id} ({part.length}mm) (PARKED)")
         
         # Sorteer main_parts op lengte (aflopend)
         main_parts = sorted(main_parts, key=lambda p: p.length, reverse=True)
@@ -535,19 +1388,22 @@ class Optimizer1D:
             """Markeer een voorraad als gebruikt"""
             stock_inventory[stock.id]['used'] += 1
         
+        kerf_model = self.kerf_model
         for part in main_parts:
+            self.checkpoint()
             placed = False
-            needed_with_kerf = part.length
+            # Open beams hebben altijd al een stuk: één zaagsnede ervoor
+            needed = kerf_model.need(part.length, 1)
             
             # Probeer eerst in bestaande open beam (best fit)
             candidates = []
             for i, (stock, remaining, cuts) in enumerate(open_beams):
-                needed = part.length + (self.kerf if cuts else 0)
                 if remaining >= needed:
                     candidates.append((i, stock, remaining, cuts, needed))
             
             # Sorteer op remaining (kleinste passende eerst = best fit)
             candidates.sort(key=lambda x: x[2])
+            self.profiler.count("bins_scanned", len(open_beams))
             
             if candidates:
                 i, stock, remaining, cuts, needed = candidates[0]
@@ -559,10 +1415,10 @@ class Optimizer1D:
             if not placed:
                 # Open nieuwe voorraad
                 # Zoek kleinste voorraad die past EN beschikbaar is
-                stock = get_available_stock(part.length)
+                stock = get_available_stock(kerf_model.need(part.length, 0))
                 if stock:
                     use_stock(stock)
-                    remaining = stock.length - part.length
+                    remaining = stock.length - kerf_model.need(part.length, 0)
                     open_beams.append((
                         stock,
                         remaining,
@@ -578,17 +1434,19 @@ class Optimizer1D:
         fill_parts = sorted(parked_parts, key=lambda p: p.length, reverse=True)
         
         for part in fill_parts:
+            self.checkpoint()
             placed = False
             
             # Zoek beste fit in bestaande beams
+            needed = kerf_model.need(part.length, 1)
             candidates = []
             for i, (stock, remaining, cuts) in enumerate(open_beams):
-                needed = part.length + (self.kerf if cuts else 0)
                 if remaining >= needed:
                     candidates.append((i, stock, remaining, cuts, needed))
             
             # Best fit: kleinste restlengte die nog past
             candidates.sort(key=lambda x: x[2])
+            self.profiler.count("bins_scanned", len(open_beams))
             
             if candidates:
                 i, stock, remaining, cuts, needed = candidates[0]
@@ -599,10 +1457,10 @@ class Optimizer1D:
             
             if not placed:
                 # Nieuwe voorraad nodig (kleinste passende)
-                stock = get_available_stock(part.length)
+                stock = get_available_stock(kerf_model.need(part.length, 0))
                 if stock:
                     use_stock(stock)
-                    remaining = stock.length - part.length
+                    remaining = stock.length - kerf_model.need(part.length, 0)
                     open_beams.append((
                         stock,
                         remaining,
@@ -626,7 +1484,7 @@ class Optimizer1D:
                 stock_id=stock.id,
                 stock_length=stock.length,
                 cuts=cuts,
-                waste=remaining,
+                waste=kerf_model.offcut(remaining),
                 stock_index=stock_counts[stock.id] - 1
             ))
         
@@ -648,6 +1506,7 @@ class Optimizer1D:
         """
         if not ORTOOLS_AVAILABLE:
             print("OR-Tools niet beschikbaar, fallback naar FFD")
+            self.fallback = Algorithm.FFD.value
             return self._optimize_ffd(parts, stocks)
         
         # Gebruik FFD als startpunt, dan OR-Tools voor verfijning
@@ -663,11 +1522,15 @@ class Optimizer1D:
         OR-Tools Column Generation - exacte oplossing
         
         Dit is het klassieke Gilmore-Gomory algoritme
-        MET quantity constraints per voorraadtype
+        MET quantity constraints per voorraadtype. Met meerdere latlengtes
+        (of Formulation.ARC_FLOW) wordt in plaats van de patronen een
+        arc-flow model opgelost (zie arc_flow.py).
         """
         if not ORTOOLS_AVAILABLE:
-            print("OR-Tools niet beschikbaar, fallback naar Hybrid")
-            return self._optimize_hybrid(parts, stocks)
+            print("OR-Tools niet beschikbaar, fallback naar de exacte solver zonder OR-Tools")
+            plans = self._optimize_exact(parts, stocks)
+            self.fallback = self.fallback or Algorithm.EXACT.value
+            return plans
         
         # Groepeer parts op lengte
         part_lengths: Dict[float, int] = {}
@@ -683,151 +1546,517 @@ class Optimizer1D:
         lengths = list(part_lengths.keys())
         demands = [part_lengths[l] for l in lengths]
         
-        # Voor elke stock, genereer patterns
-        # Track welke patterns bij welke stock horen
-        all_patterns = []
-        pattern_stock = []
-        pattern_stock_idx = []  # Index van stock in stocks list
-        
-        for stock_idx, stock in enumerate(stocks):
-            patterns = self._generate_patterns(lengths, stock.length)
-            for pattern in patterns:
-                all_patterns.append(pattern)
-                pattern_stock.append(stock)
-                pattern_stock_idx.append(stock_idx)
-        
-        if not all_patterns:
-            return self._optimize_hybrid(parts, stocks)
-        
-        # Solve met MIP
-        solver = pywraplp.Solver.CreateSolver('SCIP')
-        if not solver:
-            solver = pywraplp.Solver.CreateSolver('CBC')
-        if not solver:
-            return self._optimize_hybrid(parts, stocks)
-        
-        # Variables: hoeveel keer elk pattern gebruiken
-        x = []
-        for i in range(len(all_patterns)):
-            x.append(solver.IntVar(0, solver.infinity(), f'x_{i}'))
-        
-        # Constraints: voldoe aan demand
-        for j, length in enumerate(lengths):
-            constraint = solver.Constraint(demands[j], solver.infinity())
-            for i, pattern in enumerate(all_patterns):
-                constraint.SetCoefficient(x[i], pattern[j])
+        formulation = self.formulation
+        if formulation == Formulation.AUTO:
+            # Patronen worden per latlengte opgesomd en exploderen met meerdere lengtes
+            many = len({stock.length for stock in stocks if stock.quantity != 0}) > 1
+            formulation = Formulation.ARC_FLOW if many else Formulation.PATTERNS
+        
+        graph = None
+        if formulation == Formulation.ARC_FLOW:
+            self.checkpoint()
+            with self.profiler.span("arc_flow.graph"):
+                graph = build_graph(
+                    [l + self.kerf for l in lengths],
+                    demands,
+                    [self.kerf_model.capacity(stock.length) + self.kerf for stock in stocks],
+                    [stock.quantity for stock in stocks]
+                )
+            if graph is None:
+                print("[OR-Tools] Arc-flow graaf te groot, patroonmodel wordt gebruikt")
+                formulation = Formulation.PATTERNS
+            else:
+                print(f"[OR-Tools] Arc-flow graaf: {graph.uncompressed_nodes} → {graph.num_nodes} knopen, "
+                      f"{graph.uncompressed_arcs} → {graph.num_arcs} bogen")
+                self.profiler.count("arc_flow_nodes", graph.num_nodes)
+                self.profiler.count("arc_flow_arcs", graph.num_arcs)
+        self.formulation_used = formulation.value
+        
+        if graph is not None:
+            complete = True  # De graaf bevat alle patronen
+            with self.profiler.span("mip.build"):
+                model = build_arc_flow_model(
+                    graph,
+                    demands,
+                    [stock.cost for stock in stocks],
+                    [stock.quantity for stock in stocks]
+                )
+        else:
+            # Voor elke stock, genereer (sparse) patterns met hun stock index
+            pattern_set = PatternSet()
+            complete = True  # Alle patronen opgesomd (niet afgekapt op MAX_PATTERNS)
+            
+            with self.profiler.span("patterns"):
+                for stock_idx, stock in enumerate(stocks):
+                    self.checkpoint()
+                    patterns = self._stock_patterns(lengths, self.kerf_model.capacity(stock.length))
+                    complete = complete and len(patterns) < MAX_PATTERNS
+                    for pattern in patterns:
+                        pattern_set.add(pattern, stock_idx)
+            
+            self.profiler.count("patterns_generated", len(pattern_set))
+            if not pattern_set:
+                self.fallback = Algorithm.HYBRID.value
+                return self._optimize_hybrid(parts, stocks)
+            
+            with self.profiler.span("mip.build"):
+                # Variables: hoeveel keer elk pattern gebruiken
+                # Constraints: voldoe aan demand, en per stock type sum(patterns) <= quantity
+                # Objective: minimaliseer voorraadkosten (standaard 1.0 per stuk = aantal stocks;
+                # reststukken zijn goedkoper en worden dus eerst gebruikt)
+                model = build_pattern_model(
+                    pattern_set,
+                    demands,
+                    [stock.cost for stock in stocks],
+                    [stock.quantity for stock in stocks]
+                )
         
-        # NIEUW: Quantity constraints per stock type
-        # Sum van alle patterns die deze stock gebruiken <= quantity
-        for stock_idx, stock in enumerate(stocks):
+        for stock in stocks:
             if stock.quantity != -1:  # -1 = onbeperkt
-                qty_constraint = solver.Constraint(0, stock.quantity)
-                for i, pat_stock_idx in enumerate(pattern_stock_idx):
-                    if pat_stock_idx == stock_idx:
-                        qty_constraint.SetCoefficient(x[i], 1)
                 print(f"[OR-Tools] Quantity constraint: {stock.id} <= {stock.quantity}")
         
-        # Objective: minimaliseer aantal stocks
-        objective = solver.Objective()
-        for i in range(len(all_patterns)):
-            objective.SetCoefficient(x[i], 1)
-        objective.SetMinimization()
+        self.profiler.count("mip_variables", model.num_variables)
+        self.profiler.count("mip_constraints", model.num_constraints)
+        self.profiler.count("mip_nonzeros", model.num_nonzeros)
         
         # Solve
-        status = solver.Solve()
-        
-        if status != pywraplp.Solver.OPTIMAL:
-            print(f"[OR-Tools] Geen optimale oplossing gevonden (status={status}), fallback naar Hybrid")
+        # Solve (tot de deadline); tussenoplossingen komen in het verloop
+        self.checkpoint()
+        settings = SolveSettings(
+            time_limit=self._remaining(),
+            threads=self.threads or worker_cpus(),
+            seed=self.seed
+        )
+        with self.profiler.span("mip.solve"):
+            outcome = solve_model(
+                model, self.solver, settings, self.cancel_token,
+                on_incumbent=lambda objective: self.incumbent.record("mip", objective)
+            )
+        self.solver_status = outcome.status
+        self.solver_used = outcome.solver
+        print(f"[OR-Tools] Solver: {outcome.solver or '-'} ({settings.threads} threads), status: {outcome.status}")
+        
+        if not outcome.has_solution:
+            print(f"[OR-Tools] Geen oplossing gevonden (status={outcome.status}), fallback naar Hybrid")
+            self.fallback = Algorithm.HYBRID.value
             return self._optimize_hybrid(parts, stocks)
-        
-        # Bouw resultaat
-        plans = []
-        stock_counts: Dict[str, int] = {}
-        
-        # Track welke part_ids we al hebben toegewezen
-        remaining_ids = {l: list(ids) for l, ids in part_ids.items()}
-        
-        for i, pattern in enumerate(all_patterns):
-            count = int(x[i].solution_value())
-            stock = pattern_stock[i]
+        if outcome.status == "OPTIMAL" and complete:
+            # Optimaal over alle patronen: de MIP kosten zijn de exacte ondergrens
+            self.incumbent.lower_bound = max(self.incumbent.lower_bound, outcome.objective)
+        elif outcome.status == "FEASIBLE":
+            print("[OR-Tools] Tijdslimiet bereikt, beste gevonden oplossing wordt gebruikt")
+            self.deadline_reached = self.deadline is not None
+        
+        with self.profiler.span("reconstruct"):
+            # Bouw resultaat
+            plans = []
+            stock_counts: Dict[str, int] = {}
+        
+            # Track welke part_ids we al hebben toegewezen (O(1) per toewijzing)
+            remaining_ids = {l: deque(ids) for l, ids in part_ids.items()}
             
-            for _ in range(count):
+            # Latten als (voorraadtype, patroon): uit de stroom of uit de patroonaantallen
+            if graph is not None:
+                bins = decompose(graph, outcome.values)
+            else:
+                bins = [
+                    (pattern_set.stock_index[i], pattern)
+                    for i, pattern in enumerate(pattern_set.patterns)
+                    for _ in range(int(round(outcome.values[i])))
+                ]
+        
+            for stock_idx, pattern in bins:
+                stock = stocks[stock_idx]
                 cuts = []
-                for j, num_cuts in enumerate(pattern):
+                for j, num_cuts in pattern:
                     length = lengths[j]
                     for _ in range(num_cuts):
                         if remaining_ids[length]:
-                            part_id = remaining_ids[length].pop(0)
+                            part_id = remaining_ids[length].popleft()
                             cuts.append((part_id, length))
-                
+            
                 if cuts:
                     if stock.id not in stock_counts:
                         stock_counts[stock.id] = 0
                     stock_counts[stock.id] += 1
-                    
-                    total_cut = sum(c[1] for c in cuts) + (len(cuts) - 1) * self.kerf
-                    waste = stock.length - total_cut
-                    
+                
                     plans.append(CutPlan(
                         stock_id=stock.id,
                         stock_length=stock.length,
                         cuts=cuts,
-                        waste=waste,
+                        waste=self.kerf_model.offcut(stock.length - self._bin_used(cuts)),
                         stock_index=stock_counts[stock.id] - 1
                     ))
         
-        # Verify quantity constraints
-        for stock in stocks:
-            if stock.quantity != -1:
-                used = stock_counts.get(stock.id, 0)
-                if used > stock.quantity:
-                    print(f"[OR-Tools] WARNING: {stock.id} used {used} > available {stock.quantity}")
-                else:
-                    print(f"[OR-Tools] {stock.id}: used {used}/{stock.quantity}")
-        
         return plans
     
+    def _optimize_exact(
+        self,
+        parts: List[Part],
+        stocks: List[Stock]
+    ) -> List[CutPlan]:
+        """
+        Exacte oplossing zonder OR-Tools: bin completion (zie bin_completion.py)
+        
+        Het Hybrid plan is de eerste incumbent en bovengrens; elke betere
+        oplossing van de zoektocht wordt direct aangeboden, zodat er op de
+        deadline altijd een plan ligt. Is de zoekboom volledig doorzocht,
+        dan is het beste plan bewezen optimaal.
+        """
+        baseline = self._optimize_hybrid(parts, stocks)
+        self._offer(baseline, Algorithm.HYBRID.value)
+        if len(parts) > EXACT_MAX_PIECES:
+            print(f"[EXACT] {len(parts)} stukken (maximaal {EXACT_MAX_PIECES}), fallback naar Hybrid")
+            self.fallback = Algorithm.HYBRID.value
+            return baseline
+        
+        # Groepeer parts op lengte (langste eerst)
+        part_ids: Dict[float, List[str]] = {}
+        for part in sorted(parts, key=lambda p: -p.length):
+            part_ids.setdefault(part.length, []).append(part.id)
+        lengths = list(part_ids)
+        problem = bin_completion.BinProblem(
+            sizes=np.array([length + self.kerf for length in lengths]),
+            counts=np.array([len(part_ids[length]) for length in lengths]),
+            capacities=np.array([self.kerf_model.capacity(stock.length) + self.kerf for stock in stocks]),
+            costs=np.array([stock.cost for stock in stocks]),
+            quantities=np.array([stock.quantity for stock in stocks])
+        )
+        
+        def to_plans(bins: List[bin_completion.Bin]) -> List[CutPlan]:
+            remaining_ids = {length: deque(ids) for length, ids in part_ids.items()}
+            return self._bins_to_plans([
+                (stocks[t], [
+                    (remaining_ids[lengths[j]].popleft(), lengths[j])
+                    for j, k in items for _ in range(k)
+                ])
+                for t, items in bins
+            ])
+        
+        # Alleen een plan zonder ongeplaatste stukken is een bovengrens
+        complete_baseline = sum(len(p.cuts) for p in baseline) == len(parts)
+        deadline = self.deadline if self.deadline is not None else _time.time() + EXACT_TIME_BUDGET
+        with self.profiler.span("exact.search"):
+            solution = bin_completion.solve(
+                problem,
+                upper_bound=self._plan_cost(baseline) if complete_baseline else math.inf,
+                deadline=deadline,
+                checkpoint=self.cancel_token.check,
+                on_solution=lambda bins, cost: self._offer(to_plans(bins), Algorithm.EXACT.value)
+            )
+        self.profiler.count("exact_nodes", solution.nodes)
+        
+        # Alleen met een haalbaar plan: bij te weinig voorraad zit de
+        # strafkost van de LP-ondergrens in de grens en zegt die niets
+        if math.isfinite(solution.cost) and math.isfinite(solution.lower_bound):
+            self.incumbent.lower_bound = max(
+                self.incumbent.lower_bound, min(solution.lower_bound, solution.cost)
+            )
+        if solution.complete and math.isfinite(solution.cost):
+            # Volledig doorzocht: niets is goedkoper dan de beste oplossing
+            self.incumbent.lower_bound = max(self.incumbent.lower_bound, solution.cost)
+        elif self.deadline is not None and _time.time() >= self.deadline:
+            self.deadline_reached = True
+        print(f"[EXACT] {solution.nodes} knopen, kosten {solution.cost:g}, ondergrens "
+              f"{solution.lower_bound:g}, {'optimaal' if solution.complete else 'niet bewezen'}")
+        
+        return to_plans(solution.bins) if solution.bins is not None else baseline
+    
+    def _stock_patterns(self, lengths: List[float], stock_length: float) -> List[SparsePattern]:
+        """
+        Snijpatronen uit de patroonbibliotheek, of opnieuw opgesomd zonder
+        bibliotheek; stock_length is de ruimte na de trim (KerfModel.capacity)
+        """
+        if self.pattern_store is None:
+            return self._generate_patterns(lengths, stock_length, MAX_PATTERNS)
+        patterns, cached = self.pattern_store.patterns(
+            stock_length, self.kerf, lengths, MAX_PATTERNS, self._generate_patterns
+        )
+        self.profiler.count("pattern_cache_hits" if cached else "pattern_cache_misses")
+        return patterns
+    
     def _generate_patterns(
         self, 
         lengths: List[float], 
         stock_length: float,
-        max_patterns: int = 1000
-    ) -> List[List[int]]:
+        max_patterns: int = MAX_PATTERNS
+    ) -> List[SparsePattern]:
         """
         Genereer alle geldige snijpatronen voor een stock lengte
+
+        Patronen zijn sparse: alleen (lengte-index, aantal) paren met aantal > 0.
+        stock_length is de ruimte na de trim (KerfModel.capacity); daarin
+        tellen de stukken zoals op een lat zonder trim, dus met need() van
+        een KerfModel met alleen de zaagsnede.
         """
-        patterns = []
+        patterns: List[SparsePattern] = []
         n = len(lengths)
+        model = KerfModel(kerf=self.kerf_model.kerf)
+        current: List[Tuple[int, int]] = []
         
-        def generate(idx: int, remaining: float, current: List[int]):
+        def generate(idx: int, remaining: float, pieces: int):
             if len(patterns) >= max_patterns:
                 return
             
             if idx == n:
-                if any(c > 0 for c in current):
-                    patterns.append(current.copy())
+                if pieces:
+                    patterns.append(tuple(current))
                 return
             
-            max_count = int(remaining // (lengths[idx] + self.kerf))
-            # Corrigeer voor eerste stuk (geen kerf nodig aan begin)
-            if sum(current) == 0:
-                max_count = int(remaining // lengths[idx])
-            
-            for count in range(max_count + 1):
-                current.append(count)
-                if count == 0:
-                    used = 0
-                elif sum(current[:-1]) == 0:
-                    used = count * lengths[idx] + (count - 1) * self.kerf
-                else:
-                    used = count * (lengths[idx] + self.kerf)
-                generate(idx + 1, remaining - used, current)
+            length = lengths[idx]
+            # Het eerste van k stukken kost need(length, pieces), elk volgend need(length, 1)
+            first = model.need(length, pieces)
+            step = model.need(length, 1)
+            max_count = int((remaining - first) // step) + 1 if remaining >= first else 0
+            
+            generate(idx + 1, remaining, pieces)
+            for count in range(1, max_count + 1):
+                current.append((idx, count))
+                generate(idx + 1, remaining - first - (count - 1) * step, pieces + count)
                 current.pop()
         
-        generate(0, stock_length, [])
+        generate(0, stock_length, 0)
         return patterns
 
 
+def split_lengths(
+    lengths: np.ndarray,
+    max_length: float,
+    max_parts: int,
+    joint_allowance: float = 0.0,
+    policy: SplitPolicy = SplitPolicy.MAX_REST
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Splitsplanning voor een reeks lengtes in één gevectoriseerde stap
+    
+    Elke verbinding kost joint_allowance extra materiaal, dus een onderdeel
+    van lengte L in n delen heeft L + (n-1) * joint_allowance nodig. Het
+    aantal delen is het kleinste n waarbij elk deel <= max_length blijft.
+    
+    - MAX_REST: n-1 delen van max_length, het laatste deel is de rest
+    - BALANCED: n even lange delen (naar boven afgerond op 0.1mm)
+    - OPTIMIZED: als MAX_REST; de splitspunten worden later gekozen
+      (zie Optimizer1D._optimize_split_points)
+    
+    Args:
+        lengths: Onderdeellengtes
+        max_length: Maximale lengte per deel (langste voorraad)
+        max_parts: Maximum aantal delen
+        joint_allowance: Extra lengte per verbinding
+        policy: Splitsbeleid
+        
+    Returns:
+        (aantal delen per lengte, deellengtes [len(lengths) x max_parts]);
+        aantal 0 = niet te splitsen binnen max_parts
+    """
+    lengths = np.asarray(lengths, dtype=float)
+    step = max_length - joint_allowance
+    if step > 0:
+        n = np.ceil((lengths - joint_allowance) / step - 1e-9).astype(int)
+    else:
+        n = np.where(lengths <= max_length, 1, max_parts + 1)
+    n = np.maximum(n, 1)
+    n[n > max_parts] = 0
+    
+    total = lengths + (n - 1) * joint_allowance
+    cols = np.arange(max_parts)[None, :]
+    last = (n - 1)[:, None]
+    if policy == SplitPolicy.BALANCED:
+        share = np.minimum(np.ceil(total / np.maximum(n, 1) * 10 - 1e-6) / 10, max_length)
+        segments = np.where(cols <= last, share[:, None], 0.0)
+    else:
+        rest = total - (n - 1) * max_length
+        segments = np.where(cols < last, max_length, np.where(cols == last, rest[:, None], 0.0))
+    segments[n == 0] = 0.0
+    return n, segments
+
+
+def canonical_order(parts: List[Part], seed: int = 0) -> List[Part]:
+    """
+    Canonieke volgorde van stukken: langste eerst, gelijke lengtes op id
+    
+    Met seed != 0 worden gelijke lengtes in een vaste, door de seed bepaalde
+    volgorde gezet (hash van seed en id). Zo geeft dezelfde seed altijd
+    hetzelfde plan, ongeacht de invoervolgorde, en geeft een andere seed
+    een andere (even geldige) keuze tussen gelijkwaardige plannen.
+    """
+    if seed == 0:
+        return sorted(parts, key=lambda p: (-p.length, p.id))
+    
+    def rank(part: Part) -> bytes:
+        return hashlib.blake2b(f"{seed}:{part.id}".encode(), digest_size=8).digest()
+    
+    return sorted(parts, key=lambda p: (-p.length, rank(p), p.id))
+
+
+def plan_fingerprint(plans: List[CutPlan], parts_not_placed: List[Part] = ()) -> str:
+    """
+    Stabiele hash (sha256) van een zaagplan
+    
+    Onafhankelijk van de volgorde van de latten en van de zaagsneden per lat,
+    zodat gelijke plannen goedkoop te vergelijken zijn (cache, regressietests).
+    """
+    bars = sorted(
+        (
+            plan.profile,
+            plan.stock_id,
+            round(plan.stock_length, 3),
+            tuple(sorted((cut[0], round(cut[1], 3)) for cut in plan.cuts))
+        )
+        for plan in plans
+    )
+    missing = sorted((part.id, round(part.length, 3)) for part in parts_not_placed)
+    canonical = json.dumps([bars, missing], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def cost_lower_bound(parts: List[Part], stocks: List[Stock], kerf_model: KerfModel) -> float:
+    """
+    Ondergrens voor de voorraadkosten van een plan dat alle stukken plaatst
+
+    k stukken op een lat met ruimte C (lengte na de trim): som(l) +
+    (k - 1) * kerf <= C, dus som(l + kerf) <= C + kerf. Met gelijke kosten
+    per lat is dat ceil(som(l + kerf) / (Cmax + kerf)) latten, anders de
+    goedkoopste kosten per mm maal de totale lengte. Voorraadlimieten
+    maken het optimum alleen hoger, de grens blijft dus geldig.
+    """
+    if not parts or not stocks:
+        return 0.0
+    kerf = kerf_model.kerf
+    total = sum((p.length + kerf) * p.quantity for p in parts)
+    costs = {s.cost for s in stocks}
+    if len(costs) == 1:
+        longest = kerf_model.capacity(max(s.length for s in stocks))
+        return costs.pop() * math.ceil(total / (longest + kerf) - 1e-9)
+    return total * min(s.cost / (kerf_model.capacity(s.length) + kerf) for s in stocks)
+
+
+def _optimize_profile(
+    settings: Dict,
+    parts: List[Part],
+    stocks: List[Stock],
+    algorithm: Algorithm,
+    max_split_parts: int,
+    joint_allowance: float,
+    deadline: Optional[float],
+    cancel_token: Optional[CancelToken] = None
+) -> OptimizationResult:
+    """
+    Optimaliseer één profiel (ook als worker proces, dan met het token van
+    run_parallel: een geannuleerd request stopt ook de lopende profielen)
+    """
+    time_limit = None
+    if deadline is not None:
+        time_limit = max(0.1, deadline - _time.time())
+    optimizer = Optimizer1D(**settings, cancel_token=cancel_token or task_cancel_token())
+    return optimizer.optimize(parts, stocks, algorithm, max_split_parts, joint_allowance, time_limit)
+
+
+def solve_knapsack(
+    lengths: List[float],
+    values: List[float],
+    capacity: float,
+    kerf: float = 0.0,
+    max_counts: Optional[List[int]] = None,
+    max_nodes: int = 200000
+) -> Tuple[float, List[int]]:
+    """
+    Begrensde knapsack met zaagsnede (branch & bound); zie knapsack_search,
+    zonder de vlag of de zoekactie volledig was
+
+    Returns:
+        (totale waarde, aantallen per item)
+    """
+    value, counts, _ = knapsack_search(lengths, values, capacity, kerf, max_counts, max_nodes)
+    return value, counts
+
+
+def knapsack_search(
+    lengths: List[float],
+    values: List[float],
+    capacity: float,
+    kerf: float = 0.0,
+    max_counts: Optional[List[int]] = None,
+    max_nodes: int = 200000
+) -> Tuple[float, List[int], bool]:
+    """
+    Begrensde knapsack met zaagsnede (branch & bound)
+
+    Kies aantallen per lengte zodat
+    sum(aantal * lengte) + (stuks - 1) * kerf <= capacity
+    en de totale waarde maximaal is. Dat is hetzelfde als elk stuk
+    lengte + kerf laten kosten in een capaciteit van capacity + kerf
+    (het eerste stuk heeft geen zaagsnede nodig).
+
+    Args:
+        lengths: Lengte per item
+        values: Waarde per item (items met waarde <= 0 worden overgeslagen)
+        capacity: Beschikbare lengte
+        kerf: Zaagsnede breedte
+        max_counts: Maximaal aantal per item (None = onbegrensd)
+        max_nodes: Zoeklimiet; daarna wordt de beste gevonden oplossing gebruikt
+
+    Returns:
+        (totale waarde, aantallen per item, optimaal bewezen); False als
+        max_nodes de zoekactie afbrak, dan kan er een betere oplossing zijn
+    """
+    eps = 1e-9
+    room = capacity + kerf
+    counts = [0] * len(lengths)
+    items = []
+    for i, (length, value) in enumerate(zip(lengths, values)):
+        if value <= eps or length > capacity + eps:
+            continue
+        size = length + kerf
+        bound = int((room + eps) // size) if size > 0 else 0
+        if max_counts is not None:
+            bound = min(bound, max_counts[i])
+        if bound > 0:
+            items.append((i, size, value, bound))
+
+    # Hoogste waarde per mm eerst: goede oplossingen vroeg, scherpe bound
+    items.sort(key=lambda it: it[2] / it[1], reverse=True)
+
+    best_value = 0.0
+    best_counts = list(counts)
+    nodes = 0
+    truncated = False
+
+    def upper_bound(k: int, left: float) -> float:
+        """LP-relaxatie van de resterende items"""
+        total = 0.0
+        for _, size, value, bound in items[k:]:
+            if bound * size <= left:
+                total += bound * value
+                left -= bound * size
+            else:
+                return total + value * left / size
+        return total
+
+    def search(k: int, left: float, value: float):
+        nonlocal best_value, best_counts, nodes, truncated
+        nodes += 1
+        if value > best_value + eps:
+            best_value = value
+            best_counts = list(counts)
+        if k == len(items):
+            return
+        if value + upper_bound(k, left) <= best_value + eps:
+            return
+        if nodes > max_nodes:
+            truncated = True  # Deze tak kan nog beter, maar de zoeklimiet is op
+            return
+
+        i, size, item_value, bound = items[k]
+        for count in range(min(bound, int((left + eps) // size)), -1, -1):
+            counts[i] = count
+            search(k + 1, left - count * size, value + count * item_value)
+        counts[i] = 0
+
+    search(0, room, 0.0)
+    return best_value, best_counts, not truncated
+
+
 def result_to_dict(result: OptimizationResult) -> dict:
     """Converteer resultaat naar JSON-serializable dict"""
     return {
@@ -836,13 +2065,26 @@ def result_to_dict(result: OptimizationResult) -> dict:
         "total_waste": round(result.total_waste, 1),
         "waste_percentage": round(result.waste_percentage, 2),
         "computation_time_ms": round(result.computation_time_ms, 2),
+        "fingerprint": result.fingerprint,
+        "solver_status": result.solver_status,
+        "solver": result.solver,
+        "formulation": result.formulation,
+        "fallback": result.fallback,
+        "proven_optimal": result.proven_optimal,
+        "deadline_reached": result.deadline_reached,
+        "lower_bound": round(result.lower_bound, 3),
+        "incumbents": [
+            {"time_ms": time_ms, "source": source, "cost": round(cost, 3)}
+            for time_ms, source, cost in result.incumbents
+        ],
         "parts_not_placed": [
-            {"id": p.id, "length": p.length, "label": p.label}
+            {"id": p.id, "length": p.length, "label": p.label, "profile": p.profile}
             for p in result.parts_not_placed
         ],
         "plans": [
             {
                 "stock_id": plan.stock_id,
+                "profile": plan.profile,
                 "stock_length": plan.stock_length,
                 "stock_index": plan.stock_index,
                 "waste": round(plan.waste, 1),
@@ -852,7 +2094,20 @@ def result_to_dict(result: OptimizationResult) -> dict:
                 ]
             }
             for plan in result.plans
-        ]
+        ],
+        "profiles": {
+            profile: {
+                "stocks_used": stats.stocks_used,
+                "total_waste": round(stats.total_waste, 1),
+                "waste_percentage": round(stats.waste_percentage, 2),
+                "parts_not_placed": stats.parts_not_placed,
+                "computation_time_ms": round(stats.computation_time_ms, 2),
+                "proven_optimal": stats.proven_optimal,
+                "deadline_reached": stats.deadline_reached,
+            }
+            for profile, stats in result.profiles.items()
+        },
+        "validation": result.validation.to_dict() if result.validation is not None else None
     }
 
 
@@ -0,0 +1,1219 @@
+"""
+Zaagplan Optimizer - 2D Sheet Cutting Solver
+Guillotine en MaxRects plaatsing met nerfrichting en zaagsnede (kerf)
+
+Resultaat heeft dezelfde vorm als de frontend (src/algorithms/cutting2D.js),
+zodat zware 2D jobs server-side kunnen draaien.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+Versie: 2.0
+"""
+
+from typing import List, Dict, Tuple, Optional
+from dataclasses import dataclass
+from enum import Enum
+from bisect import bisect_left, insort
+from collections import deque
+import math
+import multiprocessing
+import random
+import time
+
+from optimizer_1d import ORTOOLS_AVAILABLE, knapsack_search
+from cancellation import NEVER_CANCELLED, CancelToken
+from parallel import partition, resolve_workers, run_parallel, task_cancel_token
+from solvers import load_pywraplp, pywraplp_status
+
+
+class Algorithm2D(Enum):
+    """Beschikbare algoritmes voor 2D optimalisatie"""
+    HYBRID = "hybrid"              # Multi-start: meerdere volgordes, beste resultaat
+    MAXRECTS = "maxrects"          # MaxRects met best-short-side-fit
+    GUILLOTINE = "guillotine"      # Puur guillotine splits, deterministisch
+    TWO_STAGE = "two_stage"        # Twee-staps guillotine via Column Generation (OR-Tools)
+
+
+@dataclass
+class Part2D:
+    """Een te zagen rechthoekig onderdeel"""
+    id: str
+    length: float
+    width: float
+    quantity: int = 1
+    label: str = ""
+    grain: bool = False     # True = nerf moet in lengterichting blijven
+    material: str = ""      # Plaatmateriaal (stockType in de frontend)
+
+    def __post_init__(self):
+        if not self.label:
+            self.label = self.id
+
+    @property
+    def area(self) -> float:
+        return self.length * self.width
+
+
+@dataclass
+class Sheet:
+    """Een voorraad plaat"""
+    id: str
+    length: float
+    width: float
+    quantity: int = -1      # -1 = onbeperkt
+    cost: float = 1.0
+    label: str = ""
+    material: str = ""
+
+    def __post_init__(self):
+        if not self.label:
+            self.label = f"{self.length}×{self.width}mm"
+
+    @property
+    def area(self) -> float:
+        return self.length * self.width
+
+
+@dataclass
+class Rect:
+    """Vrije rechthoek op een plaat"""
+    x: float
+    y: float
+    w: float
+    h: float
+
+    @property
+    def area(self) -> float:
+        return self.w * self.h
+
+    def contains(self, other: "Rect") -> bool:
+        return (
+            other.x >= self.x and other.y >= self.y
+            and other.x + other.w <= self.x + self.w
+            and other.y + other.h <= self.y + self.h
+        )
+
+
+@dataclass
+class Placement:
+    """Een geplaatst onderdeel op een plaat"""
+    part_id: str
+    label: str
+    x: float
+    y: float
+    length: float           # Lengte zoals geplaatst (na eventuele rotatie)
+    width: float
+    rotated: bool
+    grain: bool = False
+
+
+@dataclass
+class SheetPlan:
+    """Resultaat: welke onderdelen op welke plaat"""
+    sheet_id: str
+    label: str
+    length: float
+    width: float
+    placements: List[Placement]
+    sheet_index: int        # Welke van de voorraad (0, 1, 2, ...)
+    material: str = ""
+
+    @property
+    def used_area(self) -> float:
+        return sum(p.length * p.width for p in self.placements)
+
+    @property
+    def efficiency(self) -> float:
+        area = self.length * self.width
+        return (self.used_area / area * 100) if area > 0 else 0
+
+
+@dataclass
+class OptimizationResult2D:
+    """Volledig resultaat van 2D optimalisatie"""
+    algorithm: str
+    sheets: List[SheetPlan]
+    total_sheets_used: int
+    total_parts_placed: int
+    efficiency: float                           # Gemiddelde benutting in %
+    parts_not_placed: List[Tuple[Part2D, str]]  # (onderdeel, reden)
+    computation_time_ms: float
+    iterations: int = 1
+    lower_bound: Optional[int] = None           # Ondergrens aantal platen (TWO_STAGE)
+    lower_bound_scope: str = ""                 # Waarvoor de grens geldt (BOUND_SCOPES)
+
+
+# Geldigheid van de ondergrens van TWO_STAGE
+BOUND_SCOPES = {
+    # LP-grens van de column generation: alleen voor twee-staps guillotine
+    # indelingen, een vrije indeling kan met minder platen toe
+    "two_stage": "Ondergrens voor twee-staps guillotine indelingen",
+    # Oppervlaktegrens: geldt voor elke indeling
+    "area": "Ondergrens op oppervlakte (geldt voor elke indeling)",
+}
+
+
+@dataclass
+class StripPattern:
+    """
+    Twee-staps guillotine patroon voor één plaattype
+
+    De plaat wordt eerst over de volle lengte in stroken gezaagd
+    (hoogte in de breedterichting), daarna elke strook in onderdelen.
+    """
+    sheet: int                                          # Index in de voorraad
+    strips: List[Tuple[float, List[Tuple[int, bool, int]]]]  # (hoogte, [(type, geroteerd, aantal)])
+    counts: List[int]                                   # Stuks per onderdeeltype
+
+
+@dataclass
+class SearchResult:
+    """Beste run van een (deel van een) multi-start zoektocht"""
+    score: float
+    iteration: int
+    plans: List[SheetPlan]
+    unplaced: List[Part2D]
+    runs: int = 0
+    abandoned: int = 0
+
+
+# Geen volledige oplossing bekend (limiet voor het aantal platen)
+NO_BEST = 2**31 - 1
+
+
+# ============ VRIJE RUIMTE ============
+
+class FreeRects:
+    """
+    Index van de vrije rechthoeken van één plaat
+
+    De rechthoeken staan in twee gesorteerde lijsten, op breedte en op
+    hoogte. Een best-short-side-fit zoekactie loopt beide lijsten tegelijk
+    af vanaf de maat van het onderdeel en stopt zodra de kleinste
+    overgebleven marge in beide richtingen niet meer kan winnen, zodat
+    meestal maar een klein deel van de rechthoeken bekeken wordt.
+
+    Bij een MaxRects split worden alleen de nieuwe rechthoeken gecontroleerd
+    op insluiting: een bestaande rechthoek kan niet in een nieuwe vallen,
+    want elke nieuwe rechthoek ligt binnen een (al opgeschoonde) oude.
+    """
+
+    def __init__(self, length: float, width: float):
+        self._rects: Dict[int, Rect] = {}
+        self._by_w: List[Tuple[float, int]] = []
+        self._by_h: List[Tuple[float, int]] = []
+        self._next_id = 0
+        self._add(Rect(0, 0, length, width))
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    @property
+    def rects(self) -> List[Rect]:
+        """Alle vrije rechthoeken, klein → groot"""
+        return sorted(self._rects.values(), key=lambda r: (r.area, r.y, r.x))
+
+    def _add(self, rect: Rect) -> int:
+        rect_id = self._next_id
+        self._next_id += 1
+        self._rects[rect_id] = rect
+        insort(self._by_w, (rect.w, rect_id))
+        insort(self._by_h, (rect.h, rect_id))
+        return rect_id
+
+    def _remove(self, rect_id: int):
+        rect = self._rects.pop(rect_id)
+        del self._by_w[bisect_left(self._by_w, (rect.w, rect_id))]
+        del self._by_h[bisect_left(self._by_h, (rect.h, rect_id))]
+
+    def find_best(
+        self,
+        length: float,
+        width: float,
+        can_rotate: bool
+    ) -> Optional[Tuple[int, float, float, bool]]:
+        """
+        Best-short-side-fit: kies de vrije rechthoek waarin het onderdeel
+        het minst overhoudt aan de kortste zijde
+
+        Bij gelijke score wint de kleinste rechthoek (daarna de positie),
+        onafhankelijk van de volgorde in het index.
+
+        Returns:
+            (rect_id, w, h, rotated) of None als het nergens past
+        """
+        best = self._query(length, width, False, None)
+        if can_rotate and length != width:
+            best = self._query(width, length, True, best)
+        if best is None:
+            return None
+        _, rect_id, w, h, rotated = best
+        return rect_id, w, h, rotated
+
+    def _query(self, w: float, h: float, rotated: bool, best):
+        """
+        Zoek de beste rechthoek voor een onderdeel van w × h
+
+        best is (sorteersleutel, rect_id, w, h, rotated) of None.
+        """
+        by_w, by_h = self._by_w, self._by_h
+        i = bisect_left(by_w, (w, -1))
+        j = bisect_left(by_h, (h, -1))
+        seen = set()
+
+        while i < len(by_w) or j < len(by_h):
+            dw = by_w[i][0] - w if i < len(by_w) else float("inf")
+            dh = by_h[j][0] - h if j < len(by_h) else float("inf")
+
+            # Elke nog niet bekeken rechthoek heeft minstens deze marges
+            if best is not None and min(dw, dh) > best[0][0]:
+                break
+
+            if dw <= dh:
+                rect_id = by_w[i][1]
+                i += 1
+            else:
+                rect_id = by_h[j][1]
+                j += 1
+
+            if rect_id in seen:
+                continue
+            seen.add(rect_id)
+
+            rect = self._rects[rect_id]
+            if w <= rect.w and h <= rect.h:
+                key = (min(rect.w - w, rect.h - h), rect.area, rect.y, rect.x, rotated)
+                if best is None or key < best[0]:
+                    best = (key, rect_id, w, h, rotated)
+
+        return best
+
+    def get(self, rect_id: int) -> Rect:
+        return self._rects[rect_id]
+
+    def split_guillotine(self, rect_id: int, w: float, h: float, kerf: float):
+        """
+        Guillotine split: de gebruikte rechthoek wordt vervangen door
+        een strook rechts (volle hoogte) en een strook onder (breedte onderdeel)
+        """
+        rect = self._rects[rect_id]
+        self._remove(rect_id)
+
+        right_w = rect.w - w - kerf
+        if right_w > 0:
+            self._add(Rect(rect.x + w + kerf, rect.y, right_w, rect.h))
+
+        bottom_h = rect.h - h - kerf
+        if bottom_h > 0:
+            self._add(Rect(rect.x, rect.y + h + kerf, w, bottom_h))
+
+    def split_maxrects(self, x: float, y: float, w: float, h: float, kerf: float):
+        """
+        MaxRects split: elke vrije rechthoek die het geplaatste onderdeel
+        (inclusief zaagsnede rechts en onder) overlapt wordt opgesplitst in
+        maximaal vier maximale deelrechthoeken
+        """
+        ux1, uy1 = x, y
+        ux2, uy2 = x + w + kerf, y + h + kerf
+        hit = [
+            rect_id for rect_id, r in self._rects.items()
+            if not (ux1 >= r.x + r.w or ux2 <= r.x or uy1 >= r.y + r.h or uy2 <= r.y)
+        ]
+
+        new_rects: List[Rect] = []
+        for rect_id in hit:
+            r = self._rects[rect_id]
+            self._remove(rect_id)
+            rx2, ry2 = r.x + r.w, r.y + r.h
+
+            if ux1 > r.x:       # Links
+                new_rects.append(Rect(r.x, r.y, ux1 - r.x, r.h))
+            if ux2 < rx2:       # Rechts
+                new_rects.append(Rect(ux2, r.y, rx2 - ux2, r.h))
+            if uy1 > r.y:       # Boven
+                new_rects.append(Rect(r.x, r.y, r.w, uy1 - r.y))
+            if uy2 < ry2:       # Onder
+                new_rects.append(Rect(r.x, uy2, r.w, ry2 - uy2))
+
+        # Incrementeel opschonen: alleen nieuwe rechthoeken kunnen
+        # ingesloten zijn, door een bestaande of door een andere nieuwe
+        new_rects.sort(key=lambda r: r.area, reverse=True)
+        for rect in new_rects:
+            if not self._is_contained(rect):
+                self._add(rect)
+
+    def _is_contained(self, rect: Rect) -> bool:
+        """Valt rect volledig binnen een rechthoek uit het index"""
+        # Alleen rechthoeken die minstens zo breed zijn komen in aanmerking
+        for k in range(bisect_left(self._by_w, (rect.w, -1)), len(self._by_w)):
+            other = self._rects[self._by_w[k][1]]
+            if other.h >= rect.h and other.contains(rect):
+                return True
+        return False
+
+
+# ============ OPTIMIZER ============
+
+class Optimizer2D:
+    """
+    2D Sheet Cutting Optimizer met meerdere algoritmes
+    """
+
+    def __init__(
+        self,
+        kerf: float = 3.0,
+        grain_direction: bool = True,
+        workers: Optional[int] = 1
+    ):
+        """
+        Args:
+            kerf: Zaagsnede breedte in mm
+            grain_direction: Houd rekening met nerfrichting (geen rotatie
+                voor onderdelen met grain=True)
+            workers: Aantal processen voor HYBRID (None = alle CPU's)
+        """
+        self.kerf = kerf
+        self.grain_direction = grain_direction
+        self.workers = workers
+
+    def optimize(
+        self,
+        parts: List[Part2D],
+        sheets: List[Sheet],
+        algorithm: Algorithm2D = Algorithm2D.HYBRID,
+        max_iterations: int = 1000,
+        time_limit: float = 5.0,
+        seed: int = 0
+    ) -> OptimizationResult2D:
+        """
+        Hoofdfunctie: optimaliseer plaatindeling per materiaal
+
+        Args:
+            parts: Lijst van te zagen onderdelen
+            sheets: Lijst van beschikbare platen
+            algorithm: Te gebruiken algoritme
+            max_iterations: Aantal volgordes voor HYBRID
+            time_limit: Maximale rekentijd voor HYBRID in seconden
+            seed: Startwaarde voor de willekeurige volgordes van HYBRID
+
+        Returns:
+            OptimizationResult2D met plaatindeling
+        """
+        start_time = time.perf_counter()
+
+        parts_by_material = self._expand_parts(parts)
+        sheets_by_material: Dict[str, List[Sheet]] = {}
+        for sheet in sheets:
+            sheets_by_material.setdefault(sheet.material, []).append(sheet)
+
+        all_sheets: List[SheetPlan] = []
+        not_placed: List[Tuple[Part2D, str]] = []
+        iterations = 0
+        lower_bound: Optional[int] = 0 if algorithm == Algorithm2D.TWO_STAGE else None
+        scopes = set()
+
+        for material, material_parts in parts_by_material.items():
+            material_sheets = sheets_by_material.get(material)
+            if not material_sheets:
+                reason = "Niet in voorraad" if material else "Geen materiaal"
+                not_placed.extend((p, reason) for p in material_parts)
+                continue
+
+            # Sorteer voorraad klein → groot (zoals de frontend)
+            material_sheets = sorted(material_sheets, key=lambda s: s.area)
+
+            if algorithm == Algorithm2D.HYBRID:
+                plans, unplaced, iters = self._run_hybrid(
+                    material_parts, material_sheets, max_iterations, time_limit, seed
+                )
+            elif algorithm == Algorithm2D.TWO_STAGE:
+                plans, unplaced, iters, bound, scope = self._run_two_stage(
+                    material_parts, material_sheets, max_iterations, time_limit, seed
+                )
+                lower_bound = None if bound is None or lower_bound is None else lower_bound + bound
+                scopes.add(scope)
+            elif algorithm == Algorithm2D.MAXRECTS:
+                ordered = sorted(material_parts, key=lambda p: p.area, reverse=True)
+                plans, unplaced = self._pack(ordered, material_sheets, maxrects=True)
+                iters = 1
+            else:
+                ordered = sorted(material_parts, key=lambda p: p.area, reverse=True)
+                plans, unplaced = self._pack(ordered, material_sheets, maxrects=False)
+                iters = 1
+
+            iterations += iters
+            all_sheets.extend(plans)
+            not_placed.extend((p, "Geen ruimte") for p in unplaced)
+
+        # Sorteer platen klein → groot, zoals buildResult in de frontend
+        all_sheets.sort(key=lambda s: s.length * s.width)
+
+        total_area = sum(s.length * s.width for s in all_sheets)
+        used_area = sum(s.used_area for s in all_sheets)
+
+        return OptimizationResult2D(
+            algorithm=algorithm.value,
+            sheets=all_sheets,
+            total_sheets_used=len(all_sheets),
+            total_parts_placed=sum(len(s.placements) for s in all_sheets),
+            efficiency=(used_area / total_area * 100) if total_area > 0 else 0,
+            parts_not_placed=not_placed,
+            computation_time_ms=(time.perf_counter() - start_time) * 1000,
+            iterations=iterations,
+            lower_bound=lower_bound,
+            # Eén materiaal met een twee-staps grens maakt de som twee-staps
+            lower_bound_scope=(
+                "" if lower_bound is None else "two_stage" if "two_stage" in scopes else "area"
+            )
+        )
+
+    def _expand_parts(self, parts: List[Part2D]) -> Dict[str, List[Part2D]]:
+        """Expandeer onderdelen per quantity en groepeer per materiaal"""
+        parts_by_material: Dict[str, List[Part2D]] = {}
+        for part in parts:
+            group = parts_by_material.setdefault(part.material, [])
+            for i in range(part.quantity):
+                group.append(Part2D(
+                    id=f"{part.id}_{i+1}" if part.quantity > 1 else part.id,
+                    length=part.length,
+                    width=part.width,
+                    quantity=1,
+                    label=part.label,
+                    grain=part.grain,
+                    material=part.material
+                ))
+        return parts_by_material
+
+    def _can_rotate(self, part: Part2D) -> bool:
+        return not self.grain_direction or not part.grain
+
+    def _fits(self, part: Part2D, sheet: Sheet) -> bool:
+        """Past het onderdeel op de plaat (normaal of geroteerd)"""
+        if part.length <= sheet.length and part.width <= sheet.width:
+            return True
+        return (
+            self._can_rotate(part)
+            and part.width <= sheet.length
+            and part.length <= sheet.width
+        )
+
+    def _run_hybrid(
+        self,
+        parts: List[Part2D],
+        sheets: List[Sheet],
+        max_iterations: int,
+        time_limit: float,
+        seed: int
+    ) -> Tuple[List[SheetPlan], List[Part2D], int]:
+        """
+        Multi-start: pak dezelfde onderdelen in verschillende volgordes
+        en bewaar het beste resultaat (minste platen, hoogste benutting)
+
+        Met meerdere workers worden de iteraties over processen verdeeld.
+        Serieel en parallel lopen dezelfde iteraties (geen early stop), zodat
+        het aantal workers het plan niet verandert.
+        """
+        iterations = list(range(max(1, max_iterations)))
+        workers = resolve_workers(self.workers)
+
+        if workers > 1 and len(iterations) >= 2 * workers:
+            return self._run_hybrid_parallel(
+                parts, sheets, iterations, time_limit, seed, workers
+            )
+
+        search = self._search(parts, sheets, iterations, seed, time_limit)
+        return search.plans, search.unplaced, search.runs
+
+    def _run_hybrid_parallel(
+        self,
+        parts: List[Part2D],
+        sheets: List[Sheet],
+        iterations: List[int],
+        time_limit: float,
+        seed: int,
+        workers: int
+    ) -> Tuple[List[SheetPlan], List[Part2D], int]:
+        """
+        Verdeel de iteraties over worker processen
+
+        De workers delen het laagste aantal platen van een volledige
+        oplossing; een run die daar overheen gaat kan niet meer winnen en
+        wordt afgebroken. Omdat alleen gedomineerde runs afvallen en bij
+        gelijke score de laagste iteratie wint, is het resultaat (zonder
+        timeout) gelijk aan dat van een seriële zoektocht over dezelfde seeds.
+        """
+        shared_best = multiprocessing.Value("i", NO_BEST)
+        calls = [
+            (self.kerf, self.grain_direction, parts, sheets, chunk, seed, time_limit)
+            for chunk in partition(iterations, workers)
+        ]
+        searches = run_parallel(
+            _hybrid_worker, calls,
+            initializer=_init_hybrid_worker, initargs=(shared_best,)
+        )
+
+        best = max(searches, key=lambda r: (r.score, -r.iteration))
+        runs = sum(r.runs for r in searches)
+        abandoned = sum(r.abandoned for r in searches)
+        print(f"[2D HYBRID] {runs} runs over {len(calls)} workers, "
+              f"{abandoned} afgebroken, beste iteratie {best.iteration}")
+
+        return best.plans, best.unplaced, runs
+
+    def _search(
+        self,
+        parts: List[Part2D],
+        sheets: List[Sheet],
+        iterations: List[int],
+        seed: int,
+        time_limit: float,
+        shared_best=None,
+        early_stop: bool = False,
+        cancel_token: CancelToken = NEVER_CANCELLED
+    ) -> "SearchResult":
+        """
+        Probeer de volgordes voor de gegeven iteraties en geef de beste terug
+
+        Args:
+            shared_best: Gedeelde multiprocessing.Value met het laagste
+                aantal platen van een volledige oplossing (optioneel)
+            early_stop: Stop bij >90% benutting; alleen voor zoektochten die
+                altijd serieel lopen (de startoplossing van TWO_STAGE), anders
+                hangt het resultaat af van het aantal workers
+            cancel_token: Gecontroleerd per iteratie (SolveCancelled)
+        """
+        best = SearchResult(float("-inf"), -1, [], list(parts))
+        best_sheets = NO_BEST
+        start = time.perf_counter()
+
+        for iteration in iterations:
+            cancel_token.check()
+            limit = best_sheets
+            if shared_best is not None:
+                limit = min(limit, shared_best.value)
+
+            ordered = shuffle_parts(parts, iteration, seed)
+            packed = self._pack(ordered, sheets, maxrects=False, sheet_limit=limit)
+            best.runs += 1
+
+            if packed is None:
+                best.abandoned += 1
+            else:
+                plans, unplaced = packed
+                score = score_packing(plans, unplaced)
+
+                if score > best.score:
+                    best.score, best.iteration = score, iteration
+                    best.plans, best.unplaced = plans, unplaced
+
+                if not unplaced and len(plans) < best_sheets:
+                    best_sheets = len(plans)
+                    if shared_best is not None:
+                        with shared_best.get_lock():
+                            if best_sheets < shared_best.value:
+                                shared_best.value = best_sheets
+
+                if early_stop and not unplaced and packing_efficiency(plans) > 90:
+                    print(f"[2D HYBRID] Optimaal na {best.runs} iteraties")
+                    break
+
+            if time.perf_counter() - start > time_limit:
+                print(f"[2D HYBRID] Timeout na {best.runs} iteraties")
+                break
+
+        return best
+
+    def _run_two_stage(
+        self,
+        parts: List[Part2D],
+        sheets: List[Sheet],
+        max_iterations: int,
+        time_limit: float,
+        seed: int
+    ) -> Tuple[List[SheetPlan], List[Part2D], int, Optional[int], str]:
+        """
+        Twee-staps guillotine via Column Generation (Gilmore-Gomory)
+
+        1. Master LP: minimaliseer het aantal platen over de bekende patronen
+        2. Pricing per plaattype: 1D knapsack per strookhoogte over de
+           plaatlengte, daarna een knapsack die stroken op de plaatbreedte
+           stapelt (zelfde knapsack als de 1D optimizer)
+        3. Herhaal tot er geen patroon met negatieve reduced cost meer is;
+           de LP-waarde is dan een ondergrens voor het aantal platen in
+           een twee-staps indeling (niet voor een vrije indeling)
+        4. Los de master als MIP op over de gevonden patronen
+
+        Het resultaat wordt vergeleken met een snelle heuristiek en de beste
+        van de twee wordt teruggegeven, dus nooit slechter dan HYBRID.
+
+        De LP-grens wordt alleen gebruikt als de column generation bewezen
+        klaar is: geconvergeerd, en de pricing knapsacks van de laatste ronde
+        zijn niet door hun max_nodes afgebroken (anders kan er nog een
+        beter patroon zijn). Komt het plan van de heuristiek (een vrije
+        indeling), dan geldt de LP-grens er niet voor. In die gevallen is
+        de grens de oppervlaktegrens.
+
+        Returns:
+            (plans, niet geplaatst, iteraties, ondergrens of None, scope
+            van de ondergrens: zie BOUND_SCOPES)
+        """
+        deadline = time.perf_counter() + time_limit
+
+        incumbent = self._search(
+            parts, sheets, list(range(max(1, min(max_iterations, 50)))),
+            seed, time_limit * 0.2, early_stop=True
+        )
+        if not ORTOOLS_AVAILABLE:
+            print("[2D TWO-STAGE] OR-Tools niet beschikbaar, fallback naar Hybrid")
+            return incumbent.plans, incumbent.unplaced, incumbent.runs, None, ""
+
+        # Groepeer identieke onderdelen tot types met een vraag
+        groups: Dict[Tuple[float, float, bool], List[Part2D]] = {}
+        too_large: List[Part2D] = []
+        for part in parts:
+            if any(self._fits(part, sheet) for sheet in sheets):
+                key = (part.length, part.width, not self._can_rotate(part))
+                groups.setdefault(key, []).append(part)
+            else:
+                too_large.append(part)
+
+        if not groups:
+            return [], too_large, incumbent.runs, 0, "area"
+
+        types = list(groups.values())
+        demand = [len(g) for g in types]
+        orients: List[List[Tuple[float, float, bool]]] = []
+        for group in types:
+            part = group[0]
+            options = [(part.length, part.width, False)]
+            if self._can_rotate(part) and part.length != part.width:
+                options.append((part.width, part.length, True))
+            orients.append(options)
+
+        # Startpatronen: per plaattype en onderdeeltype een homogeen patroon
+        master = _MasterProblem("GLOP", demand, sheets, integer=False)
+        seen = set()
+        patterns: List[StripPattern] = []
+
+        def add(pattern: StripPattern) -> bool:
+            key = (pattern.sheet, tuple(pattern.counts))
+            if key in seen or not any(pattern.counts):
+                return False
+            seen.add(key)
+            patterns.append(pattern)
+            master.add_column(pattern)
+            return True
+
+        for s_idx, sheet in enumerate(sheets):
+            for i in range(len(types)):
+                unit = [1.0 if j == i else 0.0 for j in range(len(types))]
+                _, pattern, _ = self._price_sheet(sheet, s_idx, orients, unit, demand)
+                add(pattern)
+
+        # Column Generation
+        converged = False
+        pricing_exact = True
+        iterations = 0
+        while time.perf_counter() < deadline and iterations < max(1, max_iterations):
+            iterations += 1
+            if not master.solve():
+                print("[2D TWO-STAGE] Master LP niet oplosbaar (voorraad te klein?), fallback naar Hybrid")
+                return incumbent.plans, incumbent.unplaced, incumbent.runs + iterations, None, ""
+
+            duals, sheet_duals = master.duals()
+            added = 0
+            pricing_exact = True
+            for s_idx, sheet in enumerate(sheets):
+                value, pattern, exact = self._price_sheet(sheet, s_idx, orients, duals, demand)
+                pricing_exact = pricing_exact and exact
+                if 1 - value - sheet_duals.get(s_idx, 0.0) < -1e-6 and add(pattern):
+                    added += 1
+
+            if not added:
+                converged = True
+                break
+
+        lp_value = master.objective()
+        area_bound = math.ceil(
+            sum(p.area for g in types for p in g) / max(s.area for s in sheets) - 1e-9
+        )
+        proven = converged and pricing_exact
+        lp_bound = math.ceil(lp_value - 1e-6)
+        bound, scope = (lp_bound, "two_stage") if proven and lp_bound > area_bound else (area_bound, "area")
+        note = "" if proven else " (niet geconvergeerd)" if not converged else " (pricing afgebroken op max_nodes)"
+        print(f"[2D TWO-STAGE] {len(patterns)} patronen, {iterations} iteraties, "
+              f"LP={lp_value:.3f}, ondergrens={bound} ({scope}){note}")
+
+        # Integer oplossing over de gevonden patronen
+        remaining_ms = max(1000, int((deadline - time.perf_counter()) * 1000))
+        counts = None
+        mip = _MasterProblem("SCIP", demand, sheets, integer=True)
+        if mip.solver is not None:
+            for pattern in patterns:
+                mip.add_column(pattern)
+            if mip.solve(time_limit_ms=remaining_ms):
+                counts = mip.values()
+        if counts is None:
+            # Afronden naar boven dekt altijd de vraag
+            counts = [math.ceil(v - 1e-6) for v in master.values()]
+
+        plans, unplaced = self._layout_patterns(patterns, counts, sheets, types)
+        unplaced.extend(too_large)
+
+        over_quantity = any(
+            sheet.quantity != -1
+            and sum(1 for p in plans if p.sheet_id == sheet.id) > sheet.quantity
+            for sheet in sheets
+        )
+        if over_quantity or (
+            (len(unplaced), len(plans)) > (len(incumbent.unplaced), len(incumbent.plans))
+        ):
+            print(f"[2D TWO-STAGE] Heuristiek beter ({len(incumbent.plans)} platen)")
+            plans, unplaced = incumbent.plans, incumbent.unplaced
+            # Een vrije indeling: de LP-grens geldt er niet voor
+            bound, scope = area_bound, "area"
+        elif not unplaced and len(plans) < bound:
+            bound, scope = area_bound, "area"  # Kan niet bij een bewezen LP-grens; voor de zekerheid
+
+        return plans, unplaced, incumbent.runs + iterations, bound, scope
+
+    def _price_sheet(
+        self,
+        sheet: Sheet,
+        sheet_index: int,
+        orients: List[List[Tuple[float, float, bool]]],
+        duals: List[float],
+        demand: List[int]
+    ) -> Tuple[float, StripPattern, bool]:
+        """
+        Pricing: beste twee-staps patroon voor één plaat bij gegeven duals
+
+        Returns:
+            (waarde van het patroon, patroon, exact); exact is False als een
+            knapsack door max_nodes is afgebroken (de waarde kan dan hoger)
+        """
+        eps = 1e-9
+        heights = sorted({
+            b for i, options in enumerate(orients) if duals[i] > eps
+            for a, b, _ in options if a <= sheet.length and b <= sheet.width
+        })
+
+        strip_values: List[float] = []
+        strip_contents: List[List[Tuple[int, bool, int]]] = []
+        exact = True
+        for h in heights:
+            candidates = [
+                (i, a, rotated) for i, options in enumerate(orients) if duals[i] > eps
+                for a, b, rotated in options if b <= h and a <= sheet.length
+            ]
+            value, counts, complete = knapsack_search(
+                [a for _, a, _ in candidates],
+                [duals[i] for i, _, _ in candidates],
+                sheet.length,
+                self.kerf,
+                [demand[i] for i, _, _ in candidates]
+            )
+            exact = exact and complete
+            strip_values.append(value)
+            strip_contents.append([
+                (i, rotated, c) for (i, _, rotated), c in zip(candidates, counts) if c
+            ])
+
+        value, strip_counts, complete = knapsack_search(heights, strip_values, sheet.width, self.kerf)
+        exact = exact and complete
+
+        strips: List[Tuple[float, List[Tuple[int, bool, int]]]] = []
+        counts = [0] * len(orients)
+        for h, content, n in zip(heights, strip_contents, strip_counts):
+            for _ in range(n):
+                strips.append((h, content))
+                for i, _, c in content:
+                    counts[i] += c
+
+        return value, StripPattern(sheet=sheet_index, strips=strips, counts=counts), exact
+
+    def _layout_patterns(
+        self,
+        patterns: List[StripPattern],
+        counts: List[int],
+        sheets: List[Sheet],
+        types: List[List[Part2D]]
+    ) -> Tuple[List[SheetPlan], List[Part2D]]:
+        """Zet gekozen patronen om in platen met coördinaten"""
+        queues = [deque(group) for group in types]
+        plans: List[SheetPlan] = []
+        sheet_counts: Dict[str, int] = {}
+
+        for pattern, count in zip(patterns, counts):
+            sheet = sheets[pattern.sheet]
+            for _ in range(count):
+                placements: List[Placement] = []
+                y = 0.0
+                for h, content in pattern.strips:
+                    x = 0.0
+                    for i, rotated, n in content:
+                        for _ in range(n):
+                            if not queues[i]:
+                                continue  # Patroon dekt meer dan de vraag
+                            part = queues[i].popleft()
+                            a, b = (part.width, part.length) if rotated else (part.length, part.width)
+                            placements.append(Placement(
+                                part_id=part.id,
+                                label=part.label,
+                                x=x,
+                                y=y,
+                                length=a,
+                                width=b,
+                                rotated=rotated,
+                                grain=part.grain
+                            ))
+                            x += a + self.kerf
+                    y += h + self.kerf
+
+                if not placements:
+                    continue
+                index = sheet_counts.get(sheet.id, 0)
+                sheet_counts[sheet.id] = index + 1
+                plans.append(SheetPlan(
+                    sheet_id=sheet.id,
+                    label=sheet.label,
+                    length=sheet.length,
+                    width=sheet.width,
+                    placements=placements,
+                    sheet_index=index,
+                    material=sheet.material
+                ))
+
+        unplaced = [part for queue in queues for part in queue]
+        return plans, unplaced
+
+    def _pack(
+        self,
+        parts: List[Part2D],
+        sheets: List[Sheet],
+        maxrects: bool,
+        sheet_limit: int = NO_BEST
+    ) -> Optional[Tuple[List[SheetPlan], List[Part2D]]]:
+        """
+        Plaat-gecentreerde plaatsing: vul platen van klein naar groot,
+        elke plaat zo vol mogelijk met de resterende onderdelen in volgorde
+
+        Returns:
+            (plans, niet geplaatst), of None als er meer dan sheet_limit
+            platen nodig zijn terwijl er nog onderdelen over zijn (de run is
+            dan gedomineerd door een eerder gevonden volledige oplossing)
+        """
+        plans: List[SheetPlan] = []
+        remaining = list(parts)
+
+        for sheet in sheets:
+            available = math.inf if sheet.quantity == -1 else sheet.quantity  # Elke plaat plaatst minstens één onderdeel
+            used = 0
+
+            while remaining and used < available:
+                plan, remaining_after = self._fill_sheet(remaining, sheet, used, maxrects)
+                if plan is None:
+                    break
+                plans.append(plan)
+                remaining = remaining_after
+                used += 1
+
+                if remaining and len(plans) > sheet_limit:
+                    return None
+
+            if not remaining:
+                break
+
+        return plans, remaining
+
+    def _fill_sheet(
+        self,
+        parts: List[Part2D],
+        sheet: Sheet,
+        sheet_index: int,
+        maxrects: bool
+    ) -> Tuple[Optional[SheetPlan], List[Part2D]]:
+        """
+        Vul één plaat; geeft (plan, niet geplaatste onderdelen) terug
+
+        Bij MaxRects kan een onderdeel ook links of boven een eerder
+        geplaatst onderdeel komen. Daarom rekenen we daar met onderdelen
+        en een plaat die allebei een zaagsnede groter zijn: elk onderdeel
+        neemt zijn eigen zaagsnede rechts en onder mee, en aan de rand van
+        de plaat valt die buiten het materiaal.
+        """
+        pad = self.kerf if maxrects else 0
+        free = FreeRects(sheet.length + pad, sheet.width + pad)
+        placements: List[Placement] = []
+        left_over: List[Part2D] = []
+
+        for part in parts:
+            if not self._fits(part, sheet):
+                left_over.append(part)
+                continue
+
+            best = free.find_best(part.length + pad, part.width + pad, self._can_rotate(part))
+            if best is None:
+                left_over.append(part)
+                continue
+
+            rect_id, w, h, rotated = best
+            w, h = w - pad, h - pad
+            rect = free.get(rect_id)
+            placements.append(Placement(
+                part_id=part.id,
+                label=part.label,
+                x=rect.x,
+                y=rect.y,
+                length=w,
+                width=h,
+                rotated=rotated,
+                grain=part.grain
+            ))
+
+            if maxrects:
+                free.split_maxrects(rect.x, rect.y, w, h, self.kerf)
+            else:
+                free.split_guillotine(rect_id, w, h, self.kerf)
+
+        if not placements:
+            return None, parts
+
+        return SheetPlan(
+            sheet_id=sheet.id,
+            label=sheet.label,
+            length=sheet.length,
+            width=sheet.width,
+            placements=placements,
+            sheet_index=sheet_index,
+            material=sheet.material
+        ), left_over
+
+
+# ============ COLUMN GENERATION ============
+
+class _MasterProblem:
+    """
+    Master probleem: kies hoe vaak elk patroon gebruikt wordt
+
+    min  sum(x_p)
+    s.t. sum(a_ip * x_p) >= vraag_i        voor elk onderdeeltype i
+         sum(x_p, p op plaat s) <= aantal_s  voor platen met beperkte voorraad
+    """
+
+    def __init__(self, solver_name: str, demand: List[int], sheets: List[Sheet], integer: bool):
+        pywraplp = load_pywraplp()
+        self.solver = pywraplp.Solver.CreateSolver(solver_name)
+        if self.solver is None and integer:
+            self.solver = pywraplp.Solver.CreateSolver("CBC")
+        if self.solver is None:
+            return
+
+        self.integer = integer
+        self.vars = []
+        infinity = self.solver.infinity()
+        self.demand_rows = [self.solver.Constraint(d, infinity) for d in demand]
+        self.sheet_rows = {
+            s_idx: self.solver.Constraint(0, sheet.quantity)
+            for s_idx, sheet in enumerate(sheets) if sheet.quantity != -1
+        }
+        self.obj = self.solver.Objective()
+        self.obj.SetMinimization()
+
+    def add_column(self, pattern: StripPattern):
+        name = f"p{len(self.vars)}"
+        if self.integer:
+            var = self.solver.IntVar(0, self.solver.infinity(), name)
+        else:
+            var = self.solver.NumVar(0, self.solver.infinity(), name)
+        for i, count in enumerate(pattern.counts):
+            if count:
+                self.demand_rows[i].SetCoefficient(var, count)
+        if pattern.sheet in self.sheet_rows:
+            self.sheet_rows[pattern.sheet].SetCoefficient(var, 1)
+        self.obj.SetCoefficient(var, 1)
+        self.vars.append(var)
+
+    def solve(self, time_limit_ms: Optional[int] = None) -> bool:
+        if time_limit_ms is not None:
+            self.solver.SetTimeLimit(time_limit_ms)
+        status = pywraplp_status(self.solver.Solve())
+        if self.integer:
+            return status in ("OPTIMAL", "FEASIBLE")
+        return status == "OPTIMAL"
+
+    def duals(self) -> Tuple[List[float], Dict[int, float]]:
+        return (
+            [row.dual_value() for row in self.demand_rows],
+            {s_idx: row.dual_value() for s_idx, row in self.sheet_rows.items()}
+        )
+
+    def values(self) -> List[float]:
+        if self.integer:
+            return [int(round(v.solution_value())) for v in self.vars]
+        return [v.solution_value() for v in self.vars]
+
+    def objective(self) -> float:
+        return self.obj.Value()
+
+
+# ============ WORKERS ============
+
+_shared_best_sheets = None
+
+
+def _init_hybrid_worker(shared_best):
+    """Initializer voor worker processen: bewaar de gedeelde beste score"""
+    global _shared_best_sheets
+    _shared_best_sheets = shared_best
+
+
+def _hybrid_worker(
+    kerf: float,
+    grain_direction: bool,
+    parts: List[Part2D],
+    sheets: List[Sheet],
+    iterations: List[int],
+    seed: int,
+    time_limit: float
+) -> SearchResult:
+    """
+    Voer een deel van de multi-start zoektocht uit in een worker proces;
+    stopt als run_parallel de taak annuleert (bijv. na een fout elders)
+    """
+    optimizer = Optimizer2D(kerf=kerf, grain_direction=grain_direction)
+    return optimizer._search(
+        parts, sheets, iterations, seed, time_limit, _shared_best_sheets,
+        cancel_token=task_cancel_token()
+    )
+
+
+# ============ HELPERS ============
+
+def shuffle_parts(parts: List[Part2D], iteration: int, seed: int = 0) -> List[Part2D]:
+    """
+    Volgorde voor iteratie `iteration` (zelfde opzet als shuffleParts in de frontend):
+    0 = oppervlakte, 1 = breedte, 2 = lengte, daarna gewogen willekeurig
+    """
+    if iteration == 0:
+        return sorted(parts, key=lambda p: p.area, reverse=True)
+    if iteration == 1:
+        return sorted(parts, key=lambda p: p.width, reverse=True)
+    if iteration == 2:
+        return sorted(parts, key=lambda p: p.length, reverse=True)
+
+    rng = random.Random(seed * 1_000_003 + iteration)
+    weighted = [(p.area * (0.3 + rng.random() * 0.7), p) for p in parts]
+    weighted.sort(key=lambda x: x[0], reverse=True)
+    return [p for _, p in weighted]
+
+
+def packing_efficiency(plans: List[SheetPlan]) -> float:
+    """Gemiddelde benutting over alle platen in %"""
+    total_area = sum(s.length * s.width for s in plans)
+    used_area = sum(s.used_area for s in plans)
+    return (used_area / total_area * 100) if total_area > 0 else 0
+
+
+def score_packing(plans: List[SheetPlan], unplaced: List[Part2D]) -> float:
+    """Score zoals runHybrid in de frontend: minste platen, dan benutting"""
+    return -len(plans) * 10000 + packing_efficiency(plans) * 100 - len(unplaced) * 50000
+
+
+def result_to_dict_2d(result: OptimizationResult2D) -> dict:
+    """Converteer resultaat naar het formaat van de frontend (cutting2D.js)"""
+    sheets = []
+    part_number = 1
+    for plan in result.sheets:
+        parts = []
+        for p in plan.placements:
+            parts.append({
+                "id": p.part_id,
+                "name": p.label,
+                "number": part_number,
+                "x": p.x,
+                "y": p.y,
+                "length": p.length,
+                "width": p.width,
+                "rotated": p.rotated,
+                "grain": p.grain,
+            })
+            part_number += 1
+        sheets.append({
+            "id": plan.sheet_id,
+            "name": plan.label,
+            "length": plan.length,
+            "width": plan.width,
+            "material": plan.material,
+            "sheetIndex": plan.sheet_index,
+            "parts": parts,
+            "efficiency": round(plan.efficiency, 2),
+            "isVirtual": False,
+        })
+
+    unplaced = [
+        {
+            "id": p.id,
+            "name": p.label,
+            "length": p.length,
+            "width": p.width,
+            "stockType": p.material,
+            "reason": reason,
+        }
+        for p, reason in result.parts_not_placed
+    ]
+
+    return {
+        "success": len(unplaced) == 0,
+        "sheets": sheets,
+        "unplacedDetails": unplaced,
+        "summary": {
+            "totalSheets": result.total_sheets_used,
+            "totalParts": result.total_parts_placed,
+            "avgEfficiency": round(result.efficiency, 2),
+            "unplacedParts": len(unplaced),
+        },
+        "meta": {
+            "algorithm": result.algorithm,
+            "computationTimeMs": round(result.computation_time_ms, 2),
+            "iterations": result.iterations,
+            "lowerBound": result.lower_bound,
+            "lowerBoundScope": result.lower_bound_scope or None,
+            "gap": (
+                round((result.total_sheets_used - result.lower_bound) / result.total_sheets_used, 4)
+                if result.lower_bound is not None and result.total_sheets_used > 0 else None
+            ),
+        },
+    }
+
+
+# ============ TEST ============
+if __name__ == "__main__":
+    parts = [
+        Part2D("kast_zijkant", 720, 560, 4, grain=True),
+        Part2D("plank", 764, 540, 6),
+        Part2D("achterwand", 760, 716, 2),
+        Part2D("lade_front", 396, 140, 8, grain=True),
+    ]
+
+    sheets = [
+        Sheet("mdf_2440", 2440, 1220),
+        Sheet("mdf_1220", 1220, 1220, quantity=2),
+    ]
+
+    optimizer = Optimizer2D(kerf=3)
+
+    print("=" * 60)
+    print("ZAAGPLAN OPTIMIZER - 2D TEST")
+    print("=" * 60)
+
+    for algo in Algorithm2D:
+        print(f"\n--- {algo.value.upper()} ---")
+        result = optimizer.optimize(parts, sheets, algo, max_iterations=200)
+
+        print(f"Platen gebruikt: {result.total_sheets_used}")
+        print(f"Benutting: {result.efficiency:.1f}%")
+        print(f"Tijd: {result.computation_time_ms:.2f}ms ({result.iterations} iteraties)")
+        if result.lower_bound is not None:
+            print(f"Ondergrens: {result.lower_bound} platen ({BOUND_SCOPES[result.lower_bound_scope]})")
+        for plan in result.sheets:
+            print(f"  {plan.sheet_id} #{plan.sheet_index}: {len(plan.placements)} stuks, {plan.efficiency:.1f}%")
@@ -0,0 +1,355 @@
+"""
+Zaagplan Optimizer - Parallelle uitvoering
+Helpers om CPU-zware zoekacties over worker processen te verdelen
+
+Standaard maakt run_parallel per aanroep een eigen process pool. Met
+ZAAGPLAN_POOL_PROCESSES (of enable_shared_pool()) gebruikt het één
+blijvende pool per proces, die bij het opstarten alvast gevuld wordt
+(warm_pool()); zo betaalt een request niet het starten van processen.
+
+Annuleren: elke aanroep krijgt een annuleervlag in gedeeld geheugen
+(multiprocessing.RawArray, via de initializer aan de processen gegeven).
+Bij annuleren of een fout zet run_parallel de vlag; de taak in het worker
+proces ziet hem via task_cancel_token() en breekt in zijn lussen (en een
+lopende solver via on_cancel) af, in plaats van tot zijn eigen tijdslimiet
+door te rekenen.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import math
+import multiprocessing
+import os
+import threading
+
+from cancellation import NEVER_CANCELLED, CancelToken, SolveCancelled
+from metrics import POOL_INFLIGHT, POOL_TASKS
+from solvers import PRELOAD_ORTOOLS, preload
+
+# Aantal web workers op deze machine (gezet door serve.py); de CPU's worden
+# daarover verdeeld
+WEB_WORKERS = max(1, int(os.environ.get("ZAAGPLAN_WEB_WORKERS", "1") or 1))
+
+# Grootte van de gedeelde pool (leeg/0 = geen gedeelde pool)
+POOL_PROCESSES = int(os.environ.get("ZAAGPLAN_POOL_PROCESSES", "0") or 0)
+
+# Aantal gelijktijdige aanroepen op de gedeelde pool met een eigen
+# annuleervlag; daarboven lopen taken na annuleren nog af
+CANCEL_SLOTS = 64
+
+_shared_pool: Optional[ProcessPoolExecutor] = None
+_shared_size = POOL_PROCESSES
+_shared_flags = None
+_free_slots: List[int] = []
+_pool_lock = threading.Lock()
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """
+    CPU quota van de container (cgroup v2 cpu.max of v1 cfs_quota)
+
+    Returns:
+        Aantal CPU's (mag fractioneel zijn), None = geen limiet
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """Aantal CPU's dat dit proces mag gebruiken (affinity en cgroup quota)"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = max(1, len(os.sched_getaffinity(0)))
+    else:
+        cpus = max(1, os.cpu_count() or 1)
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def worker_cpus() -> int:
+    """CPU's voor dit proces als de machine over WEB_WORKERS verdeeld is"""
+    return max(1, available_cpus() // WEB_WORKERS)
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """None of 0 = automatisch (alle CPU's van deze worker)"""
+    if not workers or workers < 1:
+        return worker_cpus()
+    return workers
+
+
+def partition(items: Sequence, n: int) -> List[list]:
+    """
+    Verdeel items om-en-om over n groepen (0, n, 2n, ... in groep 0)
+
+    Zo krijgt elke worker een mix van vroege en late seeds en is de
+    verdeling onafhankelijk van de snelheid van de workers.
+    """
+    n = max(1, min(n, len(items)))
+    return [list(items[i::n]) for i in range(n)]
+
+
+def run_parallel(
+    fn: Callable,
+    calls: List[Tuple],
+    initializer: Optional[Callable] = None,
+    initargs: Tuple = (),
+    max_workers: Optional[int] = None,
+    cancel_token: CancelToken = NEVER_CANCELLED
+) -> List[Any]:
+    """
+    Voer fn(*args) uit voor elke args in calls, verdeeld over processen
+
+    Args:
+        max_workers: Maximaal aantal processen (None = één per call); geldt
+            niet voor de gedeelde pool, die heeft een vaste grootte
+        cancel_token: Bij annuleren worden wachtende taken geschrapt en
+            keert run_parallel direct terug (SolveCancelled); taken die al
+            in een proces draaien krijgen de annuleervlag (zie
+            task_cancel_token) en stoppen bij hun volgende controle
+
+    Returns:
+        Resultaten in dezelfde volgorde als calls
+    """
+    if not calls:
+        return []
+
+    if initializer is None and _shared_size > 0:
+        return _run_shared(fn, calls, cancel_token)
+
+    flags = multiprocessing.RawArray("b", 1)
+    pool = ProcessPoolExecutor(
+        max_workers=min(max_workers or len(calls), len(calls)),
+        initializer=_init_worker,
+        initargs=(flags, initializer, initargs)
+    )
+    cancelled = False
+    try:
+        return _submit_all(pool, fn, calls, cancel_token, flags, 0)
+    except BaseException:
+        cancelled = cancel_token.cancelled
+        raise
+    finally:
+        # Na annuleren niet wachten op taken die nog in een proces lopen
+        pool.shutdown(wait=not cancelled, cancel_futures=cancelled)
+
+
+# Hoe vaak (s) het wachten op de pool het annuleersignaal controleert
+CANCEL_POLL_INTERVAL = 0.1
+
+
+def _submit_all(
+    pool: ProcessPoolExecutor,
+    fn: Callable,
+    calls: List[Tuple],
+    cancel_token: CancelToken = NEVER_CANCELLED,
+    flags=None,
+    slot: int = -1,
+    on_finished: Optional[Callable[[], object]] = None
+) -> List[Any]:
+    POOL_TASKS.inc(len(calls))
+    futures = []
+    # on_finished volgt als de laatste ingediende taak klaar is (ook als
+    # die geannuleerd werd); de 1 extra telt het indienen zelf
+    left = [1]
+    lock = threading.Lock()
+
+    def finish_one(_=None):
+        with lock:
+            left[0] -= 1
+            finished = left[0] == 0
+        if finished and on_finished is not None:
+            on_finished()
+
+    try:
+        for args in calls:
+            POOL_INFLIGHT.inc()
+            future = pool.submit(_run_task, slot, fn, args)
+            future.add_done_callback(lambda _: POOL_INFLIGHT.dec())
+            with lock:
+                left[0] += 1
+            future.add_done_callback(finish_one)
+            futures.append(future)
+    finally:
+        finish_one()
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+        failed = any(f.exception() is not None for f in done)
+        if pending and (cancel_token.cancelled or failed):
+            # Lopende taken stoppen via de vlag, wachtende worden geschrapt
+            if slot >= 0:
+                flags[slot] = 1
+            for future in pending:
+                future.cancel()
+        cancel_token.check()
+        if failed:
+            break
+    return [f.result() for f in futures]
+
+
+# ============ WORKER KANT ============
+
+_worker_flags = None
+_task_token: CancelToken = NEVER_CANCELLED
+
+
+def _init_worker(flags, initializer: Optional[Callable] = None, initargs: Tuple = ()):
+    """
+    Initializer van elk pool proces: bewaar de annuleervlaggen en laad
+    OR-Tools (ZAAGPLAN_PRELOAD_ORTOOLS) als het niet al geërfd is
+    """
+    global _worker_flags
+    _worker_flags = flags
+    if PRELOAD_ORTOOLS:
+        preload()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_task(slot: int, fn: Callable, args: Tuple) -> Any:
+    """Voer één taak uit met het annuleertoken van zijn aanroep"""
+    global _task_token
+    if slot < 0 or _worker_flags is None:
+        return fn(*args)
+    token = _FlagCancelToken(_worker_flags, slot)
+    _task_token = token
+    try:
+        return fn(*args)
+    finally:
+        _task_token = NEVER_CANCELLED
+        token.close()
+
+
+def task_cancel_token() -> CancelToken:
+    """
+    Annuleertoken van de taak die nu in dit worker proces loopt
+    (NEVER_CANCELLED buiten run_parallel)
+    """
+    return _task_token
+
+
+class _FlagCancelToken(CancelToken):
+    """
+    CancelToken dat de annuleervlag van het ouderproces volgt
+
+    cancelled leest de vlag direct; een thread kijkt elke
+    CANCEL_POLL_INTERVAL of hij gezet is en roept dan cancel() aan, zodat
+    ook een lopende solver (on_cancel) onderbroken wordt.
+    """
+
+    def __init__(self, flags, slot: int):
+        super().__init__()
+        self._flags = flags
+        self._slot = slot
+        self._stop = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or bool(self._flags[self._slot])
+
+    def check(self):
+        if self.cancelled:
+            raise SolveCancelled()
+
+    def close(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(CANCEL_POLL_INTERVAL):
+            if self._flags[self._slot]:
+                self.cancel()
+                return
+
+
+# ============ GEDEELDE POOL ============
+
+def enable_shared_pool(processes: Optional[int] = None):
+    """Gebruik voortaan één blijvende pool (None/0 = alle CPU's van deze worker)"""
+    global _shared_size
+    _shared_size = processes or worker_cpus()
+
+
+def shared_pool() -> Optional[ProcessPoolExecutor]:
+    """De gedeelde pool van dit proces, None als die niet ingeschakeld is"""
+    global _shared_pool, _shared_flags, _free_slots
+    if _shared_size <= 0:
+        return None
+    with _pool_lock:
+        if _shared_pool is None:
+            _shared_flags = multiprocessing.RawArray("b", CANCEL_SLOTS)
+            _free_slots = list(range(CANCEL_SLOTS))
+            _shared_pool = ProcessPoolExecutor(
+                max_workers=_shared_size, initializer=_init_worker, initargs=(_shared_flags,)
+            )
+        return _shared_pool
+
+
+def warm_pool() -> int:
+    """Start alle processen van de gedeelde pool nu, geeft het aantal terug"""
+    pool = shared_pool()
+    if pool is None:
+        return 0
+    # Eén taak per proces; de pool start pas processen als er werk is
+    for future in [pool.submit(os.getpid) for _ in range(_shared_size)]:
+        future.result()
+    return _shared_size
+
+
+def shutdown_pool():
+    """Stop de gedeelde pool (bij het afsluiten van de server)"""
+    global _shared_pool
+    with _pool_lock:
+        pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_shared(fn: Callable, calls: List[Tuple], cancel_token: CancelToken) -> List[Any]:
+    global _shared_pool
+    pool = shared_pool()
+    with _pool_lock:
+        flags = _shared_flags
+        slot = _free_slots.pop() if _free_slots else -1
+        if slot >= 0:
+            flags[slot] = 0
+    try:
+        return _submit_all(pool, fn, calls, cancel_token, flags, slot, lambda: _release_slot(flags, slot))
+    except BrokenProcessPool:
+        # Een proces is gecrasht: volgende aanroep krijgt een nieuwe pool
+        with _pool_lock:
+            if _shared_pool is pool:
+                _shared_pool = None
+        raise
+
+
+def _release_slot(flags, slot: int):
+    """Slot weer vrij (pas als alle taken erop klaar zijn, ook na annuleren)"""
+    if slot < 0:
+        return
+    with _pool_lock:
+        if flags is _shared_flags:
+            flags[slot] = 0
+            _free_slots.append(slot)
@@ -0,0 +1,220 @@
+"""
+Zaagplan Optimizer - Patroonbibliotheek
+Snijpatronen per (voorraadlengte, kerf, lengteset) bewaard in een LRU
+geheugen en in SQLite
+
+De werkplaats gebruikt elke dag dezelfde handvol voorraadlengtes en
+terugkerende onderdeellengtes. Het opsommen van alle patronen hoeft dan
+maar één keer: daarna komen ze uit het geheugen (zelfde proces) of uit
+SQLite (na een herstart of in een andere worker). Bij het opstarten worden
+de vaakst gebruikte families alvast in het geheugen geladen (warm()).
+Daarvoor telt hits in SQLite ook de treffers uit het geheugen mee: die
+worden per proces opgespaard en weggeschreven bij het verdringen uit de
+LRU, elke HITS_FLUSH_INTERVAL seconden en bij het afsluiten (flush_hits()).
+
+Patronen worden opgeslagen op de aflopend gesorteerde lengteset, zodat de
+invoervolgorde niet uitmaakt; bij het ophalen worden de indices omgezet
+naar de volgorde van de aanroeper.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from mip_model import SparsePattern
+from metrics import record_cache
+
+# Leeg pad = alleen geheugen, geen SQLite
+DEFAULT_DB_PATH = os.environ.get(
+    "ZAAGPLAN_PATTERNS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "patterns.sqlite")
+)
+
+# Aantal families dat warm() bij het opstarten laadt
+WARM_FAMILIES = int(os.environ.get("ZAAGPLAN_PATTERNS_WARM", "64"))
+
+# Hoe vaak (s) de opgespaarde geheugentreffers naar SQLite gaan
+HITS_FLUSH_INTERVAL = 60.0
+
+# generate(lengtes, voorraadlengte, max_patterns) -> patronen
+PatternGenerator = Callable[[List[float], float, int], List[SparsePattern]]
+
+
+def family_key(stock_length: float, kerf: float, lengths: Sequence[float], max_patterns: int) -> str:
+    """Sleutel van een patroonfamilie (lengtes aflopend gesorteerd)"""
+    return json.dumps([float(stock_length), float(kerf), int(max_patterns), sorted(map(float, lengths), reverse=True)])
+
+
+class PatternStore:
+    """
+    Patroonfamilies in een LRU geheugen met SQLite eronder
+
+    Thread-safe: het geheugen zit achter een lock, SQLite gebruikt één
+    verbinding per operatie (zoals RemnantStore).
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, max_families: int = 512):
+        self.path = path
+        self.max_families = max_families
+        self._memory: "OrderedDict[str, List[SparsePattern]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}  # Geheugentreffers, nog niet in SQLite
+        self._flushed_at = time.time()
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS pattern_families (
+                    key TEXT PRIMARY KEY,
+                    patterns TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pattern_families_hits
+                    ON pattern_families (hits DESC);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def patterns(
+        self,
+        stock_length: float,
+        kerf: float,
+        lengths: List[float],
+        max_patterns: int,
+        generate: PatternGenerator
+    ) -> Tuple[List[SparsePattern], bool]:
+        """
+        Patronen voor deze voorraadlengte en lengtes (indices in de volgorde van lengths)
+
+        Returns:
+            (patronen, uit cache)
+        """
+        ordered = sorted(lengths, reverse=True)
+        key = family_key(stock_length, kerf, ordered, max_patterns)
+
+        stored = self._get_memory(key)
+        cached = stored is not None
+        if not cached:
+            stored = self._get_disk(key)
+            cached = stored is not None
+            if not cached:
+                stored = generate(ordered, stock_length, max_patterns)
+                self._put_disk(key, stored)
+            self._put_memory(key, stored)
+
+        if ordered == list(lengths):
+            return stored, cached
+        position = {length: i for i, length in enumerate(lengths)}
+        remap = [position[length] for length in ordered]
+        return [tuple(sorted((remap[j], count) for j, count in p)) for p in stored], cached
+
+    def warm(self, limit: int = WARM_FAMILIES) -> int:
+        """Laad de vaakst gebruikte families in het geheugen, geeft het aantal terug"""
+        if not self.path or limit <= 0:
+            return 0
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, patterns FROM pattern_families ORDER BY hits DESC, used_at DESC LIMIT ?",
+                (min(limit, self.max_families),)
+            ).fetchall()
+        # Minst gebruikte eerst, zodat de populairste het laatst uit de LRU vallen
+        for key, patterns in reversed(rows):
+            self._put_memory(key, _decode(patterns))
+        return len(rows)
+
+    def clear_memory(self):
+        self.flush_hits()
+        with self._lock:
+            self._memory.clear()
+
+    def flush_hits(self) -> int:
+        """Schrijf de opgespaarde geheugentreffers naar hits in SQLite, geeft het aantal terug"""
+        with self._lock:
+            hits, self._hits = self._hits, {}
+            self._flushed_at = time.time()
+        if not hits:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE pattern_families SET hits = hits + ?, used_at = MAX(used_at, ?) WHERE key = ?",
+                [(count, self._flushed_at, key) for key, count in hits.items()]
+            )
+        return sum(hits.values())
+
+    def _get_memory(self, key: str) -> Optional[List[SparsePattern]]:
+        with self._lock:
+            stored = self._memory.get(key)
+            if stored is not None:
+                self._memory.move_to_end(key)
+                if self.path:
+                    self._hits[key] = self._hits.get(key, 0) + 1
+            flush = bool(self._hits) and time.time() - self._flushed_at > HITS_FLUSH_INTERVAL
+        record_cache("patterns_memory", stored is not None)
+        if flush:
+            self.flush_hits()
+        return stored
+
+    def _put_memory(self, key: str, patterns: List[SparsePattern]):
+        with self._lock:
+            self._memory[key] = patterns
+            self._memory.move_to_end(key)
+            evicted = False
+            while len(self._memory) > self.max_families:
+                dropped, _ = self._memory.popitem(last=False)
+                evicted = evicted or dropped in self._hits
+        # Verdrongen families houden hun treffers (anders warmt warm() ze nooit meer op)
+        if evicted:
+            self.flush_hits()
+
+    def _get_disk(self, key: str) -> Optional[List[SparsePattern]]:
+        if not self.path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT patterns FROM pattern_families WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE pattern_families SET hits = hits + 1, used_at = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+        record_cache("patterns_disk", row is not None)
+        return _decode(row[0]) if row is not None else None
+
+    def _put_disk(self, key: str, patterns: List[SparsePattern]):
+        if not self.path:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO pattern_families (key, patterns, created_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(patterns), now, now)
+            )
+
+
+def _decode(data: str) -> List[SparsePattern]:
+    return [tuple((j, count) for j, count in pattern) for pattern in json.loads(data)]
+
+
+_default_store: Optional[PatternStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> PatternStore:
+    """Gedeelde bibliotheek van dit proces (lazy, ook in worker processen)"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = PatternStore()
+        return _default_store
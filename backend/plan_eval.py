@@ -0,0 +1,121 @@
+"""
+Zaagplan Optimizer - Planevaluatie
+Eén rekenmodel voor zaagsneden, trim en reststukken, voor alle algoritmes
+en de statistieken
+
+Een lat van lengte L met stukken l1..ln (in zaagvolgorde):
+- trim: het begin van de lat wordt haaks gezaagd; dat kost trim + kerf
+  (alleen als trim > 0 en er iets op de lat staat)
+- tussen twee stukken zit één zaagsnede (kerf)
+- past als trim + kerf + Σl + (n - 1) · kerf <= L ("kern")
+- na het laatste stuk volgt nog één zaagsnede om het reststuk los te
+  zagen; eindigt het laatste stuk binnen één kerf van het eind, dan
+  verdwijnt dat restje in de zaagsnede
+- reststuk (waste): L - kern - kerf, of 0 als dat negatief is
+
+De scalaire methodes zijn voor de binnenste lussen van de greedy
+algoritmes; evaluate() en evaluate_plans() rekenen hele resultaten in
+één keer met NumPy.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import TYPE_CHECKING, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from optimizer_1d import CutPlan
+
+EPS = 1e-6
+
+
+@dataclass(frozen=True)
+class KerfModel:
+    """Zaagsnede en trim; bepaalt wat er op een lat past en wat er overblijft"""
+    kerf: float = 0.0
+    trim: float = 0.0  # Haaks afzagen van het begin van elke lat (0 = niet)
+
+    @property
+    def lead(self) -> float:
+        """Lengte vóór het eerste stuk: trim plus zijn zaagsnede"""
+        return self.trim + self.kerf if self.trim > 0 else 0.0
+
+    def need(self, length: float, count: int) -> float:
+        """Ruimte die een stuk kost op een lat waar al count stukken op staan"""
+        return length + (self.kerf if count else self.lead)
+
+    def core(self, total: float, count: int) -> float:
+        """Benodigde lengte voor count stukken met totale lengte total"""
+        return self.lead + total + (count - 1) * self.kerf if count else 0.0
+
+    def capacity(self, stock_length: float) -> float:
+        """
+        Ruimte voor stukken zonder trim: k stukken passen als
+        Σl + (k - 1) · kerf <= capacity (zoals zonder trim op lengte L)
+        """
+        return stock_length - self.lead
+
+    def offcut(self, rest: float) -> float:
+        """Reststuk na de laatste zaagsnede; rest = L - kern van een gevulde lat"""
+        return rest - self.kerf if rest > self.kerf + EPS else 0.0
+
+    def evaluate(
+        self,
+        stock_lengths: np.ndarray,
+        totals: np.ndarray,
+        counts: np.ndarray
+    ) -> "PlanEvaluation":
+        """Evalueer latten met totale stuklengte en aantal stukken per lat"""
+        stock_lengths = np.asarray(stock_lengths, dtype=float)
+        totals = np.asarray(totals, dtype=float)
+        counts = np.asarray(counts)
+        filled = counts > 0
+        core = np.where(filled, self.lead + totals + np.maximum(counts - 1, 0) * self.kerf, 0.0)
+        rest = stock_lengths - core
+        offcut = np.where(filled, np.where(rest > self.kerf + EPS, rest - self.kerf, 0.0), stock_lengths)
+        return PlanEvaluation(
+            stock_lengths=stock_lengths,
+            totals=totals,
+            used=stock_lengths - offcut,
+            offcut=offcut,
+            valid=rest >= -EPS
+        )
+
+    def evaluate_plans(self, plans: Sequence["CutPlan"]) -> "PlanEvaluation":
+        """Evalueer een heel resultaat (lijst van CutPlans)"""
+        counts = np.fromiter((len(p.cuts) for p in plans), dtype=np.int64, count=len(plans))
+        lengths = np.fromiter((c[1] for p in plans for c in p.cuts), dtype=float, count=int(counts.sum()))
+        totals = np.bincount(np.repeat(np.arange(len(plans)), counts), weights=lengths, minlength=len(plans))
+        stock_lengths = np.fromiter((p.stock_length for p in plans), dtype=float, count=len(plans))
+        return self.evaluate(stock_lengths, totals, counts)
+
+
+@dataclass
+class PlanEvaluation:
+    """Uitkomst per lat (arrays in planvolgorde)"""
+    stock_lengths: np.ndarray
+    totals: np.ndarray   # Som van de stuklengtes
+    used: np.ndarray     # Stukken, zaagsneden en trim
+    offcut: np.ndarray   # Reststuk na de laatste zaagsnede
+    valid: np.ndarray    # Alle stukken passen op de lat
+
+    @property
+    def total_stock_length(self) -> float:
+        return float(self.stock_lengths.sum())
+
+    @property
+    def total_waste(self) -> float:
+        """Som van de reststukken"""
+        return float(self.offcut.sum())
+
+    @property
+    def kerf_loss(self) -> float:
+        """Lengte die in zaagsneden en trim verdwijnt"""
+        return float((self.used - self.totals).sum())
+
+    @property
+    def waste_percentage(self) -> float:
+        total = self.total_stock_length
+        return self.total_waste / total * 100 if total > 0 else 0.0
@@ -0,0 +1,115 @@
+"""
+Zaagplan Optimizer - Plan opslag
+Bewaart recente 1D zaagplannen zodat kleine wijzigingen incrementeel
+her-geoptimaliseerd kunnen worden
+
+Met een pad (ZAAGPLAN_PLANS_DB) staan de plannen ook in SQLite, zodat
+elke worker van een multi-worker server het plan van een andere worker
+terugvindt. Het geheugen blijft een LRU vóór de database.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from collections import OrderedDict
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from optimizer_1d import Part, Stock, OptimizationResult, SplitPolicy
+
+# Leeg = alleen in het geheugen van dit proces
+DEFAULT_DB_PATH = os.environ.get("ZAAGPLAN_PLANS_DB", "")
+
+
+@dataclass
+class PlanRecord:
+    """Alles wat nodig is om een plan later te repareren"""
+    plan_id: str
+    parts: List[Part]
+    stocks: List[Stock]
+    kerf: float
+    algorithm: str
+    max_split_parts: int
+    joint_allowance: float
+    result: OptimizationResult
+    origin: Dict[str, Tuple[str, str]]  # {stuk_id: (onderdeel_id, item_id)}
+    split_policy: SplitPolicy = SplitPolicy.MAX_REST
+    trim: float = 0.0  # Trim aan het begin van elke lat (zie plan_eval.py)
+
+
+class PlanStore:
+    """In-memory LRU opslag van recente plannen, optioneel gedeeld via SQLite"""
+
+    def __init__(self, max_plans: int = 256, path: str = DEFAULT_DB_PATH, max_stored: int = 4096):
+        self.max_plans = max_plans
+        self.path = path
+        self.max_stored = max_stored
+        self._plans: "OrderedDict[str, PlanRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS plans (
+                    plan_id TEXT PRIMARY KEY,
+                    record BLOB NOT NULL,
+                    used_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_plans_used ON plans (used_at);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex[:16]
+
+    def put(self, record: PlanRecord):
+        self._remember(record)
+        if not self.path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (plan_id, record, used_at) VALUES (?, ?, ?)",
+                (record.plan_id, pickle.dumps(record, pickle.HIGHEST_PROTOCOL), time.time())
+            )
+            # Oudste plannen opruimen
+            conn.execute(
+                "DELETE FROM plans WHERE plan_id NOT IN "
+                "(SELECT plan_id FROM plans ORDER BY used_at DESC LIMIT ?)",
+                (self.max_stored,)
+            )
+
+    def get(self, plan_id: str) -> Optional[PlanRecord]:
+        with self._lock:
+            record = self._plans.get(plan_id)
+            if record is not None:
+                self._plans.move_to_end(plan_id)
+                return record
+        if not self.path:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT record FROM plans WHERE plan_id = ?", (plan_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE plans SET used_at = ? WHERE plan_id = ?", (time.time(), plan_id))
+        record = pickle.loads(row[0])
+        self._remember(record)
+        return record
+
+    def _remember(self, record: PlanRecord):
+        with self._lock:
+            self._plans[record.plan_id] = record
+            self._plans.move_to_end(record.plan_id)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
@@ -0,0 +1,128 @@
+"""
+Zaagplan Optimizer - Profiling
+Opt-in tijdsmeting per fase (perf_counter_ns) en tellers voor tuning
+
+Standaard gebruiken de optimizers NULL_PROFILER: span() geeft een gedeelde
+lege context manager terug en count() doet niets, dus zonder profiling
+kost het vrijwel niets.
+
+Met een Profiler komt er per fase een span (start, duur, diepte) en per
+teller een totaal bij, terug te vinden onder de "profile" key van het
+resultaat. Optioneel ook een cProfile (.pstats) en een Chrome trace
+(.trace.json, te openen in chrome://tracing of Perfetto).
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Dict, List, Optional, Tuple
+from contextlib import contextmanager, nullcontext
+import cProfile
+import json
+import os
+import time
+
+# Map voor pstats/trace bestanden; leeg = niet wegschrijven
+PROFILE_DIR = os.environ.get("ZAAGPLAN_PROFILE_DIR", "")
+
+
+class NullProfiler:
+    """Profiler die niets meet (standaard)"""
+    enabled = False
+
+    def span(self, name: str):
+        return _NULL_SPAN
+
+    def count(self, name: str, amount: int = 1):
+        pass
+
+    def to_dict(self) -> Optional[dict]:
+        return None
+
+
+_NULL_SPAN = nullcontext()
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler:
+    """
+    Meet spans per fase en tellers
+
+    Spans mogen genest worden; de fasetotalen tellen per naam alle
+    aanroepen op, dus een fase die in een lus draait verschijnt één keer
+    met het aantal aanroepen.
+    """
+    enabled = True
+
+    def __init__(self, cprofile: bool = False):
+        self.start_ns = time.perf_counter_ns()
+        self.spans: List[Tuple[str, int, int, int]] = []  # (naam, start, duur, diepte)
+        self.counters: Dict[str, int] = {}
+        self._depth = 0
+        self._cprofile = cProfile.Profile() if cprofile else None
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter_ns()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.spans.append((name, start - self.start_ns, time.perf_counter_ns() - start, self._depth))
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def stop(self):
+        """Stop cProfile (spans en tellers blijven werken)"""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def to_dict(self) -> dict:
+        phases: Dict[str, dict] = {}
+        for name, _, duration, _ in self.spans:
+            phase = phases.setdefault(name, {"ms": 0.0, "calls": 0})
+            phase["ms"] += duration / 1e6
+            phase["calls"] += 1
+        return {
+            "total_ms": round((time.perf_counter_ns() - self.start_ns) / 1e6, 3),
+            "phases": {name: {"ms": round(p["ms"], 3), "calls": p["calls"]} for name, p in phases.items()},
+            "spans": [
+                {"name": name, "start_ms": round(start / 1e6, 3), "ms": round(duration / 1e6, 3), "depth": depth}
+                for name, start, duration, depth in sorted(self.spans, key=lambda s: s[1])
+            ],
+            "counters": dict(self.counters),
+        }
+
+    def chrome_trace(self) -> dict:
+        """Spans als Chrome trace events (microseconden)"""
+        pid = os.getpid()
+        events = [
+            {"name": name, "ph": "X", "ts": start / 1e3, "dur": duration / 1e3, "pid": pid, "tid": 0}
+            for name, start, duration, _ in self.spans
+        ]
+        end = (time.perf_counter_ns() - self.start_ns) / 1e3
+        events.extend(
+            {"name": name, "ph": "C", "ts": end, "pid": pid, "tid": 0, "args": {name: value}}
+            for name, value in self.counters.items()
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, directory: str, stem: str) -> Dict[str, str]:
+        """
+        Schrijf de Chrome trace (en het cProfile, indien actief) weg
+
+        Returns:
+            {"trace": pad, "pstats": pad}
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = {"trace": os.path.join(directory, f"{stem}.trace.json")}
+        with open(paths["trace"], "w") as f:
+            json.dump(self.chrome_trace(), f)
+        if self._cprofile is not None:
+            self.stop()
+            paths["pstats"] = os.path.join(directory, f"{stem}.pstats")
+            self._cprofile.dump_stats(paths["pstats"])
+        return paths
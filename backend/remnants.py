@@ -0,0 +1,279 @@
+"""
+Zaagplan Optimizer - Reststukken voorraad
+Bruikbare reststukken uit eerdere zaagplannen, opgeslagen in SQLite
+
+Reststukken boven een minimale lengte gaan terug in het rek. Bij een
+volgende optimalisatie worden ze als goedkope voorraad aangeboden
+(via Stock.cost), zodat er minder nieuwe latten aangesneden worden.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import List, Dict, Tuple, Optional
+from dataclasses import dataclass
+import os
+import sqlite3
+import time
+
+from optimizer_1d import Stock, OptimizationResult
+
+DEFAULT_DB_PATH = os.environ.get(
+    "ZAAGPLAN_REMNANTS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "remnants.sqlite")
+)
+
+# Voorraad-id's van reststukken: rest_<lengte> of rest_<profiel>_<lengte>
+REMNANT_PREFIX = "rest_"
+
+
+@dataclass
+class Remnant:
+    """Een reststuk in het rek"""
+    id: int
+    length: float
+    profile: str = ""       # Profiel/materiaal, '' = niet gespecificeerd
+    source: str = ""        # Voorraad-id waar het reststuk uit komt
+    created_at: float = 0.0
+
+
+class RemnantStore:
+    """
+    Persistente reststukken voorraad
+
+    Beschikbare reststukken staan in een partiële index op (profile, length),
+    zodat zoeken op minimale lengte ook met duizenden reststukken snel blijft.
+    Gebruikte reststukken worden gemarkeerd (consumed_at), niet verwijderd.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS remnants (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    profile TEXT NOT NULL DEFAULT '',
+                    length REAL NOT NULL,
+                    source TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    consumed_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_remnants_available
+                    ON remnants (profile, length) WHERE consumed_at IS NULL;
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Eén verbinding per operatie: veilig vanuit de FastAPI threadpool
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, length: float, profile: str = "", source: str = "") -> int:
+        """Voeg één reststuk toe, geeft het id terug"""
+        return self.add_many([(length, source)], profile)[0]
+
+    def add_many(self, items: List[Tuple[float, str]], profile: str = "") -> List[int]:
+        """Voeg reststukken toe als (lengte, bron) paren"""
+        now = time.time()
+        ids = []
+        with self._connect() as conn:
+            for length, source in items:
+                cursor = conn.execute(
+                    "INSERT INTO remnants (profile, length, source, created_at) VALUES (?, ?, ?, ?)",
+                    (profile, length, source, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def available(
+        self,
+        profile: str = "",
+        min_length: float = 0.0,
+        limit: Optional[int] = None
+    ) -> List[Remnant]:
+        """Beschikbare reststukken vanaf min_length, kortste eerst"""
+        query = (
+            "SELECT id, length, profile, source, created_at FROM remnants "
+            "WHERE consumed_at IS NULL AND profile = ? AND length >= ? "
+            "ORDER BY length, id"
+        )
+        params: tuple = (profile, min_length)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [Remnant(*row) for row in rows]
+
+    def consume(self, ids: List[int]) -> List[int]:
+        """
+        Markeer reststukken als gebruikt
+
+        Returns:
+            De id's die echt gemarkeerd zijn (een gelijktijdige request kan
+            een reststuk al gebruikt hebben)
+        """
+        now = time.time()
+        consumed = []
+        with self._connect() as conn:
+            for remnant_id in ids:
+                cursor = conn.execute(
+                    "UPDATE remnants SET consumed_at = ? WHERE id = ? AND consumed_at IS NULL",
+                    (now, remnant_id)
+                )
+                if cursor.rowcount:
+                    consumed.append(remnant_id)
+        return consumed
+
+    def reserve(self, wanted: List[Tuple[int, float, str]]) -> Tuple[List[int], List[int]]:
+        """
+        Boek de reststukken van één zaagplan in één transactie af
+
+        Is een gewenst reststuk intussen door een gelijktijdig request
+        gebruikt, dan neemt een ander beschikbaar reststuk van hetzelfde
+        profiel en dezelfde lengte zijn plaats in (het plan blijft gelijk).
+        Lukt dat niet voor alle reststukken, dan wordt niets afgeboekt.
+
+        Args:
+            wanted: (remnant_id, lengte, profiel) per lat uit een reststuk
+
+        Returns:
+            (afgeboekte id's, id's waarvoor geen reststuk meer was); bij
+            conflicten is de eerste lijst leeg
+        """
+        now = time.time()
+        used: List[int] = []
+        conflicts: List[int] = []
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for remnant_id, length, profile in wanted:
+                cursor = conn.execute(
+                    "UPDATE remnants SET consumed_at = ? WHERE id = ? AND consumed_at IS NULL",
+                    (now, remnant_id)
+                )
+                if not cursor.rowcount:
+                    row = conn.execute(
+                        "SELECT id FROM remnants WHERE consumed_at IS NULL AND profile = ? AND length = ? "
+                        "ORDER BY id LIMIT 1",
+                        (profile, length)
+                    ).fetchone()
+                    if row is None:
+                        conflicts.append(remnant_id)
+                        continue
+                    remnant_id = row[0]
+                    conn.execute("UPDATE remnants SET consumed_at = ? WHERE id = ?", (now, remnant_id))
+                used.append(remnant_id)
+            conn.execute("ROLLBACK" if conflicts else "COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return ([] if conflicts else used), conflicts
+
+    def delete(self, remnant_id: int) -> bool:
+        """Verwijder een reststuk (bv. afgekeurd of weggegooid)"""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM remnants WHERE id = ?", (remnant_id,))
+            return cursor.rowcount > 0
+
+
+# ============ OPTIMIZER KOPPELING ============
+
+def offer_remnants(
+    store: RemnantStore,
+    min_length: float,
+    profile: str = "",
+    cost: float = 0.1,
+    max_types: int = 50
+) -> Tuple[List[Stock], Dict[str, List[int]]]:
+    """
+    Bied beschikbare reststukken aan als voorraad
+
+    Reststukken met dezelfde lengte worden één Stock met quantity = aantal,
+    zodat duizenden reststukken geen duizenden voorraadtypes (en patronen)
+    opleveren. Alleen de max_types kortste lengtes vanaf min_length worden
+    aangeboden.
+
+    Args:
+        store: Reststukken voorraad
+        min_length: Kortste zinvolle lengte (meestal het kortste onderdeel)
+        profile: Profiel/materiaal
+        cost: Kosten per reststuk (nieuwe latten kosten standaard 1.0)
+        max_types: Maximaal aantal verschillende lengtes
+
+    Returns:
+        (voorraad, {stock_id: [remnant_id, ...]})
+    """
+    by_length: Dict[float, List[int]] = {}
+    for remnant in store.available(profile, min_length):
+        if remnant.length not in by_length and len(by_length) >= max_types:
+            break
+        by_length.setdefault(remnant.length, []).append(remnant.id)
+
+    stocks = []
+    remnant_ids: Dict[str, List[int]] = {}
+    for length, ids in by_length.items():
+        stock_id = f"{REMNANT_PREFIX}{profile}_{length:g}" if profile else f"{REMNANT_PREFIX}{length:g}"
+        stocks.append(Stock(
+            id=stock_id,
+            length=length,
+            quantity=len(ids),
+            cost=cost,
+            label=f"Reststuk {length:g}mm",
+            profile=profile
+        ))
+        remnant_ids[stock_id] = ids
+    return stocks, remnant_ids
+
+
+def apply_result(
+    store: RemnantStore,
+    result: OptimizationResult,
+    remnant_ids: Dict[str, List[int]],
+    min_length: Optional[float] = None,
+    profile: str = ""
+) -> Dict[str, List[int]]:
+    """
+    Verwerk een zaagplan in de voorraad: gebruikte reststukken afboeken
+    en (als min_length gegeven is) nieuwe reststukken opslaan
+
+    Nieuwe reststukken krijgen het profiel van hun zaagplan; profile is
+    alleen de terugval voor plannen zonder profiel. Het afboeken is
+    atomair (RemnantStore.reserve): zijn er reststukken van het plan
+    intussen door een ander request gebruikt en niet te vervangen, dan
+    verandert er niets en staan ze in "conflicts"; het plan moet dan
+    opnieuw gemaakt worden.
+
+    Returns:
+        {"used": [...], "stored": [...], "conflicts": [...]} met remnant id's
+    """
+    wanted = []
+    pools = {stock_id: list(ids) for stock_id, ids in remnant_ids.items()}
+    for plan in result.plans:
+        pool = pools.get(plan.stock_id)
+        if pool:
+            wanted.append((pool.pop(0), plan.stock_length, plan.profile or profile))
+
+    used, conflicts = store.reserve(wanted)
+    if conflicts:
+        print(f"[REMNANTS] {len(conflicts)} reststukken waren al gebruikt, plan niet verwerkt")
+        return {"used": [], "stored": [], "conflicts": conflicts}
+
+    stored: List[int] = []
+    if min_length is not None:
+        by_profile: Dict[str, List[Tuple[float, str]]] = {}
+        for plan in result.plans:
+            # waste is het reststuk na de laatste zaagsnede (zie plan_eval.py)
+            if plan.waste >= min_length:
+                by_profile.setdefault(plan.profile or profile, []).append(
+                    (round(plan.waste, 1), plan.stock_id)
+                )
+        for plan_profile, items in by_profile.items():
+            stored.extend(store.add_many(items, plan_profile))
+
+    return {"used": used, "stored": stored, "conflicts": []}
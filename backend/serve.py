@@ -0,0 +1,70 @@
+"""
+Zaagplan Optimizer - Productie server
+Start de API met meerdere uvicorn workers
+
+Het aantal workers komt uit ZAAGPLAN_WORKERS (leeg/0 = automatisch: het
+aantal CPU's dat de container mag gebruiken, inclusief cgroup quota).
+Elke worker krijgt een eigen, bij het opstarten gevulde process pool met
+zijn deel van de CPU's, en alle workers delen de SQLite bestanden voor
+patronen, reststukken en plannen (WAL modus), zodat een incrementele
+request bij elke worker terechtkan. Bij meer dan één worker delen ze ook
+de metrics (elke scrape telt alle workers op) en de client quota (de
+grens geldt per client, niet per worker); zie shared_state.py.
+
+uvicorn start de workers als nieuwe processen (spawn): wat serve.py zelf
+importeert, erven ze niet. ZAAGPLAN_PRELOAD_ORTOOLS=1 laadt OR-Tools
+daarom in de lifespan van elke worker en in de initializer van de pool
+processen (zie solvers.py).
+
+Gebruik:
+    python serve.py
+    ZAAGPLAN_WORKERS=8 ZAAGPLAN_PORT=8000 python serve.py
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+
+import uvicorn
+
+from parallel import available_cpus
+
+DATA_DIR = os.environ.get(
+    "ZAAGPLAN_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
+
+
+def web_workers() -> int:
+    """ZAAGPLAN_WORKERS, of één worker per beschikbare CPU"""
+    workers = int(os.environ.get("ZAAGPLAN_WORKERS", "0") or 0)
+    return workers if workers > 0 else available_cpus()
+
+
+def configure(workers: int):
+    """
+    Omgeving voor de workers (uvicorn start ze als nieuwe processen, die
+    deze variabelen erven); expliciet gezette waarden blijven staan
+    """
+    os.environ["ZAAGPLAN_WEB_WORKERS"] = str(workers)
+    os.environ.setdefault("ZAAGPLAN_POOL_PROCESSES", str(max(1, available_cpus() // workers)))
+    os.environ.setdefault("ZAAGPLAN_PLANS_DB", os.path.join(DATA_DIR, "plans.sqlite"))
+    os.environ.setdefault("ZAAGPLAN_PATTERNS_DB", os.path.join(DATA_DIR, "patterns.sqlite"))
+    os.environ.setdefault("ZAAGPLAN_REMNANTS_DB", os.path.join(DATA_DIR, "remnants.sqlite"))
+    if workers > 1:
+        os.environ.setdefault("ZAAGPLAN_METRICS_DB", os.path.join(DATA_DIR, "metrics.sqlite"))
+        os.environ.setdefault("ZAAGPLAN_QUOTA_DB", os.path.join(DATA_DIR, "quota.sqlite"))
+
+
+def main():
+    workers = web_workers()
+    configure(workers)
+    host = os.environ.get("ZAAGPLAN_HOST", "0.0.0.0")
+    port = int(os.environ.get("ZAAGPLAN_PORT", "8000"))
+    print(f"Zaagplan Optimizer: {workers} workers op http://{host}:{port} "
+          f"(pool: {os.environ['ZAAGPLAN_POOL_PROCESSES']} processen per worker)")
+    uvicorn.run("main:app", host=host, port=port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
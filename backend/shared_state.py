@@ -0,0 +1,43 @@
+"""
+Zaagplan Optimizer - Gedeelde toestand
+Toestand die alle uvicorn workers van serve.py moeten zien (metrics en de
+client quota) staat, net als de stores, in een SQLite bestand in WAL
+modus. Dit zijn de gemeenschappelijke stukjes: een verbinding voor
+expliciete transacties en de vraag of een worker nog leeft, zodat de
+rijen van een gecrashte worker niet blijven meetellen.
+
+Alle workers moeten op dezelfde machine draaien (pid's worden vergeleken).
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+import sqlite3
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Verbinding zonder impliciete transacties: de aanroeper begint zelf met
+    BEGIN IMMEDIATE als lezen en schrijven samen atomair moeten zijn
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def process_alive(pid: int) -> bool:
+    """Draait proces pid nog (buiten POSIX: altijd True)"""
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Bestaat, maar van een andere gebruiker
+    return True
@@ -0,0 +1,303 @@
+"""
+Zaagplan Optimizer - Solver backends
+Lost een MipModel (zie mip_model.py) op met een uitwisselbare solver
+
+Backends:
+- cp_sat: OR-Tools CP-SAT, integer-native en multi-threaded
+- scip, highs, cbc: MIP solvers via OR-Tools pywraplp (voor zover
+  meegebouwd in de geïnstalleerde OR-Tools)
+
+OR-Tools wordt pas bij het eerste gebruik geïmporteerd (honderden ms en
+flink wat geheugen); beschikbaarheid wordt goedkoop gepeild via
+importlib. Zo blijven processen die alleen FFD/hybrid draaien klein. Met
+ZAAGPLAN_PRELOAD_ORTOOLS=1 laadt elk proces het vooraf in plaats van bij
+de eerste MIP request: de uvicorn workers in de lifespan van main.py
+(serve.py start ze als nieuwe processen, er valt niets te erven) en de
+processen van run_parallel in hun initializer. Pool processen die na de
+lifespan geforkt worden, hebben het dan al; gespawnde importeren het zelf.
+
+Alle backends krijgen dezelfde tijdslimiet en hetzelfde aantal threads,
+en worden onderbroken (InterruptSolve / StopSearch) als het CancelToken
+geannuleerd wordt. Loopt de tijdslimiet af, dan komt de beste gevonden
+oplossing terug met status FEASIBLE; on_incumbent hoort elke verbetering
+(CP-SAT tijdens het zoeken, pywraplp alleen de eindoplossing).
+Met Solver.AUTO wordt gekozen op modelgrootte: kleine modellen lost SCIP
+sneller op (weinig opstartkosten), grote modellen gaan naar CP-SAT zodra
+er meerdere threads zijn.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+import importlib
+import importlib.util
+import math
+import os
+
+from cancellation import NEVER_CANCELLED, CancelToken
+from mip_model import INF, MipModel, to_pywraplp
+
+# Alleen peilen, niet importeren (zie load_pywraplp / load_cp_model)
+ORTOOLS_AVAILABLE = importlib.util.find_spec("ortools") is not None
+
+# OR-Tools bij het opstarten van elk proces laden (zie preload)
+PRELOAD_ORTOOLS = os.environ.get("ZAAGPLAN_PRELOAD_ORTOOLS", "") == "1"
+
+
+class Solver(Enum):
+    """Beschikbare MIP solvers"""
+    AUTO = "auto"      # Kies op modelgrootte en threads
+    CP_SAT = "cp_sat"  # OR-Tools CP-SAT
+    SCIP = "scip"      # SCIP via pywraplp
+    HIGHS = "highs"    # HiGHS via pywraplp
+    CBC = "cbc"        # CBC via pywraplp
+
+
+# Naam van de backend in pywraplp.Solver.CreateSolver
+PYWRAPLP_NAMES = {
+    Solver.SCIP: "SCIP",
+    Solver.HIGHS: "HIGHS",
+    Solver.CBC: "CBC",
+}
+
+# Vanaf dit aantal variabelen kiest AUTO CP-SAT (mits meer dan één thread)
+CP_SAT_MIN_VARIABLES = 500
+
+# Voorkeursvolgorde voor kleine modellen of één thread
+SMALL_MODEL_ORDER = (Solver.SCIP, Solver.HIGHS, Solver.CBC, Solver.CP_SAT)
+
+
+@dataclass
+class SolveSettings:
+    """Gedeelde instellingen voor alle backends"""
+    time_limit: Optional[float] = None  # Seconden (None = onbeperkt)
+    threads: int = 1
+    seed: int = 0
+
+
+@dataclass
+class SolveOutcome:
+    """Uitkomst van een solve, onafhankelijk van de backend"""
+    solver: str
+    status: str  # OPTIMAL | FEASIBLE | INFEASIBLE | UNBOUNDED | ABNORMAL | NOT_SOLVED
+    values: List[float] = field(default_factory=list)
+    objective: Optional[float] = None
+
+    @property
+    def has_solution(self) -> bool:
+        return self.status in ("OPTIMAL", "FEASIBLE")
+
+
+@lru_cache(maxsize=None)
+def load_pywraplp():
+    """ortools.linear_solver.pywraplp, geïmporteerd bij de eerste aanroep"""
+    return importlib.import_module("ortools.linear_solver.pywraplp")
+
+
+@lru_cache(maxsize=None)
+def load_cp_model():
+    """ortools.sat.python.cp_model, geïmporteerd bij de eerste aanroep"""
+    return importlib.import_module("ortools.sat.python.cp_model")
+
+
+def preload() -> bool:
+    """Importeer OR-Tools nu in dit proces, indien beschikbaar"""
+    if not ORTOOLS_AVAILABLE:
+        return False
+    load_pywraplp()
+    load_cp_model()
+    return True
+
+
+@lru_cache(maxsize=None)
+def solver_available(solver: Solver) -> bool:
+    """Is deze backend in de geïnstalleerde OR-Tools aanwezig"""
+    if not ORTOOLS_AVAILABLE or solver == Solver.AUTO:
+        return False
+    if solver == Solver.CP_SAT:
+        return True
+    return load_pywraplp().Solver.CreateSolver(PYWRAPLP_NAMES[solver]) is not None
+
+
+def available_solvers() -> List[str]:
+    """Namen van de beschikbare backends"""
+    return [s.value for s in Solver if solver_available(s)]
+
+
+def choose_solver(model: MipModel, requested: Solver, threads: int) -> Optional[Solver]:
+    """
+    Kies de backend voor dit model
+
+    Een expliciet gevraagde backend die niet beschikbaar is valt terug op
+    de automatische keuze. None = geen enkele backend beschikbaar.
+    """
+    if requested != Solver.AUTO and solver_available(requested):
+        return requested
+    if (
+        threads > 1
+        and model.num_variables >= CP_SAT_MIN_VARIABLES
+        and solver_available(Solver.CP_SAT)
+    ):
+        return Solver.CP_SAT
+    for solver in SMALL_MODEL_ORDER:
+        if solver_available(solver):
+            return solver
+    return None
+
+
+def solve_model(
+    model: MipModel,
+    solver: Solver = Solver.AUTO,
+    settings: Optional[SolveSettings] = None,
+    cancel_token: CancelToken = NEVER_CANCELLED,
+    on_incumbent: Optional[Callable[[float], object]] = None
+) -> SolveOutcome:
+    """
+    Los het model op met de gekozen (of automatisch gekozen) backend
+
+    on_incumbent(objective) wordt aangeroepen voor elke nieuwe beste
+    oplossing (bij CP-SAT vanuit de zoekthread).
+
+    Returns:
+        SolveOutcome; zonder beschikbare backend status NOT_SOLVED
+
+    Raises:
+        SolveCancelled: als het token tijdens het oplossen geannuleerd is
+    """
+    settings = settings or SolveSettings()
+    chosen = choose_solver(model, solver, settings.threads)
+    if chosen is None:
+        return SolveOutcome(solver="", status="NOT_SOLVED")
+    cancel_token.check()
+    if chosen == Solver.CP_SAT:
+        outcome = _solve_cp_sat(model, settings, cancel_token, on_incumbent)
+    else:
+        outcome = _solve_pywraplp(model, chosen, settings, cancel_token)
+        if on_incumbent is not None and outcome.has_solution:
+            on_incumbent(outcome.objective)
+    cancel_token.check()
+    return outcome
+
+
+# ============ PYWRAPLP ============
+
+def _solve_pywraplp(
+    model: MipModel,
+    solver: Solver,
+    settings: SolveSettings,
+    cancel_token: CancelToken
+) -> SolveOutcome:
+    pywraplp = load_pywraplp()
+    mip = pywraplp.Solver.CreateSolver(PYWRAPLP_NAMES[solver])
+    x = to_pywraplp(model, mip)
+    if settings.threads > 1:
+        mip.SetNumThreads(settings.threads)  # Niet elke backend ondersteunt dit
+    if settings.time_limit is not None:
+        mip.SetTimeLimit(int(max(settings.time_limit, 0.1) * 1000))
+
+    with cancel_token.on_cancel(mip.InterruptSolve):
+        status = pywraplp_status(mip.Solve())
+    if status not in ("OPTIMAL", "FEASIBLE"):
+        return SolveOutcome(solver=solver.value, status=status)
+    return SolveOutcome(
+        solver=solver.value,
+        status=status,
+        values=[var.solution_value() for var in x],
+        objective=mip.Objective().Value()
+    )
+
+
+@lru_cache(maxsize=None)
+def _pywraplp_status_names() -> Dict[int, str]:
+    solver = load_pywraplp().Solver
+    return {
+        solver.OPTIMAL: "OPTIMAL",
+        solver.FEASIBLE: "FEASIBLE",
+        solver.INFEASIBLE: "INFEASIBLE",
+        solver.UNBOUNDED: "UNBOUNDED",
+        solver.ABNORMAL: "ABNORMAL",
+        solver.NOT_SOLVED: "NOT_SOLVED",
+    }
+
+
+def pywraplp_status(status: int) -> str:
+    """Naam van een pywraplp status (OPTIMAL, FEASIBLE, ...)"""
+    return _pywraplp_status_names().get(status, "ABNORMAL")
+
+
+@lru_cache(maxsize=None)
+def _cp_sat_status_names() -> Dict[int, str]:
+    cp_model = load_cp_model()
+    return {
+        cp_model.OPTIMAL: "OPTIMAL",
+        cp_model.FEASIBLE: "FEASIBLE",
+        cp_model.INFEASIBLE: "INFEASIBLE",
+        cp_model.MODEL_INVALID: "ABNORMAL",
+        cp_model.UNKNOWN: "NOT_SOLVED",
+    }
+
+
+# ============ CP-SAT ============
+
+# CP-SAT eist eindige domeinen; alleen voor variabelen zonder bovengrens
+CP_SAT_MAX_BOUND = 10**6
+
+
+def _solve_cp_sat(
+    model: MipModel,
+    settings: SolveSettings,
+    cancel_token: CancelToken,
+    on_incumbent: Optional[Callable[[float], object]] = None
+) -> SolveOutcome:
+    """
+    CP-SAT werkt met gehele coëfficiënten en grenzen; de kosten mogen
+    fractioneel zijn (reststukken) en gaan als float objective mee
+    """
+    cp_model = load_cp_model()
+    cp = cp_model.CpModel()
+    x = [
+        cp.NewIntVar(0, CP_SAT_MAX_BOUND if upper == INF else int(upper), f"x_{i}")
+        for i, upper in enumerate(model.upper)
+    ]
+
+    for row in model.rows:
+        expr = cp_model.LinearExpr.WeightedSum([x[i] for i in row.indices], [int(c) for c in row.coefs])
+        if row.lower != -INF:
+            cp.Add(expr >= math.ceil(row.lower))
+        if row.upper != INF:
+            cp.Add(expr <= math.floor(row.upper))
+
+    cp.Minimize(cp_model.LinearExpr.WeightedSum(x, model.costs))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = max(1, settings.threads)
+    solver.parameters.random_seed = settings.seed
+    if settings.time_limit is not None:
+        solver.parameters.max_time_in_seconds = max(settings.time_limit, 0.1)
+
+    callback = _incumbent_callback(on_incumbent) if on_incumbent is not None else None
+    with cancel_token.on_cancel(solver.StopSearch):
+        status = _cp_sat_status_names().get(solver.Solve(cp, callback), "ABNORMAL")
+    if status not in ("OPTIMAL", "FEASIBLE"):
+        return SolveOutcome(solver=Solver.CP_SAT.value, status=status)
+    return SolveOutcome(
+        solver=Solver.CP_SAT.value,
+        status=status,
+        values=[solver.Value(var) for var in x],
+        objective=solver.ObjectiveValue()
+    )
+
+
+def _incumbent_callback(on_incumbent: Callable[[float], object]):
+    """CpSolverSolutionCallback die on_incumbent aanroept per nieuwe oplossing"""
+    cp_model = load_cp_model()
+
+    class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+        def on_solution_callback(self):
+            on_incumbent(self.ObjectiveValue())
+
+    return IncumbentCallback()
+
@@ -0,0 +1,31 @@
+"""
+Zaagplan Optimizer - Test instellingen
+De stores lezen hun paden bij het importeren; daarom worden ze hier, vóór
+elke import van de backend, naar een tijdelijke map (of het geheugen)
+gezet, zodat de tests nooit de echte data/ bestanden aanraken.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+_DATA = tempfile.mkdtemp(prefix="zaagplan-tests-")
+os.environ["ZAAGPLAN_REMNANTS_DB"] = os.path.join(_DATA, "remnants.sqlite")
+os.environ["ZAAGPLAN_PATTERNS_DB"] = ""
+os.environ["ZAAGPLAN_PLANS_DB"] = ""
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient op de echte app"""
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,73 @@
+"""
+Tests voor admission.py: kostenmodel per MIP model en toelating van
+incrementele requests
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from admission import ClientQuota, RequestSize, decide, estimate_seconds, greedy_work
+from optimizer_1d import Algorithm, Formulation
+
+
+def test_ordinary_cut_list_is_not_downgraded():
+    # Twintig lengtes op één latlengte: het patroonmodel, ruim binnen de grens
+    size = RequestSize(pieces=120, distinct_lengths=20, stock_types=1, stock_lengths=1)
+    decision = decide(Algorithm.ORTOOLS_OPTIMAL, size)
+
+    assert decision.accepted and decision.algorithm == Algorithm.ORTOOLS_OPTIMAL
+    assert not decision.warnings
+
+
+def test_estimate_depends_on_the_formulation():
+    size = RequestSize(pieces=120, distinct_lengths=20, stock_types=2, stock_lengths=2)
+    arc_flow = estimate_seconds(Algorithm.ORTOOLS_OPTIMAL, size)
+    patterns = estimate_seconds(Algorithm.ORTOOLS_OPTIMAL, size, formulation=Formulation.PATTERNS)
+
+    assert arc_flow == estimate_seconds(Algorithm.ORTOOLS_OPTIMAL, size, formulation=Formulation.ARC_FLOW)
+    assert arc_flow > patterns
+    assert estimate_seconds(Algorithm.ORTOOLS_OPTIMAL, size, time_limit=5) <= 5 + estimate_seconds(Algorithm.FFD, size)
+
+
+def test_slow_arc_flow_is_downgraded_and_repairs_are_not():
+    size = RequestSize(pieces=400, distinct_lengths=60, stock_types=2, stock_lengths=2)
+    decision = decide(Algorithm.ORTOOLS_OPTIMAL, size)
+    assert decision.accepted and decision.algorithm != Algorithm.ORTOOLS_OPTIMAL
+
+    assert decide(Algorithm.HYBRID, size, max_seconds=0.0, downgrade=False).status_code == 413
+
+
+def test_incremental_request_uses_the_client_quota(client, monkeypatch):
+    import main
+    body = {
+        "parts": [{"id": "a", "length": 1200, "quantity": 3}],
+        "stocks": [{"id": "s", "length": 6000}],
+        "algorithm": "ffd",
+    }
+    plan_id = client.post("/optimize/1d", json=body).json()["plan_id"]
+    change = {"previous_plan_id": plan_id, "add_parts": [{"id": "a", "length": 1200, "quantity": 1}]}
+    assert client.post("/optimize/1d/incremental", json=change).status_code == 200
+
+    quota = ClientQuota(1, "")
+    monkeypatch.setattr(main, "client_quota", quota)
+    with quota.slot("bezet"):
+        response = client.post("/optimize/1d/incremental", json=change, headers={"X-Client-Id": "bezet"})
+    assert response.status_code == 429
+
+
+def test_calibration_recovers_the_cost_model():
+    from loadtest import fit_constants
+
+    def row(series, seconds, pieces=50, distinct=10, stock_types=1, formulation=""):
+        return {
+            "series": series, "formulation": formulation, "fallback": "", "censored": False,
+            "pieces": pieces, "distinct_lengths": distinct, "stock_types": stock_types, "seconds": seconds,
+        }
+
+    rows = [row("ffd", 2e-6 * greedy_work(n, 2) + 0.01, pieces=n, stock_types=2) for n in (10, 100, 1000)]
+    rows += [row("arc_flow", 0.01 * 1.5 ** d, distinct=d, formulation="arc_flow") for d in (4, 8, 12)]
+    constants = fit_constants(rows)
+
+    assert abs(constants["GREEDY_SECONDS_PER_STEP"] - 2e-6) < 1e-9
+    assert abs(constants["GREEDY_BASE_SECONDS"] - 0.01) < 1e-6
+    assert abs(constants["ARC_FLOW_GROWTH"] - 1.5) < 1e-9
+    assert "EXACT_GROWTH" not in constants
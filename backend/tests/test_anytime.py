@@ -0,0 +1,30 @@
+"""
+Tests voor het anytime gedrag van Optimizer1D: een aangeboden plan blijft
+ongewijzigd terwijl de local search doorwerkt
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import copy
+
+from optimizer_1d import Algorithm, Optimizer1D, Part, Stock
+
+
+def test_published_plans_do_not_share_cuts_with_the_search():
+    optimizer = Optimizer1D(kerf=3)
+    stock = Stock("lat", 6000, -1)
+    bins = [(stock, [("a", 2000), ("b", 2000)]), (stock, [("c", 1500)])]
+    plans = optimizer._bins_to_plans(bins)
+    published = copy.deepcopy(plans)
+
+    bins[1][1].append(bins[0][1].pop())  # Zoals _eliminate_bins een stuk verplaatst
+    assert [p.cuts for p in plans] == [p.cuts for p in published]
+
+
+def test_deadline_result_is_the_incumbent_as_offered():
+    parts = [Part("a", 2400, 4), Part("b", 1800, 6), Part("c", 950, 9), Part("d", 420, 12)]
+    optimizer = Optimizer1D(kerf=3, validate=True)
+    result = optimizer.optimize(parts, [Stock("lat", 6000, -1), Stock("kort", 4000, -1)], Algorithm.FFD, time_limit=1)
+
+    assert result.validation.valid, result.validation.errors
+    assert sum(len(p.cuts) for p in result.plans) == 31
@@ -0,0 +1,53 @@
+"""
+Tests voor de arc-flow formulering: EXACT, patronen en arc-flow zijn het
+over het aantal latten eens
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import pytest
+
+from optimizer_1d import Algorithm, Formulation, Optimizer1D, Part, Stock
+from solvers import ORTOOLS_AVAILABLE
+
+needs_ortools = pytest.mark.skipif(not ORTOOLS_AVAILABLE, reason="OR-Tools niet geïnstalleerd")
+
+
+# Klein genoeg om door elk exact algoritme optimaal opgelost te worden
+AGREEMENT_INSTANCES = {
+    "een_lengte": (
+        [Part("a", 2150, 3), Part("b", 1630, 5), Part("c", 1210, 4), Part("d", 870, 6), Part("e", 415, 7)],
+        [Stock("lat", 6000, -1)],
+    ),
+    "twee_lengtes": (
+        [Part("a", 2900, 2), Part("b", 1900, 4), Part("c", 1350, 5), Part("d", 640, 6)],
+        [Stock("lang", 6000, -1), Stock("kort", 3600, -1)],
+    ),
+    "beperkt": (
+        [Part("a", 1450, 6), Part("b", 980, 5), Part("c", 530, 8)],
+        [Stock("lang", 5400, 2), Stock("kort", 3000, -1)],
+    ),
+}
+
+
+@needs_ortools
+@pytest.mark.parametrize("instance", list(AGREEMENT_INSTANCES))
+def test_exact_patterns_and_arc_flow_agree(instance):
+    parts, stocks = AGREEMENT_INSTANCES[instance]
+    runs = {
+        "exact": (Algorithm.EXACT, Formulation.AUTO),
+        "patterns": (Algorithm.ORTOOLS_OPTIMAL, Formulation.PATTERNS),
+        "arc_flow": (Algorithm.ORTOOLS_OPTIMAL, Formulation.ARC_FLOW),
+    }
+    bars = {}
+    for name, (algorithm, formulation) in runs.items():
+        optimizer = Optimizer1D(kerf=3, formulation=formulation, validate=True)
+        result = optimizer.optimize(parts, stocks, algorithm, max_split_parts=1, time_limit=30)
+        assert result.validation.valid, (name, result.validation.errors)
+        assert not result.parts_not_placed, name
+        assert result.proven_optimal, name
+        if algorithm is Algorithm.ORTOOLS_OPTIMAL:
+            assert result.formulation == formulation.value
+        bars[name] = result.total_stocks_used
+
+    assert len(set(bars.values())) == 1, bars
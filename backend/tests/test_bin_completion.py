@@ -0,0 +1,88 @@
+"""
+Tests voor bin_completion.py en EXACT: optimaal tegen brute force, en een
+ondergrens zonder strafkosten als de voorraad niet toereikend is
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from bin_completion import BinProblem, solve
+from optimizer_1d import Algorithm, Optimizer1D, Part, Stock, cost_lower_bound
+
+
+def brute_force(sizes, capacities, costs, quantities):
+    """Goedkoopste indeling door alle plaatsingen te proberen (inf = onhaalbaar)"""
+    best = [math.inf]
+
+    def place(i, bins, cost):
+        if cost >= best[0] - 1e-9:
+            return
+        if i == len(sizes):
+            best[0] = cost
+            return
+        for b in bins:
+            if b[1] + sizes[i] <= capacities[b[0]] + 1e-9:
+                b[1] += sizes[i]
+                place(i + 1, bins, cost)
+                b[1] -= sizes[i]
+        for t, capacity in enumerate(capacities):
+            used = sum(1 for b in bins if b[0] == t)
+            if quantities[t] != -1 and used >= quantities[t]:
+                continue
+            if sizes[i] <= capacity + 1e-9:
+                bins.append([t, sizes[i]])
+                place(i + 1, bins, cost + costs[t])
+                bins.pop()
+
+    place(0, [], 0.0)
+    return best[0]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_bin_completion_matches_brute_force(seed):
+    rng = random.Random(seed)
+    multi = seed % 2
+    capacities = [100.0, 70.0] if multi else [100.0]
+    costs = [1.0, rng.choice([0.6, 0.75, 1.0])] if multi else [1.0]
+    quantities = [rng.choice([-1, 2, 3]), rng.choice([-1, 1, 2])] if multi else [-1]
+    items = sorted((rng.randint(5, 65) for _ in range(rng.randint(3, 9 if multi else 12))), reverse=True)
+    sizes, counts = np.unique(np.array(items, dtype=float), return_counts=True)
+    sizes, counts = sizes[::-1].copy(), counts[::-1].copy()
+
+    optimum = brute_force(items, capacities, costs, quantities)
+    solution = solve(BinProblem(sizes, counts, np.array(capacities), np.array(costs), np.array(quantities)))
+
+    if math.isinf(optimum):
+        assert solution.bins is None
+        return
+    assert solution.complete
+    assert solution.cost == pytest.approx(optimum)
+    assert solution.lower_bound <= optimum + 1e-9
+    placed = np.zeros(len(sizes), dtype=int)
+    used = {}
+    for t, items_in_bin in solution.bins:
+        assert sum(sizes[j] * k for j, k in items_in_bin) <= capacities[t] + 1e-9
+        used[t] = used.get(t, 0) + 1
+        for j, k in items_in_bin:
+            placed[j] += k
+    assert (placed == counts).all()
+    assert all(q == -1 or used.get(t, 0) <= q for t, q in enumerate(quantities))
+
+
+def test_exact_bound_ignores_infeasible_instances():
+    # Te weinig voorraad: geen strafkosten van niet geplaatste stukken in de grens
+    parts = [Part("a", 700, 9), Part("b", 450, 7)]
+    stocks = [Stock("lat", 2000, 3)]
+    optimizer = Optimizer1D(kerf=3, validate=True)
+    result = optimizer.optimize(parts, stocks, Algorithm.EXACT, max_split_parts=1)
+    pieces, _, _ = optimizer.expand_parts(parts, stocks, max_split_parts=1)
+
+    assert result.parts_not_placed
+    assert result.validation.valid
+    assert result.lower_bound == pytest.approx(cost_lower_bound(pieces, stocks, optimizer.kerf_model))
+    assert not result.proven_optimal
@@ -0,0 +1,64 @@
+"""
+Tests voor parallel.py: annuleren stopt ook taken die al in een worker
+proces lopen
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import parallel
+from cancellation import CancelToken, SolveCancelled
+
+
+def _spin(marker: str) -> str:
+    """Reken tot de taak geannuleerd wordt (of 30s) en noteer waarom hij stopte"""
+    token = parallel.task_cancel_token()
+    stop = time.time() + 30
+    while time.time() < stop and not token.cancelled:
+        time.sleep(0.01)
+    with open(marker, "w") as f:
+        f.write("cancelled" if token.cancelled else "timeout")
+    return marker
+
+
+def _wait_for(path: str, seconds: float = 5.0) -> str:
+    stop = time.time() + seconds
+    while time.time() < stop:
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path) as f:
+                return f.read()
+        time.sleep(0.02)
+    return ""
+
+
+@pytest.mark.parametrize("shared", [False, True], ids=["eigen_pool", "gedeelde_pool"])
+def test_cancel_stops_running_tasks(tmp_path, monkeypatch, shared):
+    if shared:
+        monkeypatch.setattr(parallel, "_shared_size", 2)
+    markers = [str(tmp_path / f"taak{i}") for i in range(2)]
+    token = CancelToken()
+    threading.Timer(0.5, token.cancel).start()
+    try:
+        with pytest.raises(SolveCancelled):
+            parallel.run_parallel(_spin, [(m,) for m in markers], cancel_token=token)
+
+        assert [_wait_for(m) for m in markers] == ["cancelled", "cancelled"]
+        if shared:
+            # Het slot is weer vrij zodra de taken gestopt zijn
+            stop = time.time() + 5
+            while len(parallel._free_slots) < parallel.CANCEL_SLOTS and time.time() < stop:
+                time.sleep(0.02)
+            assert len(parallel._free_slots) == parallel.CANCEL_SLOTS
+    finally:
+        if shared:
+            parallel.shutdown_pool()
+
+
+def test_task_token_outside_a_pool_never_cancels():
+    assert not parallel.task_cancel_token().cancelled
+    assert parallel.run_parallel(os.getpid, [(), ()], max_workers=2) != [os.getpid()] * 2
@@ -0,0 +1,57 @@
+"""
+Tests voor pattern_store.py: families uit het geheugen, van schijf en na warm()
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+import sqlite3
+
+from pattern_store import PatternStore
+
+
+def test_pattern_store_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "patterns.sqlite")
+    calls = []
+
+    def generate(lengths, stock_length, max_patterns):
+        calls.append(list(lengths))
+        return [((0, 1), (1, 2)), ((1, 3),)]
+
+    patterns, cached = PatternStore(path).patterns(1000, 3, [400, 250], 100, generate)
+    assert (patterns, cached) == ([((0, 1), (1, 2)), ((1, 3),)], False)
+
+    # Andere volgorde: zelfde familie, indices in de gevraagde volgorde
+    store = PatternStore(path)
+    patterns, cached = store.patterns(1000, 3, [250, 400], 100, generate)
+    assert (patterns, cached) == ([((0, 2), (1, 1)), ((0, 3),)], True)
+    assert calls == [[400, 250]]
+
+    store.clear_memory()
+    assert store.warm() == 1
+    assert store.patterns(1000, 3, [400, 250], 100, generate)[1]
+
+
+def test_memory_hits_count_for_warm(tmp_path):
+    path = os.path.join(tmp_path, "patterns.sqlite")
+    store = PatternStore(path, max_families=2)
+
+    def generate(lengths, stock_length, max_patterns):
+        return [((0, 1),)]
+
+    store.patterns(1000, 3, [400], 100, generate)
+    store.patterns(2000, 3, [400], 100, generate)
+    for _ in range(5):
+        store.patterns(1000, 3, [400], 100, generate)  # Alleen geheugentreffers
+    store.patterns(2000, 3, [400], 100, generate)
+
+    # Een derde familie verdringt 1000 uit de LRU: de treffers gaan naar SQLite
+    store.patterns(3000, 3, [400], 100, generate)
+    assert store.flush_hits() == 0
+    with sqlite3.connect(path) as conn:
+        hits = dict(conn.execute("SELECT key, hits FROM pattern_families"))
+    assert sorted(hits.values()) == [0, 1, 5]
+
+    fresh = PatternStore(path, max_families=1)
+    assert fresh.warm(limit=1) == 1
+    assert fresh.patterns(1000, 3, [400], 100, lambda *a: []) == ([((0, 1),)], True)
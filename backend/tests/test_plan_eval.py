@@ -0,0 +1,72 @@
+"""
+Tests voor plan_eval.py: de scalaire methodes en evaluate() rekenen gelijk
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from optimizer_1d import CutPlan, Optimizer1D
+from plan_eval import KerfModel
+
+
+@pytest.mark.parametrize("model", [KerfModel(), KerfModel(3), KerfModel(3, 10)], ids=repr)
+def test_scalar_and_vectorized_agree(model):
+    rng = random.Random(1)
+    plans = []
+    for i in range(200):
+        stock_length = rng.choice([1000, 2400, 6000])
+        cuts, used = [], 0.0
+        for _ in range(rng.randint(0, 6)):
+            length = rng.randint(50, 1500)
+            if used + model.need(length, len(cuts)) > stock_length + rng.choice([0, 200]):
+                break
+            cuts.append((f"p{i}_{len(cuts)}", length))
+            used += model.need(length, len(cuts) - 1)
+        plans.append(CutPlan("s", stock_length, cuts, 0, i))
+
+    evaluation = model.evaluate_plans(plans)
+    for plan, valid, offcut in zip(plans, evaluation.valid, evaluation.offcut):
+        total = sum(length for _, length in plan.cuts)
+        core = model.core(total, len(plan.cuts))
+        assert core == pytest.approx(sum(model.need(l, k) for k, (_, l) in enumerate(plan.cuts)))
+        assert bool(valid) == (core <= plan.stock_length + 1e-6)
+        if not plan.cuts:
+            assert offcut == plan.stock_length
+        elif valid:
+            assert offcut == pytest.approx(model.offcut(plan.stock_length - core))
+    assert not evaluation.valid.all()
+
+
+def test_offcut_and_kerf_loss():
+    model = KerfModel(kerf=3, trim=10)
+    # 10 + 3 + 1000 + 3 + 500 = 1516, zaagsnede 3: reststuk 2400 - 1519
+    evaluation = model.evaluate(np.array([2400, 1517, 1000]), np.array([1500, 1500, 0]), np.array([2, 2, 0]))
+
+    assert evaluation.offcut.tolist() == [881, 0, 1000]
+    assert evaluation.valid.all()
+    assert evaluation.total_waste == 1881
+    assert evaluation.kerf_loss == (2400 - 881 - 1500) + (1517 - 1500)
+    assert model.capacity(2400) == 2387
+    assert KerfModel(kerf=3).lead == 0
+
+
+@pytest.mark.parametrize("model", [KerfModel(), KerfModel(3), KerfModel(3, 10)], ids=repr)
+def test_patterns_are_exactly_what_fits_by_the_kerf_model(model):
+    optimizer = Optimizer1D(kerf=model.kerf, trim=model.trim)
+    lengths = [2400, 1500.5, 987, 410]
+    stock_length = 6000
+    patterns = optimizer._generate_patterns(lengths, model.capacity(stock_length), 10000)
+
+    # Brute force: elke combinatie van aantallen waarvan de kern op de lat past
+    expected = set()
+    for counts in itertools.product(*(range(int(stock_length // l) + 1) for l in lengths)):
+        total = sum(l * c for l, c in zip(lengths, counts))
+        if sum(counts) and model.core(total, sum(counts)) <= stock_length:
+            expected.add(tuple((j, c) for j, c in enumerate(counts) if c))
+    assert set(patterns) == expected
+    assert len(patterns) == len(expected)
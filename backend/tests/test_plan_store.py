@@ -0,0 +1,28 @@
+"""
+Tests voor plan_store.py: plannen overleven een herstart via SQLite
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+
+from optimizer_1d import Algorithm, Optimizer1D, Part, Stock
+from plan_store import PlanRecord, PlanStore
+
+
+def test_plan_store_round_trip(tmp_path):
+    path = os.path.join(tmp_path, "plans.sqlite")
+    parts, stocks = [Part("a", 1200, 3)], [Stock("s", 4000)]
+    result = Optimizer1D(kerf=3).optimize(parts, stocks, Algorithm.FFD)
+    record = PlanRecord(PlanStore.new_id(), parts, stocks, 3, "ffd", 2, 0.0, result, {}, trim=5)
+    PlanStore(path=path).put(record)
+
+    loaded = PlanStore(path=path).get(record.plan_id)
+    assert loaded.trim == 5
+    assert loaded.result.fingerprint == result.fingerprint
+    assert PlanStore(path=path).get("onbekend") is None
+
+    memory = PlanStore(max_plans=1, path="")
+    memory.put(record)
+    memory.put(PlanRecord(PlanStore.new_id(), parts, stocks, 3, "ffd", 2, 0.0, result, {}))
+    assert memory.get(record.plan_id) is None
@@ -0,0 +1,108 @@
+"""
+Tests voor remnants.py: het reststukkenrek en de koppeling met de optimizer
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+
+from optimizer_1d import Algorithm, Optimizer1D, Part
+from remnants import RemnantStore, apply_result, offer_remnants
+
+
+def test_remnant_store_round_trip(tmp_path):
+    store = RemnantStore(os.path.join(tmp_path, "remnants.sqlite"))
+    short, long_, other = store.add(800, "38x89", "lat"), store.add(2400, "38x89"), store.add(900, "45x145")
+
+    assert [r.id for r in store.available("38x89")] == [short, long_]
+    assert [r.id for r in store.available("38x89", min_length=1000)] == [long_]
+    assert [r.id for r in store.available("45x145")] == [other]
+    assert store.consume([short, short]) == [short]
+    assert [r.id for r in RemnantStore(store.path).available("38x89")] == [long_]
+    assert store.delete(long_) and not store.delete(long_)
+
+
+def test_offer_and_apply_result(tmp_path):
+    store = RemnantStore(os.path.join(tmp_path, "remnants.sqlite"))
+    store.add_many([(2000, "a"), (2000, "b"), (500, "c")])
+    stocks, ids = offer_remnants(store, min_length=600)
+
+    assert [(s.length, s.quantity, s.profile) for s in stocks] == [(2000, 2, "")]
+    result = Optimizer1D(kerf=3).optimize([Part("p", 1900, 1)], stocks, Algorithm.FFD)
+    changes = apply_result(store, result, ids, min_length=50)
+
+    assert changes["used"] == [ids[stocks[0].id][0]]
+    assert [r.length for r in store.available()] == [result.plans[0].waste, 500, 2000]
+
+
+def test_api_remnants_keep_their_profile(client):
+    # Eén profiel: het reststuk moet onder dat profiel terugkomen, niet onder ''
+    body = {
+        "parts": [{"id": "regel", "length": 1000, "quantity": 1, "profile": "rt-38x89"}],
+        "stocks": [{"id": "lat", "length": 6000, "profile": "rt-38x89"}],
+        "algorithm": "ffd",
+        "store_remnants": True,
+        "validate": True,
+    }
+    stored = client.post("/optimize/1d", json=body).json()["remnants"]["stored"]
+    assert len(stored) == 1
+
+    listed = client.get("/remnants", params={"profile": "rt-38x89"}).json()["remnants"]
+    assert [(r["id"], r["length"]) for r in listed] == [(stored[0], 6000 - 1000 - 3)]
+    assert stored[0] not in [r["id"] for r in client.get("/remnants").json()["remnants"]]
+
+    # Het volgende plan zaagt uit het reststuk in plaats van uit een nieuwe lat
+    body.update(store_remnants=False, use_remnants=True)
+    response = client.post("/optimize/1d", json=body).json()
+    assert response["remnants"]["used"] == stored
+    assert client.get("/remnants", params={"profile": "rt-38x89"}).json()["count"] == 0
+
+
+def test_reserve_substitutes_or_changes_nothing(tmp_path):
+    store = RemnantStore(os.path.join(tmp_path, "remnants.sqlite"))
+    a, b, c = store.add_many([(2000, "a"), (2000, "b"), (1500, "c")])
+    store.consume([a])  # Gelijktijdig request
+
+    # Zelfde lengte nog op voorraad: dat reststuk vervangt het gebruikte
+    assert store.reserve([(a, 2000, "")]) == ([b], [])
+    # Niet te vervangen: niets wordt afgeboekt, ook c niet
+    assert store.reserve([(c, 1500, ""), (a, 2000, "")]) == ([], [a])
+    assert [r.id for r in store.available()] == [c]
+
+
+def test_apply_result_reports_a_conflict(tmp_path):
+    store = RemnantStore(os.path.join(tmp_path, "remnants.sqlite"))
+    store.add_many([(2000, "a")])
+    stocks, ids = offer_remnants(store, min_length=600)
+    result = Optimizer1D(kerf=3).optimize([Part("p", 1900, 1)], stocks, Algorithm.FFD)
+    store.consume(ids[stocks[0].id])
+
+    changes = apply_result(store, result, ids, min_length=50)
+    assert changes == {"used": [], "stored": [], "conflicts": ids[stocks[0].id]}
+    assert store.available() == []
+
+
+def test_api_replans_when_remnants_are_taken(client, monkeypatch):
+    import main
+    remnant = client.post("/remnants", json={"length": 2000, "profile": "rt-conflict"}).json()["id"]
+    calls = []
+
+    def taken_first(store, result, remnant_ids, **kwargs):
+        if not calls:
+            store.consume([i for ids in remnant_ids.values() for i in ids])  # Een ander request was sneller
+        calls.append(dict(remnant_ids))
+        return apply_result(store, result, remnant_ids, **kwargs)
+
+    monkeypatch.setattr(main, "apply_result", taken_first)
+    body = {
+        "parts": [{"id": "p", "length": 1900, "quantity": 1, "profile": "rt-conflict"}],
+        "stocks": [{"id": "lat", "length": 6000, "profile": "rt-conflict"}],
+        "algorithm": "ffd",
+        "use_remnants": True,
+    }
+    data = client.post("/optimize/1d", json=body).json()
+
+    assert len(calls) == 2 and calls[1] == {}
+    assert data["remnants"] == {"used": [], "stored": [], "conflicts": [remnant]}
+    assert [bar["stock_id"] for bar in data["plans"]] == ["lat"]
+    assert any("opnieuw gemaakt" in w for w in data["warnings"])
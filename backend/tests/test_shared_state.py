@@ -0,0 +1,73 @@
+"""
+Tests voor de gedeelde toestand tussen workers: metrics en client quota
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from admission import ClientQuota, QuotaExceeded
+from metrics import Counter, Gauge, Histogram, SharedMetrics
+import shared_state
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def worker_metrics():
+    counter = Counter("requests_total", "Requests", ("kind",))
+    gauge = Gauge("inflight", "Lopend")
+    histogram = Histogram("duration_seconds", "Duur", buckets=(0.1, 1.0))
+    return [counter, gauge, histogram]
+
+
+def test_metrics_are_summed_over_workers(tmp_path):
+    path = os.path.join(tmp_path, "metrics.sqlite")
+    first, second = worker_metrics(), worker_metrics()
+    for metrics, amount in ((first, 2), (second, 3)):
+        metrics[0].inc(amount, kind="1d")
+        metrics[1].set(amount)
+        metrics[2].observe(0.05 * amount)
+    SharedMetrics(path).flush(second)
+    stopped = SharedMetrics(path)
+    stopped.pid = dead_pid()
+    stopped.flush(second)  # Gestopte worker: teller telt mee, gauge niet
+
+    counter, gauge, histogram = SharedMetrics(path).totals(first)
+    assert counter.value(kind="1d") == 2 + 3 + 3
+    assert gauge.value() == 2 + 3
+    assert histogram.count() == 3
+    assert "duration_seconds_bucket{le=\"0.1\"} 1" in histogram.render()  # Alleen 0.1 van de eerste
+
+
+def test_quota_is_shared_between_workers(tmp_path):
+    path = os.path.join(tmp_path, "quota.sqlite")
+    first, second = ClientQuota(2, path), ClientQuota(2, path)
+
+    with first.slot("a"), second.slot("a"):
+        assert first.active("a") == 2
+        with pytest.raises(QuotaExceeded):
+            with second.slot("a"):
+                pass
+        with first.slot("b"):
+            pass
+    assert second.active("a") == 0
+
+
+def test_quota_forgets_crashed_workers(tmp_path):
+    path = os.path.join(tmp_path, "quota.sqlite")
+    quota = ClientQuota(1, path)
+    conn = shared_state.connect(path)
+    conn.execute("INSERT INTO client_slots (client, pid, started_at) VALUES ('a', ?, 0)", (dead_pid(),))
+    conn.close()
+
+    assert quota.active("a") == 1
+    with quota.slot("a"):
+        assert quota.active("a") == 1
@@ -0,0 +1,59 @@
+"""
+Tests voor de TWO_STAGE modus van optimizer_2d.py: de ondergrens geldt
+alleen waar hij bewezen is
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import random
+
+import pytest
+
+import optimizer_2d
+from optimizer_1d import ORTOOLS_AVAILABLE, knapsack_search
+from optimizer_2d import Algorithm2D, Optimizer2D, Part2D, Sheet, result_to_dict_2d
+
+PARTS = [
+    Part2D("zijkant", 720, 560, 4, grain=True),
+    Part2D("plank", 764, 540, 6),
+    Part2D("achterwand", 760, 716, 2),
+    Part2D("front", 396, 140, 8, grain=True),
+]
+SHEETS = [Sheet("mdf", 2440, 1220)]
+
+
+def test_knapsack_reports_a_truncated_search():
+    rng = random.Random(2)
+    lengths = [rng.randint(300, 1500) for _ in range(25)]
+    values = [length * rng.uniform(0.8, 1.2) for length in lengths]
+    value, _, complete = knapsack_search(lengths, values, 5000, 3)
+    capped, _, capped_complete = knapsack_search(lengths, values, 5000, 3, max_nodes=5)
+
+    assert complete
+    assert not capped_complete and capped < value
+
+
+@pytest.mark.skipif(not ORTOOLS_AVAILABLE, reason="OR-Tools niet geïnstalleerd")
+def test_lp_bound_is_marked_two_stage_only():
+    result = Optimizer2D(kerf=3).optimize(PARTS, SHEETS, Algorithm2D.TWO_STAGE, max_iterations=200)
+    meta = result_to_dict_2d(result)["meta"]
+
+    assert meta["lowerBoundScope"] in ("two_stage", "area")
+    assert result.lower_bound <= result.total_sheets_used
+    if meta["lowerBoundScope"] == "two_stage":
+        area = sum(p.length * p.width * p.quantity for p in PARTS) / (2440 * 1220)
+        assert result.lower_bound > area
+
+
+@pytest.mark.skipif(not ORTOOLS_AVAILABLE, reason="OR-Tools niet geïnstalleerd")
+def test_truncated_pricing_falls_back_to_the_area_bound(monkeypatch):
+    def truncated(*args, **kwargs):
+        value, counts, _ = knapsack_search(*args, **kwargs)
+        return value, counts, False
+
+    monkeypatch.setattr(optimizer_2d, "knapsack_search", truncated)
+    result = Optimizer2D(kerf=3).optimize(PARTS, SHEETS, Algorithm2D.TWO_STAGE, max_iterations=200)
+
+    area = sum(p.length * p.width * p.quantity for p in PARTS) / (2440 * 1220)
+    assert result.lower_bound_scope == "area"
+    assert result.lower_bound == -(-area // 1)
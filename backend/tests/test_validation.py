@@ -0,0 +1,142 @@
+"""
+Tests voor validation.py: elk algoritme levert een geldig plan, en een
+beschadigd plan wordt herkend
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+import copy
+
+import pytest
+
+from optimizer_1d import Algorithm, CutPlan, Optimizer1D, Part, SplitPolicy, Stock
+from validation import validate_result
+
+# (onderdelen, voorraad, Optimizer1D argumenten, optimize argumenten)
+INSTANCES = {
+    "basis": (
+        [Part("a", 2400, 4), Part("b", 1800, 6), Part("c", 950, 9), Part("d", 420, 12)],
+        [Stock("lat6", 6000, -1), Stock("lat4", 4000, -1)],
+        {}, {},
+    ),
+    "beperkte_voorraad": (
+        [Part("a", 1500, 10)],
+        [Stock("kort", 3000, 2), Stock("lang", 6000, 1)],
+        {}, {},
+    ),
+    "splitsen": (
+        [Part("balk", 8200, 2), Part("regel", 2600, 5), Part("klos", 600, 8)],
+        [Stock("lat", 6000, -1)],
+        {"split_policy": SplitPolicy.OPTIMIZED},
+        {"max_split_parts": 2, "joint_allowance": 20, "time_limit": 2},
+    ),
+    "trim": (
+        [Part("a", 987, 3), Part("b", 488, 6), Part("c", 1000, 1)],
+        [Stock("lat", 1000, -1)],
+        {"trim": 10},
+        {"max_split_parts": 1},
+    ),
+    "profielen": (
+        [Part("x", 1200, 5, profile="38x89"), Part("y", 800, 7, profile="45x145"), Part("z", 500, 2, profile="geen")],
+        [Stock("s", 5400, -1, profile="38x89"), Stock("t", 4200, 3, profile="45x145")],
+        {}, {"workers": 1},
+    ),
+}
+
+
+@pytest.mark.parametrize("algorithm", list(Algorithm), ids=lambda a: a.value)
+@pytest.mark.parametrize("instance", list(INSTANCES))
+def test_every_algorithm_returns_a_valid_plan(algorithm, instance):
+    parts, stocks, settings, options = INSTANCES[instance]
+    optimizer = Optimizer1D(kerf=3, validate=True, **settings)
+    result = optimizer.optimize_profiles(parts, stocks, algorithm, **options)
+
+    assert result.validation is not None
+    assert result.validation.valid, result.validation.errors
+    placed = sum(len(plan.cuts) for plan in result.plans)
+    assert result.validation.pieces >= placed
+
+
+def test_pieces_without_stock_are_reported_not_dropped():
+    parts, stocks, _, _ = INSTANCES["beperkte_voorraad"]
+    result = Optimizer1D(kerf=3, validate=True).optimize(parts, stocks, Algorithm.FFD)
+
+    placed = sum(len(plan.cuts) for plan in result.plans)
+    assert placed + len(result.parts_not_placed) == 10
+    assert result.parts_not_placed
+
+
+def test_unlimited_stock_is_not_capped():
+    parts = [Part("a", 3000, 1100)]
+    result = Optimizer1D(kerf=3, validate=True).optimize(parts, [Stock("lat", 3000, -1)], Algorithm.FFD)
+
+    assert result.total_stocks_used == 1100
+    assert not result.parts_not_placed
+    assert result.validation.valid
+
+
+def test_damaged_plan_is_rejected():
+    parts = [Part("a", 1500, 6)]
+    stocks = [Stock("s", 3000, 2)]
+    optimizer = Optimizer1D(kerf=3)
+    result = optimizer.optimize(parts, stocks, Algorithm.FFD)
+    pieces, too_long, origin = optimizer.expand_parts(parts, stocks)
+
+    damaged = copy.deepcopy(result)
+    damaged.plans[0].cuts.append(damaged.plans[1].cuts[0])       # Dubbel en te vol
+    damaged.plans.append(CutPlan("s", 3000, [("onbekend", 10)], 0, 9))  # Te veel voorraad
+    damaged.parts_not_placed = damaged.parts_not_placed[1:]       # Stuk kwijt
+    report = validate_result(damaged, pieces + too_long, stocks, optimizer.kerf_model, origin)
+
+    assert not report.valid
+    assert set(report.counts) == {
+        "unknown_piece", "missing_piece", "duplicate_piece", "overfull_bin", "stock_quantity"
+    }
+    assert report.to_dict()["valid"] is False
+
+
+def test_split_item_must_keep_its_length():
+    parts = [Part("balk", 8000, 1)]
+    stocks = [Stock("lat", 6000, -1)]
+    optimizer = Optimizer1D(kerf=3)
+    result = optimizer.optimize(parts, stocks, Algorithm.FFD, max_split_parts=2)
+    pieces, too_long, origin = optimizer.expand_parts(parts, stocks, max_split_parts=2)
+
+    assert validate_result(result, pieces + too_long, stocks, optimizer.kerf_model, origin).valid
+    damaged = copy.deepcopy(result)
+    piece_id, length = damaged.plans[0].cuts[0]
+    damaged.plans[0].cuts[0] = (piece_id, length - 100)
+    report = validate_result(damaged, pieces + too_long, stocks, optimizer.kerf_model, origin)
+    assert report.counts == {"length_mismatch": 1}
+
+
+def test_api_validates_on_request(client):
+    body = {
+        "parts": [{"id": "a", "length": 1500, "quantity": 5}],
+        "stocks": [{"id": "s", "length": 3000, "quantity": 2}],
+        "algorithm": "ffd",
+        "validate": True,
+    }
+    response = client.post("/optimize/1d", json=body)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["validation"]["valid"]
+    assert len(data["parts_not_placed"]) == 3  # 1500 + kerf + 1500 past niet op 3000
+
+
+def test_split_part_is_checked_against_the_original_part():
+    parts = [Part("balk", 15000, 1)]
+    stocks = [Stock("lat", 6000, -1)]
+    optimizer = Optimizer1D(kerf=3, split_policy=SplitPolicy.BALANCED)
+    result = optimizer.optimize(parts, stocks, Algorithm.FFD, max_split_parts=3, joint_allowance=20)
+    pieces, too_long, origin = optimizer.expand_parts(parts, stocks, max_split_parts=3, joint_allowance=20)
+    args = (pieces + too_long, stocks, optimizer.kerf_model, origin)
+
+    assert len(pieces) == 3
+    assert validate_result(result, *args, parts=parts, max_split_parts=3, joint_allowance=20).valid
+    report = validate_result(result, *args, parts=parts, max_split_parts=2, joint_allowance=20)
+    assert report.counts == {"split_count": 1}
+    # Delen die samen te kort zijn voor het onderdeel plus de twee verbindingen
+    report = validate_result(result, *args, parts=parts, max_split_parts=3, joint_allowance=50)
+    assert report.counts == {"split_length": 1}
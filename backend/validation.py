@@ -0,0 +1,212 @@
+"""
+Zaagplan Optimizer - Validatie
+Controleert of een zaagplan uitvoerbaar is, los van het algoritme dat het
+maakte:
+- elk gevraagd stuk zit precies één keer in het plan of bij de niet
+  geplaatste stukken, en gesplitste items houden hun totale lengte
+- de delen van een gesplitst onderdeel tellen samen op tot de lengte van
+  het onderdeel plus de verbindingstoeslag, in hooguit max_split_parts
+  delen
+- geen lat is te vol (stukken, zaagsneden en trim; zie plan_eval.py)
+- geen voorraadtype wordt vaker gebruikt dan er op voorraad is
+
+Alles is O(n) in het aantal stukken en latten: één dict-lookup per stuk,
+de tellingen en lengtes per item met np.bincount en de latten in één
+KerfModel.evaluate_plans. De load test valideert altijd; in productie
+aan met ZAAGPLAN_VALIDATE=1 of "validate" in het request.
+
+Auteur: OpenAEC (Jochem Bosman & Claude)
+"""
+
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+import os
+
+import numpy as np
+
+from plan_eval import KerfModel
+
+if TYPE_CHECKING:
+    from optimizer_1d import OptimizationResult, Part, Stock
+
+# Standaard aan voor elk request (anders alleen met "validate" in het request)
+VALIDATE_DEFAULT = os.environ.get("ZAAGPLAN_VALIDATE", "") not in ("", "0")
+
+# Afwijking in de totale lengte van een gesplitst item (afronding van deellengtes)
+LENGTH_TOLERANCE = 1e-3
+
+# BALANCED rondt elk deel naar boven af op 0.1mm (zie split_lengths)
+SPLIT_ROUNDING = 0.1
+
+# Meer fouten per soort worden alleen geteld
+MAX_MESSAGES = 10
+
+
+@dataclass
+class ValidationReport:
+    """Uitkomst van de validatie van één zaagplan"""
+    pieces: int = 0    # Gecontroleerde stukken
+    bins: int = 0      # Gecontroleerde latten
+    errors: List[str] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=dict)  # Aantal fouten per soort
+
+    @property
+    def valid(self) -> bool:
+        return not self.counts
+
+    def add(self, kind: str, count: int, messages: Sequence[str]):
+        """Registreer count fouten van één soort (alleen de eerste MAX_MESSAGES als tekst)"""
+        if not count:
+            return
+        self.counts[kind] = self.counts.get(kind, 0) + count
+        self.errors.extend(messages[:MAX_MESSAGES])
+
+    def merge(self, other: "ValidationReport"):
+        """Tel een ander rapport (bijv. van een ander profiel) mee"""
+        self.pieces += other.pieces
+        self.bins += other.bins
+        self.errors.extend(other.errors)
+        for kind, count in other.counts.items():
+            self.counts[kind] = self.counts.get(kind, 0) + count
+
+    def to_dict(self) -> dict:
+        return {
+            "valid": self.valid,
+            "pieces": self.pieces,
+            "bins": self.bins,
+            "counts": dict(self.counts),
+            "errors": list(self.errors),
+        }
+
+
+def validate_result(
+    result: "OptimizationResult",
+    pieces: Sequence["Part"],
+    stocks: Sequence["Stock"],
+    kerf_model: KerfModel,
+    origin: Optional[Dict[str, Tuple[str, str]]] = None,
+    parts: Optional[Sequence["Part"]] = None,
+    max_split_parts: int = 1,
+    joint_allowance: float = 0.0
+) -> ValidationReport:
+    """
+    Valideer een zaagplan tegen de gevraagde stukken en de voorraad
+
+    Args:
+        result: Te controleren resultaat
+        pieces: Alle gevraagde stukken na expand_parts (te plaatsen en te
+            lange), elk met quantity 1
+        stocks: Beschikbare voorraad
+        kerf_model: Zaagsnede en trim waarmee gepland is
+        origin: Herkomst {stuk_id: (onderdeel_id, item_id)}; delen van één
+            item mogen andere lengtes krijgen (OPTIMIZED) zolang hun totaal
+            gelijk blijft
+        parts: Oorspronkelijke onderdelen (vóór expand_parts); alleen
+            daarmee worden gesplitste onderdelen tegen hun lengte gecontroleerd
+        max_split_parts: Max aantal delen per onderdeel waarmee gepland is
+        joint_allowance: Extra lengte per verbinding waarmee gepland is
+
+    Returns:
+        ValidationReport; valid is False bij minstens één fout
+    """
+    plans = result.plans
+    report = ValidationReport(pieces=len(pieces), bins=len(plans))
+    origin = origin or {}
+
+    # Stukken: index per gevraagd stuk, item per stuk
+    index = {piece.id: i for i, piece in enumerate(pieces)}
+    item_ids: Dict[str, int] = {}
+    item_of = np.fromiter(
+        (item_ids.setdefault(origin.get(piece.id, ("", piece.id))[1], len(item_ids)) for piece in pieces),
+        dtype=np.int64, count=len(pieces)
+    )
+    expected = np.fromiter((piece.length for piece in pieces), dtype=float, count=len(pieces))
+
+    returned: List[Tuple[str, float]] = [cut for plan in plans for cut in plan.cuts]
+    returned.extend((part.id, part.length) for part in result.parts_not_placed)
+    positions = np.fromiter((index.get(piece_id, -1) for piece_id, _ in returned), dtype=np.int64, count=len(returned))
+    lengths = np.fromiter((length for _, length in returned), dtype=float, count=len(returned))
+
+    known = positions >= 0
+    report.add("unknown_piece", *_messages(
+        np.flatnonzero(~known), lambda k: f"Onbekend stuk {returned[k][0]} in het plan"
+    ))
+    counts = np.bincount(positions[known], minlength=len(pieces))
+    report.add("missing_piece", *_messages(
+        np.flatnonzero(counts == 0), lambda i: f"Stuk {pieces[i].id} ({pieces[i].length:g}mm) ontbreekt"
+    ))
+    report.add("duplicate_piece", *_messages(
+        np.flatnonzero(counts > 1), lambda i: f"Stuk {pieces[i].id} komt {counts[i]} keer voor"
+    ))
+
+    # Totale lengte per item (alleen items waarvan alle delen precies één keer voorkomen)
+    complete = np.bincount(item_of, weights=(counts == 1), minlength=len(item_ids)) == np.bincount(
+        item_of, minlength=len(item_ids)
+    )
+    want = np.bincount(item_of, weights=expected, minlength=len(item_ids))
+    got = np.bincount(item_of[positions[known]], weights=lengths[known], minlength=len(item_ids))
+    names = list(item_ids)
+    report.add("length_mismatch", *_messages(
+        np.flatnonzero(complete & (np.abs(got - want) > LENGTH_TOLERANCE)),
+        lambda g: f"Item {names[g]} is {got[g]:g}mm in plaats van {want[g]:g}mm"
+    ))
+
+    # Gesplitste onderdelen: hooguit max_split_parts delen, samen de lengte
+    # van het onderdeel plus een verbindingstoeslag per naad
+    if parts is not None:
+        part_length = {part.id: part.length for part in parts}
+        segments = np.bincount(item_of[positions[known]], minlength=len(item_ids))
+        split = np.zeros(len(item_ids), dtype=bool)
+        original = np.zeros(len(item_ids))
+        for piece, g in zip(pieces, item_of.tolist()):
+            part_id, item_id = origin.get(piece.id, (piece.id, piece.id))
+            if piece.id != item_id and part_id in part_length:
+                split[g] = True
+                original[g] = part_length[part_id]
+        report.add("split_count", *_messages(
+            np.flatnonzero(split & (segments > max(max_split_parts, 1))),
+            lambda g: f"Item {names[g]} is in {segments[g]} delen gezaagd (max {max(max_split_parts, 1)})"
+        ))
+        need = original + np.maximum(segments - 1, 0) * joint_allowance
+        off = (got < need - LENGTH_TOLERANCE) | (got > need + segments * SPLIT_ROUNDING + LENGTH_TOLERANCE)
+        report.add("split_length", *_messages(
+            np.flatnonzero(split & complete & off),
+            lambda g: f"Delen van item {names[g]} zijn samen {got[g]:g}mm, "
+                      f"onderdeel met verbindingen is {need[g]:g}mm"
+        ))
+
+    # Latten: alles past inclusief zaagsneden en trim, lengte klopt met de voorraad
+    stock_by_id = {stock.id: stock for stock in stocks}
+    evaluation = kerf_model.evaluate_plans(plans)
+    report.add("overfull_bin", *_messages(
+        np.flatnonzero(~evaluation.valid),
+        lambda b: f"Lat {plans[b].stock_id} #{plans[b].stock_index} is te vol: "
+                  f"{kerf_model.core(evaluation.totals[b], len(plans[b].cuts)):g}mm op {plans[b].stock_length:g}mm"
+    ))
+    unknown = [f"Onbekende voorraad {plan.stock_id}" for plan in plans if plan.stock_id not in stock_by_id]
+    report.add("unknown_stock", len(unknown), unknown)
+    wrong_length = [
+        f"Lat {plan.stock_id} #{plan.stock_index} heeft lengte {plan.stock_length:g}mm "
+        f"in plaats van {stock_by_id[plan.stock_id].length:g}mm"
+        for plan in plans
+        if plan.stock_id in stock_by_id and plan.stock_length != stock_by_id[plan.stock_id].length
+    ]
+    report.add("stock_length", len(wrong_length), wrong_length)
+
+    # Voorraad: per type niet meer latten dan beschikbaar
+    used: Dict[str, int] = {}
+    for plan in plans:
+        used[plan.stock_id] = used.get(plan.stock_id, 0) + 1
+    over = [
+        f"Voorraad {stock_id}: {count} gebruikt, {stock_by_id[stock_id].quantity} beschikbaar"
+        for stock_id, count in used.items()
+        if stock_id in stock_by_id and stock_by_id[stock_id].quantity != -1
+        and count > stock_by_id[stock_id].quantity
+    ]
+    report.add("stock_quantity", len(over), over)
+    return report
+
+
+def _messages(indices: np.ndarray, message: Callable[[int], str]) -> Tuple[int, List[str]]:
+    """(aantal fouten, tekst voor de eerste MAX_MESSAGES)"""
+    return len(indices), [message(int(i)) for i in indices[:MAX_MESSAGES]]